@@ -1,166 +1,527 @@
-import re
+import os
+import io
+import threading
 import uuid
 import time
+import cProfile
+import pstats
 import html as html_lib
 from datetime import datetime
 
-import requests
 import streamlit as st
 import streamlit.components.v1 as components
-from streamlit_autorefresh import st_autorefresh
+
+import bulk
+from chat import INITIAL_LIMIT as CHAT_INITIAL_LIMIT, ChatBuffer, ChatCompactor, PollSchedule
+from delta import SERVER_TIMESTAMP, QuoteDeltaSync, TooManyChanges, updated_at_stamps
+from metrics import Metrics
+from normalize import SCHEMA_VERSION, clean_quote_text, pretty_ts
+from keyset import Page, QuotePager
+import pipeline
+from rtdb import FirebaseClient, FirebaseError
+from shared import SharedCache
+from snapshots import SnapshotCache
+from store import QuoteStore
+from stream import LiveHub
+from writes import WriteQueue
 
 # ================= CONFIG =================
-FIREBASE_DB_URL = "https://quotesaver-e8fae-default-rtdb.europe-west1.firebasedatabase.app"
-POLL_SECONDS = 2                 # used ONLY for Chat refresh now
+FIREBASE_DB_URL = os.environ.get(
+    "HJ_FIREBASE_DB_URL",                           # e.g. a local `python emulator.py`
+    "https://quotesaver-e8fae-default-rtdb.europe-west1.firebasedatabase.app",
+)
+POLL_SECONDS = 2                 # chat poll interval right after activity (only while the chat listener is down)
+POLL_MAX_SECONDS = 60            # the interval backs off up to this while the chat is quiet
 APP_TITLE = "HJ Quotes"
-CACHE_TTL_SECONDS = 10           # a bit higher because we now do optimistic UI
+SNAPSHOT_DIR = os.environ.get("HJ_CACHE_DIR", ".hj_cache")   # last-known trees for fast cold starts
+SYNC_MODE = "delta"              # "delta": key listing + updated_at query; "full": conditional re-download
+CHAT_COMPACTION = True           # move old /chat messages into /chat_archive/<day> in the background
+LIVE_STREAMS = True              # SSE listeners push changes; polling is only the fallback
+LIVE_CHECK_SECONDS = 5           # how often a session compares versions with the listeners after activity
+LIVE_CHECK_MAX_SECONDS = 60      # ... backing off up to this while nothing changes
+LIVE_LOADING_SECONDS = 1         # ... and this often while the library is still loading
+QUOTES_PAGE_SIZE = 20            # quotes rendered per page (user can change it per session)
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+METRICS_PORT = int(os.environ.get("HJ_METRICS_PORT", "0"))   # >0: serve /metrics and /metrics.jsonl here
+PROFILE_PARAM = "profile"        # ?profile=1 captures a cProfile of each rerun
+SHARED_CACHE = os.environ.get("HJ_SHARED_CACHE") == "1"   # share RTDB reads between server processes on this host
+SHARED_TTL_SECONDS = 30          # age at which one process refetches the shared quotes / collections
+FIRST_LOAD_PAGE = 500            # first page of quotes on a cold start without a snapshot (shown at once)
+FIRST_LOAD_MAX_PAGE = 16000      # later pages double up to this
+SKELETON_CARDS = 3               # placeholder cards shown while the library loads
+SERVER_PAGING = os.environ.get("HJ_SERVER_PAGING") == "1"   # browse by date one RTDB page at a time
+QUOTE_SYNC_SECONDS = 15          # delta-sync interval for quotes while no listener streams them
+LIVE_WAIT_SECONDS = 10           # a first load waits this long for a tree's listener before fetching it itself
 # ==========================================
 
 
+# ---------- Instrumentation ----------
+@st.cache_resource(show_spinner=False)
+def get_metrics() -> Metrics:
+    # Phase timings and counters for the whole server process
+    metrics = Metrics()
+    if METRICS_PORT:
+        try:
+            metrics.serve(METRICS_PORT)
+        except OSError:
+            pass  # port taken (e.g. a second server process): the sidebar panel still works
+    return metrics
+
+
 # ---------- Firebase helpers ----------
-def fb(path: str) -> str:
-    return f"{FIREBASE_DB_URL}{path}.json"
+@st.cache_resource(show_spinner=False)
+def get_client() -> FirebaseClient:
+    # One pooled keep-alive client per server process, shared by all sessions
+    client = FirebaseClient(FIREBASE_DB_URL, metrics=get_metrics())
+    get_metrics().add_source("rtdb", lambda: client.stats)
+    return client
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_hub() -> LiveHub:
+    # One set of event-stream listeners per server process, shared by all sessions
+    hub = LiveHub(get_client(), chat_window=CHAT_INITIAL_LIMIT, names=streamed_trees()).start()
+    get_metrics().add_source("live", hub.stats)
+    return hub
+
+
+@st.cache_resource(show_spinner=False)
+def get_chat_compactor() -> ChatCompactor:
+    # Keeps /chat bounded; harmless if several server processes run it
+    compactor = ChatCompactor(get_client()).start()
+    get_metrics().add_source("chat_compactor", lambda: compactor.stats)
+    return compactor
+
+
+@st.cache_resource(show_spinner=False)
+def get_pager() -> QuotePager | None:
+    # Server-side pages of /quotes by created_at; None when off or RTDB has no index for it
+    if not SERVER_PAGING:
+        return None
+    pager = QuotePager(get_client())
+    try:
+        if not pager.has_index():
+            return None
+    except FirebaseError:
+        pass  # can't tell right now; page reads report their own errors
+    get_metrics().add_source("pager", lambda: pager.stats)
+    return pager
+
+
+def eager_trees() -> tuple[str, ...]:
+    """Trees loaded up front. With server paging, quotes come a page at a time."""
+    return ("collections",) if get_pager() is not None else ("quotes", "collections")
+
+
+def streamed_trees() -> tuple[str, ...]:
+    """Trees kept current by a listener.
+
+    A listener's first event is the whole location, so /quotes is only
+    streamed when there is no disk snapshot to resume from (and it isn't
+    paged from RTDB). Otherwise start_quote_sync's delta rounds fetch just
+    what changed.
+    """
+    if get_pager() is None and not (SYNC_MODE == "delta" and get_snapshots().has("quotes")):
+        return ("quotes", "collections", "chat")
+    return ("collections", "chat")
+
+
+@st.cache_resource(show_spinner=False)
+def get_store() -> QuoteStore:
+    # One copy of /quotes and /collections per server process, shared by all sessions
+    store = QuoteStore()
+    get_metrics().add_source("store", lambda: {"quotes": len(store.snapshot().quotes), "version": store.version})
+    return store
+
+
+@st.cache_resource(show_spinner=False)
+def get_snapshots() -> SnapshotCache:
+    return SnapshotCache(get_client(), SNAPSHOT_DIR)
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_cache() -> SharedCache | None:
+    # One SQLite file per host, read by every server process (None: each process fetches on its own)
+    if not SHARED_CACHE:
+        return None
+    cache = SharedCache(os.path.join(SNAPSHOT_DIR, "shared.sqlite3"))
+    get_metrics().add_source("shared", lambda: cache.stats)
+    return cache
+
+
+def _tree_fetcher(name: str):
+    def fetch(etag):
+        data, new_etag, changed = get_client().get_if_changed(f"/{name}", etag)
+        return (data or {}, new_etag) if changed else None
+    return fetch
+
+
+def pull_shared(store: QuoteStore, name: str) -> bool:
+    """Adopt the host's shared copy of a tree; one process refetches it when it is stale.
+
+    Skipped while this process still has writes in flight: a copy fetched
+    before they landed would undo them here until the next refetch.
+    """
+    if store.loaded and get_write_queue().pending_count():
+        return False
+    version, data = get_shared_cache().fetch(name, SHARED_TTL_SECONDS, _tree_fetcher(name))
+    return store.pull_shared(name, version, data)
+
+
+def _chat_fetcher(etag):
+    return get_client().query("/chat", "$key", limit_to_last=CHAT_INITIAL_LIMIT) or {}, None
+
+
+def _invalidate_shared(paths):
+    # After a write round lands: every process refetches the trees it touched
+    for name in {p.strip("/").split("/")[0] for p in paths}:
+        get_shared_cache().invalidate(name)
+
+
+def _after_commit(paths):
+    if SHARED_CACHE:
+        _invalidate_shared(paths)
+    if get_pager() is not None:
+        get_pager().invalidate()   # pages are refetched with the write in them
+
 
+@st.cache_resource(show_spinner=False)
+def get_delta_sync() -> QuoteDeltaSync:
+    return QuoteDeltaSync(get_client())
 
-def _safe_json(resp):
+
+def revalidate_tree(snapshots: SnapshotCache, store: QuoteStore, name: str):
+    """Conditional re-download of one tree; the store only changes if RTDB's copy did."""
+    data = snapshots.fetch(name)
+    if data is not None:
+        store.replace(name, data)
+        if name == "quotes":
+            get_delta_sync().reset(data)
+
+
+def sync_tree(snapshots: SnapshotCache, store: QuoteStore, name: str, *, delta_only: bool = False):
+    """Bring one tree up to date: a delta round for quotes when possible, else a conditional download.
+
+    Falls back to the full download when the updated_at index is missing
+    (RTDB answers 400; with `delta_only` that FirebaseError is raised instead)
+    or too many quotes are new to fetch one by one. With the shared cache,
+    the host's copy is refetched instead. Skipped while this process has
+    writes in flight: a copy read before they land would undo them here.
+    """
+    if get_write_queue().pending_count():
+        return
+    if get_shared_cache() is not None:
+        get_shared_cache().invalidate(name)
+        pull_shared(store, name)
+        return
+    if name == "quotes" and SYNC_MODE == "delta" and "quotes" in store.trees:
+        try:
+            delta = get_delta_sync().diff(store.snapshot().quotes)
+        except TooManyChanges:
+            pass
+        except FirebaseError as e:
+            if e.status != 400 or delta_only:
+                raise
+        else:
+            if delta:
+                store.apply_delta(delta.upserts, delta.removed)
+                # Keep the cold-start snapshot current; no ETag, the next start re-syncs by delta
+                snapshots.save(name, dict(store.snapshot().quotes), None)
+            return
+    revalidate_tree(snapshots, store, name)
+
+
+def _sync_in_background(snapshots: SnapshotCache, store: QuoteStore, names):
+    for name in names:
+        try:
+            sync_tree(snapshots, store, name)
+        except FirebaseError:
+            pass  # keep serving the snapshot; the listeners / next refresh catch up
+
+
+def _wait_live(hub: LiveHub, name: str) -> bool:
+    deadline = time.monotonic() + LIVE_WAIT_SECONDS
+    while not hub.live(name):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def load_tree(name: str, publish) -> dict | None:
+    """First load of a tree in this process (runs in a loader thread, one per tree).
+
+    A tree with a listener comes from its first event (fetched here only if
+    the listener doesn't connect in time). Otherwise the disk snapshot is
+    served at once and re-synced once everything is in; without one, quotes
+    arrive page by page through `publish`.
+    """
+    hub = get_live_hub() if LIVE_STREAMS else None
+    if hub is not None and name in hub.streams and _wait_live(hub, name):
+        # Adopt the listener's copy instead of downloading the tree a second time
+        get_store().pull_live(name, hub.trees[name])
+        # No ETag: the next start resumes from it by delta
+        get_snapshots().save(name, dict(hub.trees[name].snapshot()[1]), None)
+        return None
+    if get_shared_cache() is not None:
+        try:
+            return get_shared_cache().fetch(name, SHARED_TTL_SECONDS, _tree_fetcher(name))[1]
+        except FirebaseError:
+            return {}
+    snapshots = get_snapshots()
+    data = snapshots.load(name)
+    if data is not None:
+        _from_disk.append(name)
+        return data
+    if name != "quotes":
+        try:
+            return snapshots.fetch(name) or {}
+        except FirebaseError:
+            return {}
+    data = {}
     try:
-        return resp.json() if resp.ok else {}
-    except Exception:
-        return {}
+        for page in get_client().pages("/quotes", FIRST_LOAD_PAGE, max_page_size=FIRST_LOAD_MAX_PAGE):
+            data.update(page)
+            publish(data)
+    except FirebaseError:
+        return data   # what arrived so far; "Refresh" or the listeners fill in the rest
+    # No ETag for a paged read: the next cold start re-syncs it by delta
+    snapshots.save(name, data, None)
+    return data
+
 
+def _after_first_load():
+    names = tuple(_from_disk)
+    _from_disk.clear()
+    if names:
+        # Served from the disk snapshot: catch up with RTDB
+        _sync_in_background(get_snapshots(), get_store(), names)
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
-def get_data_cached(path: str):
-    r = requests.get(fb(path), timeout=8)
-    return _safe_json(r) or {}
+
+_from_disk: list[str] = []
+
+
+def _sync_quotes_forever(hub: LiveHub):
+    # Without a /quotes listener, a delta round every QUOTE_SYNC_SECONDS keeps the held tree current
+    store = get_store()
+    while True:
+        time.sleep(QUOTE_SYNC_SECONDS)
+        if "quotes" not in store.trees or hub.live("quotes"):
+            continue
+        try:
+            sync_tree(get_snapshots(), store, "quotes", delta_only=True)
+        except FirebaseError as e:
+            if e.status == 400:
+                hub.watch("quotes")   # no updated_at index: only a listener avoids full downloads
+                return
+
+
+@st.cache_resource(show_spinner=False)
+def start_quote_sync(_hub: LiveHub) -> threading.Thread:
+    thread = threading.Thread(target=_sync_quotes_forever, args=(_hub,), name="quote-sync", daemon=True)
+    thread.start()
+    return thread
 
 
 def post_data_return_key(path: str, data: dict) -> str | None:
     # Firebase RTDB POST returns {"name": "<generated_key>"}
-    r = requests.post(fb(path), json=data, timeout=8)
-    if not r.ok:
-        return None
     try:
-        return (r.json() or {}).get("name")
-    except Exception:
+        return get_client().post(path, data)
+    except FirebaseError:
         return None
 
 
-def put_value(path: str, value):
-    requests.put(fb(path), json=value, timeout=8)
+@st.cache_resource(show_spinner=False)
+def get_write_queue() -> WriteQueue:
+    # Background writer shared by all sessions: clicks queue writes and rerun immediately
+    # updated_at is stamped on every quote a round edits, so delta sync sees the change
+    queue = WriteQueue(get_client(), stamp=updated_at_stamps, on_commit=_after_commit)
+    get_metrics().add_source("writes", lambda: {**queue.stats, "pending": queue.pending_count()})
+    return queue
 
 
-def delete_data(path: str):
-    requests.delete(fb(path), timeout=8)
+def queue_writes(label: str, writes: dict):
+    """Queue `{path: (new_value, value_before)}` for this session (None deletes)."""
+    get_write_queue().submit(st.session_state.user_id, label, writes)
 
 
 def refresh_all_data():
-    """Hard refresh: clear cache and reload quotes/collections into session."""
-    st.cache_data.clear()
-    st.session_state.quotes = get_data_cached("/quotes") or {}
-    st.session_state.collections = get_data_cached("/collections") or {}
+    """Hard refresh: re-sync quotes/collections (only what changed is downloaded)."""
+    if get_pager() is not None:
+        get_pager().invalidate()
+    for name in ("quotes", "collections"):
+        if name not in get_store().trees:
+            continue   # paged from RTDB (or still loading): nothing held to re-sync
+        try:
+            sync_tree(get_snapshots(), get_store(), name)
+        except FirebaseError:
+            pass
     st.rerun()
 
 
-# ---------- Time helpers ----------
-def now_iso_z() -> str:
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+# ---------- Bulk import / export ----------
+def run_import(upload):
+    """Stream an uploaded JSONL/CSV file into RTDB in batched PATCHes, with a progress bar."""
+    progress = st.progress(0.0, text="Importing…")
+    size = max(1, upload.size)
 
+    def on_progress(r):
+        progress.progress(min(1.0, upload.tell() / size), text=f"{r.imported} imported • {r.skipped} skipped")
 
-def pretty_ts(iso_z: str) -> str:
+    f = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
     try:
-        dt = datetime.fromisoformat(iso_z.replace("Z", "+00:00"))
-        return dt.strftime("%d %b %Y, %H:%M UTC")
-    except Exception:
-        return iso_z
+        result = bulk.import_quotes(get_client(), bulk.iter_rows(f, bulk.detect_format(upload.name)),
+                                    on_progress=on_progress)
+    except FirebaseError as e:
+        st.session_state.bulk_report = (f"Import stopped: {e}", [])
+        return
+    finally:
+        f.detach()
+    st.session_state.bulk_report = (
+        f"Imported {result.imported} quotes and {result.collections} collections "
+        f"in {result.requests} requests • {result.skipped} skipped",
+        result.errors,
+    )
+    refresh_all_data()
+
+
+def export_file(fmt: str) -> bytes:
+    """The export as bytes. Quotes are fetched page by page, but the download itself is held in memory."""
+    buf = io.BytesIO()
+    with io.TextIOWrapper(buf, encoding="utf-8", newline="") as text:
+        bulk.export_quotes(get_client(), text, fmt)
+        text.flush()
+        return buf.getvalue()
+
+
+# ---------- Time helpers ----------
+def now_iso_z() -> str:
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
-# ---------- Clean old “HTML got saved into quote text” ----------
-_MUTED_ADDED_DIV_RE = re.compile(
-    r'<div\s+class=(["\'])muted\1>\s*Added:\s*.*?</div>',
-    flags=re.IGNORECASE | re.DOTALL,
+# ---------- Copy buttons (one shared listener, stays green) ----------
+# Each quote only renders a plain <button data-copy="…">. A single script,
+# injected once into the app document, handles clicks on all of them.
+_CLIPBOARD_SCRIPT = """
+(function() {
+  const doc = window.parent.document;
+  if (doc.getElementById("hj-clipboard")) return;
+  const s = doc.createElement("script");
+  s.id = "hj-clipboard";
+  s.textContent = `
+    (function() {
+      async function writeText(text) {
+        try {
+          await navigator.clipboard.writeText(text);
+        } catch (e) {
+          const ta = document.createElement("textarea");
+          ta.value = text;
+          ta.style.position = "fixed";
+          ta.style.opacity = "0";
+          document.body.appendChild(ta);
+          ta.select();
+          const ok = document.execCommand("copy");
+          ta.remove();
+          if (!ok) throw e;
+        }
+      }
+      document.addEventListener("click", async (ev) => {
+        const btn = ev.target.closest && ev.target.closest(".hj-copy[data-copy]");
+        if (!btn || btn.dataset.busy === "1") return;
+        btn.dataset.busy = "1";
+        const old = btn.innerText;
+        try {
+          await writeText(btn.dataset.copy);
+          btn.classList.remove("hj-copied");
+          void btn.offsetWidth;
+          btn.classList.add("hj-copied");
+          btn.innerText = "✅ Copied";
+        } catch (e) {
+          btn.innerText = "❌ Failed";
+        }
+        setTimeout(() => {
+          btn.innerText = old;
+          btn.classList.remove("hj-copied");
+          btn.dataset.busy = "";
+        }, 900);
+      });
+    })();
+  `;
+  doc.head.appendChild(s);
+})();
+"""
+
+
+_poll_timer = components.declare_component(
+    "poll_timer", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "poll_timer")
 )
-_ANY_HTML_TAG_RE = re.compile(r"</?[^>]+>")
 
 
-def clean_quote_text(text: str) -> str:
-    if not text:
-        return ""
-    s = text.strip()
-    s = _MUTED_ADDED_DIV_RE.sub("", s).strip()
-    lower = s.lower()
-    if "<div" in lower or "</div" in lower or "<span" in lower or "<br" in lower or "<p" in lower:
-        s = _ANY_HTML_TAG_RE.sub("", s)
-        s = re.sub(r"\s{2,}", " ", s).strip()
-    return s
+def clipboard_listener():
+    # Zero-height iframe; only its first run on a page does anything
+    components.html(f"<script>{_CLIPBOARD_SCRIPT}</script>", height=0)
 
 
-# ---------- Copy button (fast + animated, stays green) ----------
 def copy_button(text_to_copy: str, element_id: str, label: str = "Copy"):
-    safe = (text_to_copy or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
-    html = f"""
-    <div style="width:100%;">
-      <style>
-        .hj-copy {{
-          width: 100%;
-          padding: 10px 12px;
-          border-radius: 999px;
-          border: 1px solid rgba(255,255,255,0.12);
-          background: #1DB954;
-          color: #0b0f0c;
-          cursor: pointer;
-          font-weight: 900;
-          letter-spacing: 0.01em;
-          transition: transform 120ms ease, filter 160ms ease, background 160ms ease;
-          will-change: transform;
-        }}
-        .hj-copy:hover {{
-          background: #1ed760;
-          filter: drop-shadow(0 10px 18px rgba(29,185,84,0.18));
-        }}
-        .hj-copy:active {{ transform: scale(0.97); }}
-        .hj-copy.hj-copied {{ animation: hjCopied 350ms ease; }}
-        @keyframes hjCopied {{
-          0%   {{ transform: scale(1); }}
-          50%  {{ transform: scale(1.03); }}
-          100% {{ transform: scale(1); }}
-        }}
-      </style>
-
-      <button id="{element_id}" class="hj-copy" title="Copy to clipboard">📋 {label}</button>
-
-      <script>
-        (function() {{
-          const btn = document.getElementById("{element_id}");
-          if (!btn) return;
-          if (btn.dataset.bound === "1") return;
-          btn.dataset.bound = "1";
-
-          btn.addEventListener("click", async () => {{
-            try {{
-              await navigator.clipboard.writeText("{safe}");
-              const old = btn.innerText;
-
-              btn.classList.remove("hj-copied");
-              void btn.offsetWidth;
-              btn.classList.add("hj-copied");
-
-              btn.innerText = "✅ Copied";
-              setTimeout(() => {{
-                btn.innerText = old;
-                btn.classList.remove("hj-copied");
-              }}, 900);
-            }} catch (e) {{
-              const old = btn.innerText;
-              btn.innerText = "❌ Failed";
-              setTimeout(() => btn.innerText = old, 900);
-            }}
-          }});
-        }})();
-      </script>
-    </div>
-    """
-    components.html(html, height=60)
+    # Newlines as entities so a blank line can't end the markdown HTML block
+    safe = html_lib.escape(text_to_copy or "", quote=True).replace("\r", "").replace("\n", "&#10;")
+    st.markdown(
+        f'<button id="{element_id}" class="hj-copy" data-copy="{safe}" title="Copy to clipboard">📋 {label}</button>',
+        unsafe_allow_html=True,
+    )
+
+
+# ---------- Diagnostics panel ----------
+def render_diagnostics(metrics: Metrics, profile_text: str | None):
+    with st.sidebar:
+        st.divider()
+        st.markdown("### Diagnostics")
+        rows = [
+            {
+                "phase": name,
+                "runs": t["count"],
+                "p50 ms": round(t["p50"] * 1000, 2),
+                "p95 ms": round(t["p95"] * 1000, 2),
+                "max ms": round(t["max"] * 1000, 2),
+            }
+            for name, t in metrics.timings().items()
+        ]
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        counters = metrics.counters()
+        st.caption(
+            f"RTDB: {counters.get('rtdb.requests', 0)} requests • "
+            f"{counters.get('rtdb.bytes_in', 0) / 1024:.1f} KiB in • "
+            f"{counters.get('rtdb.bytes_out', 0) / 1024:.1f} KiB out"
+        )
+        with st.expander("Counters"):
+            st.json(counters)
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("JSONL", metrics.to_jsonl(), file_name="hj-metrics.jsonl",
+                               mime="application/x-ndjson", use_container_width=True)
+        with d2:
+            st.download_button("Prometheus", metrics.to_prometheus(), file_name="hj-metrics.prom",
+                               mime="text/plain", use_container_width=True)
+        if profile_text:
+            with st.expander("cProfile (this rerun)"):
+                st.code(profile_text, language="text")
+
+
+# ---------- Page config (first, so the shell paints before any data is in) ----------
+st.set_page_config(page_title=APP_TITLE, layout="wide")
+
+
+# ---------- Per-rerun timing / optional profile ----------
+metrics = get_metrics()
+run_started = time.perf_counter()
+profiler = st.session_state.pop("profiler", None)
+if profiler is not None:
+    profiler.disable()  # the previous rerun was cut short by st.rerun()
+    profiler = None
+if st.query_params.get(PROFILE_PARAM) == "1":
+    profiler = st.session_state.profiler = cProfile.Profile()
+    profiler.enable()
 
 
 # ---------- Session ----------
@@ -185,6 +546,35 @@ if "pending_delete_quote_id" not in st.session_state:
 if "pending_delete_quote_label" not in st.session_state:
     st.session_state.pending_delete_quote_label = ""
 
+# Collection editing: one quote's editor at a time, or many quotes via bulk select
+if "editing_collections_qid" not in st.session_state:
+    st.session_state.editing_collections_qid = None
+if "bulk_selected" not in st.session_state:
+    st.session_state.bulk_selected = set()
+    st.session_state.bulk_generation = 0   # bumped to reset the checkboxes after a bulk change
+
+# Quote list window (kept across reruns, reset when the filter changes)
+if "quote_page" not in st.session_state:
+    st.session_state.quote_page = 0
+if "quote_page_filter" not in st.session_state:
+    st.session_state.quote_page_filter = None
+if "quote_cursors" not in st.session_state:
+    st.session_state.quote_cursors = [None]  # server paging: keyset cursor each page starts after
+
+if "live_seen" not in st.session_state:
+    st.session_state.live_seen = {}  # "store"/"chat" -> version this session last rendered
+
+if "chat_buffer" not in st.session_state:
+    st.session_state.chat_buffer = ChatBuffer()
+
+if "chat_poll" not in st.session_state:
+    st.session_state.chat_poll = PollSchedule(POLL_SECONDS, POLL_MAX_SECONDS)
+    st.session_state.chat_poll_tick = 0
+
+if "live_poll" not in st.session_state:
+    st.session_state.live_poll = PollSchedule(LIVE_CHECK_SECONDS, LIVE_CHECK_MAX_SECONDS)
+    st.session_state.live_poll_tick = 0
+
 # Smooth feedback
 if "pulse_hero" not in st.session_state:
     st.session_state.pulse_hero = False
@@ -207,17 +597,118 @@ def should_flash(qid: str) -> bool:
     return (time.time() - float(st.session_state.last_action_ts or 0.0)) <= 1.1
 
 
-# ---------- Load data once per session (then optimistic updates) ----------
-if "quotes" not in st.session_state:
-    st.session_state.quotes = get_data_cached("/quotes") or {}
-
-if "collections" not in st.session_state:
-    st.session_state.collections = get_data_cached("/collections") or {}
-
-
-# ---------- Page config + Spotify-ish UI ----------
-st.set_page_config(page_title=APP_TITLE, layout="wide")
-
+# ---------- Shared data (loaded once per process, then optimistic updates) ----------
+hub = get_live_hub() if LIVE_STREAMS else None
+store = get_store()
+if CHAT_COMPACTION:
+    get_chat_compactor()
+
+
+def sync_store_from_live():
+    # The store adopts a listener's tree once per change, however many sessions look
+    if hub is None:
+        return
+    for name in ("quotes", "collections"):
+        if hub.live(name):
+            store.pull_live(name, hub.trees[name])
+
+
+with metrics.timer("load"):
+    sync_store_from_live()
+    if get_shared_cache() is not None:
+        # Trees without a live listener come from the host-wide copy (one fetch per TTL per host)
+        for name in ("quotes", "collections"):
+            if name in store.trees and (hub is None or not hub.live(name)):
+                try:
+                    pull_shared(store, name)
+                except FirebaseError:
+                    pass  # no shared copy yet and RTDB unreachable: fall back to the snapshot below
+    # First run in this process: quotes and collections load in parallel in the background
+    # while this run renders the shell; live_watcher reruns as they arrive
+    store.load_in_background(load_tree, names=eager_trees(), on_done=_after_first_load)
+    if hub is not None and "quotes" not in hub.streams and SYNC_MODE == "delta" and get_shared_cache() is None:
+        start_quote_sync(hub)
+
+    # Writes from this session that failed for good: undo them locally, tell the user later
+    failed_writes = get_write_queue().take_failures(st.session_state.user_id)
+    for failure in failed_writes:
+        for path, value in failure.restore.items():
+            store.apply_write(path, value)
+
+snap = store.snapshot()
+st.session_state.live_seen["store"] = snap.version
+
+
+@st.fragment
+def live_watcher(watch_store: bool, watch_chat: bool):
+    # Cheap fragment tick: rerun the app only when something this session shows changed.
+    # Quote changes wait for the next rerun while the quote list isn't on screen. The timer
+    # pauses in hidden tabs; in the chat it follows the chat's schedule, elsewhere it backs
+    # off from LIVE_CHECK_SECONDS while nothing changes.
+    watch_chat = watch_chat and hub is not None and hub.live("chat")   # else chat_poller has the chat
+    schedule = st.session_state.chat_poll if watch_chat else st.session_state.live_poll
+    interval = schedule.interval
+    if store.loading:
+        interval = min(interval, LIVE_LOADING_SECONDS)
+    tick = _poll_timer(interval_ms=int(interval * 1000), key="live_poll_timer", default=0)
+    if not tick or tick == st.session_state.live_poll_tick:
+        return
+    st.session_state.live_poll_tick = tick
+
+    sync_store_from_live()
+    changed = (watch_store and store.version != st.session_state.live_seen.get("store")) \
+        or (watch_chat and hub.trees["chat"].version != st.session_state.live_seen.get("chat"))
+    schedule.record(int(changed))
+    if changed or get_write_queue().has_failures(st.session_state.user_id):
+        st.rerun(scope="app")
+
+
+def sync_chat(chat_buffer: ChatBuffer) -> int:
+    """Bring this session's chat up to date. Returns how many messages arrived."""
+    arrived = 0
+    window = None
+    if hub is not None and hub.live("chat"):
+        version, window = hub.trees["chat"].snapshot()
+        st.session_state.live_seen["chat"] = version
+    elif get_shared_cache() is not None:
+        # The latest messages, fetched once per poll interval for the whole host
+        try:
+            with metrics.timer("chat_fetch"):
+                _, window = get_shared_cache().fetch("chat", POLL_SECONDS, _chat_fetcher)
+        except FirebaseError:
+            pass
+    # Only messages newer than this session's cursor are fetched
+    try:
+        if window is None:
+            with metrics.timer("chat_fetch"):
+                arrived += chat_buffer.sync(get_client())
+        elif chat_buffer.cursor is not None and window and min(window) > chat_buffer.cursor:
+            # More arrived than the window holds since we last looked: fill the gap
+            with metrics.timer("chat_fetch"):
+                arrived += chat_buffer.sync(get_client())
+    except FirebaseError:
+        pass  # keep showing what we have; the next poll retries
+    if window is not None:
+        arrived += chat_buffer.extend(window)
+    return arrived
+
+
+@st.fragment
+def chat_poller():
+    # Polling fallback while the chat listener is down. Each timer tick reruns only this
+    # fragment; the app reruns when messages arrived. The timer pauses in hidden tabs.
+    schedule = st.session_state.chat_poll
+    tick = _poll_timer(interval_ms=int(schedule.interval * 1000), key="chat_poll_timer", default=0)
+    if not tick or tick == st.session_state.chat_poll_tick:
+        return
+    st.session_state.chat_poll_tick = tick
+    arrived = sync_chat(st.session_state.chat_buffer)
+    schedule.record(arrived)
+    if arrived:
+        st.rerun(scope="app")
+
+
+# ---------- Spotify-ish UI ----------
 st.markdown(
     """
     <style>
@@ -340,6 +831,42 @@ st.markdown(
       .hj-quote-text{ font-size: 1.15rem; font-weight: 800; letter-spacing: -0.01em; }
       .hj-quote-meta{ margin-top: 8px; color: rgba(255,255,255,0.72); font-size: 0.85rem; }
 
+      /* Skeleton cards while the library is still loading */
+      @keyframes hjShimmer { 0% { opacity: 0.45; } 50% { opacity: 0.9; } 100% { opacity: 0.45; } }
+      .hj-skeleton .hj-skel-line{
+        height: 14px;
+        border-radius: 7px;
+        background: rgba(255,255,255,0.08);
+        margin: 6px 0;
+        animation: hjShimmer 1.4s ease-in-out infinite;
+      }
+
+      /* Copy buttons (handled by the shared clipboard listener) */
+      .hj-copy {
+        width: 100%;
+        padding: 10px 12px;
+        border-radius: 999px;
+        border: 1px solid rgba(255,255,255,0.12);
+        background: #1DB954;
+        color: #0b0f0c;
+        cursor: pointer;
+        font-weight: 900;
+        letter-spacing: 0.01em;
+        transition: transform 120ms ease, filter 160ms ease, background 160ms ease;
+        will-change: transform;
+      }
+      .hj-copy:hover {
+        background: #1ed760;
+        filter: drop-shadow(0 10px 18px rgba(29,185,84,0.18));
+      }
+      .hj-copy:active { transform: scale(0.97); }
+      .hj-copy.hj-copied { animation: hjCopied 350ms ease; }
+      @keyframes hjCopied {
+        0%   { transform: scale(1); }
+        50%  { transform: scale(1.03); }
+        100% { transform: scale(1); }
+      }
+
       hr { border-color: rgba(255,255,255,0.08) !important; }
     </style>
     """,
@@ -347,13 +874,120 @@ st.markdown(
 )
 
 # ---------- Derived collection lists ----------
-collections = st.session_state.collections
-quotes = st.session_state.quotes
+collections = snap.collections
+quotes = snap.quotes
 
 collection_name_by_id = {cid: (c.get("name") or "Untitled").strip() for cid, c in collections.items()}
 collection_ids_sorted = sorted(collection_name_by_id.keys(), key=lambda cid: collection_name_by_id[cid].lower())
 
 
+def render_collection_editor(qid: str, col_ids: tuple[str, ...]):
+    """Collections of one quote; only built for the quote being edited."""
+    selected = st.multiselect(
+        "Collections",
+        options=collection_ids_sorted,
+        default=[cid for cid in col_ids if cid in collection_name_by_id],
+        format_func=collection_name_by_id.get,
+        key=f"ms_{qid}",
+    )
+    e1, e2, _ = st.columns([1.4, 1.0, 5.0])
+    with e1:
+        save = st.button("Save collections", key=f"save_cols_{qid}", type="primary", use_container_width=True)
+    with e2:
+        if st.button("Close", key=f"close_cols_{qid}", use_container_width=True):
+            st.session_state.editing_collections_qid = None
+            st.rerun()
+    if not save:
+        return
+
+    desired_ids = set(selected)
+    current_ids = set(col_ids)
+    to_add = desired_ids - current_ids
+    to_remove = current_ids - desired_ids
+
+    # optimistic shared update; the queue sends it as one atomic PATCH
+    store.set_quote_collections(qid, add=to_add, remove=to_remove)
+    writes = {f"/quotes/{qid}/collections/{cid}": (True, None) for cid in to_add}
+    writes.update({f"/quotes/{qid}/collections/{cid}": (None, True) for cid in to_remove})
+    queue_writes("collections", writes)
+
+    st.session_state.editing_collections_qid = None
+    st.session_state.pulse_hero = True
+    mark_last_action(qid)
+    st.toast("Collections updated ✅")
+    st.rerun()
+
+
+def toggle_bulk_selected(qid: str):
+    st.session_state.bulk_selected ^= {qid}
+
+
+def _set_bulk_selection(qids):
+    st.session_state.bulk_selected = set(qids)
+    st.session_state.bulk_generation += 1
+
+
+def render_skeleton_cards(n: int):
+    for _ in range(max(0, n)):
+        st.markdown(
+            """
+            <div class="hj-quote-body hj-skeleton">
+              <div class="hj-skel-line" style="width: 82%"></div>
+              <div class="hj-skel-line" style="width: 56%"></div>
+              <div class="hj-skel-line" style="width: 24%; height: 10px"></div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+
+
+def render_bulk_bar(view_ids: list[str], page_ids: list[str]):
+    """Selection summary plus add to / remove from a collection for every selected quote."""
+    selected = st.session_state.bulk_selected & quotes.keys()   # minus quotes deleted meanwhile
+    st.session_state.bulk_selected = selected
+    with st.container(border=True):
+        s1, s2, s3, s4 = st.columns([1.6, 1.2, 1.4, 1.0])
+        with s1:
+            st.markdown(f"**{len(selected)} selected**")
+        with s2:
+            if st.button("Select page", key="bulk_select_page", use_container_width=True):
+                _set_bulk_selection(selected | set(page_ids))
+                st.rerun()
+        with s3:
+            if st.button(f"Select all {len(view_ids)}", key="bulk_select_all", use_container_width=True):
+                _set_bulk_selection(selected | set(view_ids))
+                st.rerun()
+        with s4:
+            if st.button("Clear", key="bulk_clear", disabled=not selected, use_container_width=True):
+                _set_bulk_selection(())
+                st.rerun()
+
+        if not collection_ids_sorted:
+            st.caption("Create a collection in the sidebar first.")
+            return
+        t1, t2, t3 = st.columns([2.4, 1.3, 1.3])
+        with t1:
+            target = st.selectbox("Collection", collection_ids_sorted, format_func=collection_name_by_id.get,
+                                  key="bulk_collection", label_visibility="collapsed")
+        with t2:
+            add = st.button("➕ Add to", key="bulk_add", disabled=not selected, use_container_width=True)
+        with t3:
+            remove = st.button("➖ Remove from", key="bulk_remove", disabled=not selected, use_container_width=True)
+    if not (add or remove):
+        return
+
+    # One snapshot for the whole selection; the queue sends it as one multi-path PATCH
+    changed = store.set_collection_members(target, selected, on=add)
+    if changed:
+        value, before = (True, None) if add else (None, True)
+        queue_writes("collections", {f"/quotes/{qid}/collections/{target}": (value, before) for qid in changed})
+    _set_bulk_selection(())
+    st.session_state.pulse_hero = True
+    name = collection_name_by_id.get(target, "collection")
+    st.toast(f"{'Added' if add else 'Removed'} {len(changed)} quotes {'to' if add else 'from'} {name} ✅")
+    st.rerun()
+
+
 # ---------- Sidebar: left rail ----------
 with st.sidebar:
     st.markdown("### Navigation")
@@ -395,11 +1029,29 @@ with st.sidebar:
             cid = post_data_return_key("/collections", {"name": new_name.strip(), "created_at": now_iso_z()})
             if cid:
                 # optimistic add
-                st.session_state.collections[cid] = {"name": new_name.strip(), "created_at": now_iso_z()}
+                store.add_collection(cid, {"name": new_name.strip(), "created_at": now_iso_z()})
                 st.session_state.pulse_hero = True
                 st.toast("Collection created ✅")
                 st.rerun()
 
+    with st.expander("📦 Import / export"):
+        upload = st.file_uploader("JSONL or CSV", type=["jsonl", "json", "csv"], key="bulk_upload")
+        if upload is not None and st.button("Import", key="bulk_import", use_container_width=True):
+            run_import(upload)
+        if st.session_state.get("bulk_report"):
+            summary, errors = st.session_state.bulk_report
+            st.caption(summary)
+            for n, reason in errors[:10]:
+                st.caption(f"row {n}: {reason}")
+
+        export_format = st.radio("Export as", ["jsonl", "csv"], horizontal=True, key="bulk_export_format")
+        # Built only on request and for this run only; nothing is kept in the session
+        if st.button("Prepare export", key="bulk_prepare", use_container_width=True):
+            st.download_button(f"Download .{export_format}", export_file(export_format),
+                               file_name=f"hj-quotes.{export_format}",
+                               mime="text/csv" if export_format == "csv" else "application/x-ndjson",
+                               key="bulk_download", use_container_width=True)
+
     st.divider()
     st.markdown("### Settings")
     st.session_state.username = st.text_input("Username", value=st.session_state.username, placeholder="Enter your name")
@@ -412,6 +1064,10 @@ with st.sidebar:
         st.caption("Fast UI")
 
     st.caption("Tip: Quotes don’t auto-refresh anymore (only Chat does).")
+    if SERVER_PAGING and get_pager() is None:
+        st.caption("Server paging is off: /quotes has no created_at index "
+                   "(merge database.indexes.json into the database rules).")
+    show_diagnostics = st.toggle("📊 Diagnostics", key="show_diagnostics")
 
 
 # ---------- Hero (pulse after actions) ----------
@@ -428,19 +1084,29 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+for failure in failed_writes:
+    st.toast(f"Couldn't save {failure.label} — change undone ❌")
+
 # ==========================================
 # ================ QUOTES ==================
 # ==========================================
 if st.session_state.page == "Quotes":
     with st.container(border=True):
         st.subheader("Quotes")
-        c1, c2, c3 = st.columns([2.2, 1.2, 1.2])
+        c1, c2, c3, c4 = st.columns([2.2, 1.2, 0.8, 1.2])
         with c1:
             q_search = st.text_input("Search", placeholder="Search quotes or authors…")
         with c2:
-            sort_mode = st.selectbox("Sort", ["Newest first", "Oldest first", "Author A–Z"])
+            sort_mode = st.selectbox("Sort", pipeline.SORT_MODES)
         with c3:
+            page_size = st.selectbox(
+                "Per page",
+                PAGE_SIZE_OPTIONS,
+                index=PAGE_SIZE_OPTIONS.index(QUOTES_PAGE_SIZE) if QUOTES_PAGE_SIZE in PAGE_SIZE_OPTIONS else 0,
+            )
+        with c4:
             show_meta = st.toggle("Show dates", value=True)
+            bulk_mode = st.toggle("Bulk select", key="bulk_mode")
 
     # Add quote
     with st.container(border=True):
@@ -450,18 +1116,20 @@ if st.session_state.page == "Quotes":
             author = st.text_input("Author (optional)", placeholder="e.g., Marcus Aurelius")
             submitted = st.form_submit_button("Add Quote", use_container_width=True)
 
-            if submitted and text.strip():
+            if submitted and clean_quote_text(text):
                 payload = {
-                    "text": text.strip(),
+                    "text": clean_quote_text(text),
                     "author": author.strip(),
                     "created_at": now_iso_z(),
                     "fav_by": {},
                     "collections": {},
+                    "schema_version": SCHEMA_VERSION,
                 }
-                qid = post_data_return_key("/quotes", payload)
+                qid = post_data_return_key("/quotes", {**payload, "updated_at": SERVER_TIMESTAMP})
                 if qid:
-                    # optimistic add (instant)
-                    st.session_state.quotes[qid] = payload
+                    # optimistic add (instant); updated_at arrives with the server's copy, never
+                    # from this machine's clock (delta sync takes its marker from these values)
+                    store.add_quote(qid, payload)
                     st.session_state.pulse_hero = True
                     mark_last_action(qid)
                     st.toast("Quote added ✅")
@@ -476,9 +1144,10 @@ if st.session_state.page == "Quotes":
             with a:
                 if st.button("✅ Confirm delete", type="primary", use_container_width=True):
                     qid = st.session_state.pending_delete_quote_id
-                    delete_data(f"/quotes/{qid}")
-                    # optimistic remove
-                    st.session_state.quotes.pop(qid, None)
+                    before = snap.quotes.get(qid)
+                    # optimistic remove, written in the background
+                    store.delete_quote(qid)
+                    queue_writes("delete", {f"/quotes/{qid}": (None, before)})
                     st.session_state.pending_delete_quote_id = None
                     st.session_state.pending_delete_quote_label = ""
                     st.session_state.pulse_hero = True
@@ -491,45 +1160,69 @@ if st.session_state.page == "Quotes":
                     st.session_state.pending_delete_quote_label = ""
                     st.rerun()
 
-    # Normalize quotes
     uid = st.session_state.user_id
-    normalized = []
-    for qid, q in (st.session_state.quotes or {}).items():
-        q_text = clean_quote_text(q.get("text") or "")
-        q_author = (q.get("author") or "").strip()
-        created_raw = (q.get("created_at") or "").strip()
-
-        fav_by = q.get("fav_by") or {}
-        is_fav = bool(fav_by.get(uid))
-
-        q_cols = q.get("collections") or {}
-        col_ids = [cid for cid, v in q_cols.items() if v]
-
-        normalized.append((qid, q_text, q_author, created_raw, is_fav, col_ids))
-
-    # View filter
-    if st.session_state.view_mode == "FAV":
-        normalized = [r for r in normalized if r[4] is True]
-
-    if st.session_state.view_mode == "COL" and st.session_state.selected_collection_id:
-        wanted = st.session_state.selected_collection_id
-        normalized = [r for r in normalized if wanted in set(r[5])]
-
-    # Search
-    if q_search.strip():
-        needle = q_search.strip().lower()
-        normalized = [
-            r for r in normalized
-            if needle in (r[1] or "").lower() or needle in (r[2] or "").lower()
-        ]
-
-    # Sort
-    if sort_mode == "Newest first":
-        normalized.sort(key=lambda r: r[3] or "", reverse=True)
-    elif sort_mode == "Oldest first":
-        normalized.sort(key=lambda r: r[3] or "")
+    # Server paging: all quotes by date come from RTDB a page at a time while the library
+    # isn't held in full; any other view (search, favourites, …) loads it once in the background
+    server_paged = (
+        get_pager() is not None
+        and "quotes" not in store.trees
+        and st.session_state.view_mode == "ALL"
+        and not q_search.strip()
+        and sort_mode in pipeline.SERVER_SORT_MODES
+    )
+    if get_pager() is not None and not server_paged:
+        # Re-synced once in if it came from the disk snapshot; start_quote_sync keeps it current
+        store.load_in_background(load_tree, names=("quotes",), on_done=_after_first_load)
+
+    # Page window: a new filter starts at page 1, otherwise stay where the user was
+    page_filter = (
+        st.session_state.view_mode,
+        st.session_state.selected_collection_id,
+        q_search.strip().lower(),
+        sort_mode,
+        page_size,
+    )
+    if st.session_state.quote_page_filter != page_filter:
+        st.session_state.quote_page_filter = page_filter
+        st.session_state.quote_page = 0
+        st.session_state.quote_cursors = [None]
+
+    if server_paged:
+        # Keyset pages: only the page on screen is fetched, the next one starts after its last row
+        page = min(st.session_state.quote_page, len(st.session_state.quote_cursors) - 1)
+        try:
+            with metrics.timer("sort"):
+                server_page = get_pager().page(page_size, newest=sort_mode == pipeline.SORT_MODES[0],
+                                               after=st.session_state.quote_cursors[page])
+        except FirebaseError:
+            server_page = Page([], None)
+            st.warning("Couldn't load this page from the database. Try again in a moment.")
+        if not get_write_queue().pending_count():
+            # Adopt the page's quotes (only those that changed) unless local writes are still in flight
+            store.apply_delta({k: q for k, q in server_page.items if isinstance(q, dict) and quotes.get(k) != q}, ())
+            quotes = store.snapshot().quotes
+        view_ids = [qid for qid, _ in server_page.items if qid in quotes]
+        total, has_next = None, server_page.next is not None
+        start, end = page * page_size, page * page_size + len(view_ids)
+        page_ids = view_ids
     else:
-        normalized.sort(key=lambda r: (r[2] or "").lower())
+        # View = index lookups (favourites / collection / search hits) in the chosen order
+        with metrics.timer("filter"):
+            scores = pipeline.search(store, q_search, sort_mode)
+        with metrics.timer("sort"):
+            view_ids = pipeline.select(
+                store,
+                scores,
+                sort_mode,
+                fav_uid=uid if st.session_state.view_mode == "FAV" else None,
+                collection_id=st.session_state.selected_collection_id if st.session_state.view_mode == "COL" else None,
+            )
+        total = len(view_ids)
+        # clamped: the list may have shrunk (deletes)
+        page, page_count, start, end = pipeline.page_window(total, st.session_state.quote_page, page_size)
+        has_next = page < page_count - 1
+        page_ids = view_ids[start:end]
+    st.session_state.quote_page = page
 
     # Title
     with st.container(border=True):
@@ -539,26 +1232,39 @@ if st.session_state.page == "Quotes":
         if st.session_state.view_mode == "COL" and st.session_state.selected_collection_id:
             title = f"📁 {collection_name_by_id.get(st.session_state.selected_collection_id, 'Collection')}"
         st.markdown(f"#### {title}")
-        st.caption(f"{len(normalized)} shown")
-
-    # Render
-    for qid, q_text, q_author, created_raw, is_fav, col_ids in normalized:
+        if store.loading:
+            st.caption(f"Loading library… {len(quotes)} quotes so far")
+        elif total is None:
+            st.caption(f"Page {page + 1} • showing {start + 1 if end > start else 0}–{end}")
+        else:
+            st.caption(f"{total} total • showing {start + 1 if total else 0}–{end}")
+
+    if bulk_mode:
+        render_bulk_bar(view_ids, page_ids)
+
+    # Render (current page only)
+    clipboard_listener()
+    # Normalized records are cached per quote; only new or changed quotes are re-cleaned
+    with metrics.timer("normalize"):
+        cards = pipeline.prepare(store, quotes, page_ids, uid, show_meta)
+    render_started = time.perf_counter()
+    for card in cards:
+        qid, rec, meta_html, is_fav = card.qid, card.record, card.meta_html, card.is_fav
+        q_text, q_author, col_ids = rec.text, rec.author, rec.col_ids
         flash = should_flash(qid)
 
-        safe_quote = html_lib.escape(q_text or "")
-        safe_author = html_lib.escape(q_author or "")
-        label_text = f"“{safe_quote}”" if safe_quote else "“(empty)”"
-
-        meta_bits = []
-        if q_author:
-            meta_bits.append(f"— {safe_author}")
-        if show_meta and created_raw:
-            meta_bits.append(f"Added: {html_lib.escape(pretty_ts(created_raw))}")
-        meta_html = " • ".join(meta_bits)
-
-        to_copy = (q_text or "") + (f" — {q_author}" if q_author else "")
+        label_text = rec.text_html
+        to_copy = rec.copy_text
 
         with st.container(border=True):
+            if bulk_mode:
+                st.checkbox(
+                    "Select",
+                    value=qid in st.session_state.bulk_selected,
+                    key=f"sel_{qid}_{st.session_state.bulk_generation}",
+                    on_change=toggle_bulk_selected,
+                    args=(qid,),
+                )
             st.markdown(
                 f"""
                 <div class="hj-quote-body {'hj-flash' if flash else ''}">
@@ -578,58 +1284,23 @@ if st.session_state.page == "Quotes":
             with a2:
                 fav_label = "💚 Fav" if not is_fav else "✅ Faved"
                 if st.button(fav_label, key=f"fav_{qid}", use_container_width=True):
-                    # optimistic UI first
-                    q = st.session_state.quotes.get(qid, {})
-                    q.setdefault("fav_by", {})
-                    if is_fav:
-                        q["fav_by"].pop(uid, None)
-                        delete_data(f"/quotes/{qid}/fav_by/{uid}")
-                    else:
-                        q["fav_by"][uid] = True
-                        put_value(f"/quotes/{qid}/fav_by/{uid}", True)
-
-                    st.session_state.quotes[qid] = q
+                    # optimistic UI first, write in the background (repeat toggles coalesce)
+                    store.set_fav(qid, uid, not is_fav)
+                    queue_writes(
+                        "favourite",
+                        {f"/quotes/{qid}/fav_by/{uid}": (None if is_fav else True, True if is_fav else None)},
+                    )
+
                     st.session_state.pulse_hero = True
                     mark_last_action(qid)
                     st.rerun()
 
             with a3:
-                with st.expander("📁 Collections", expanded=False):
-                    # Map names <-> ids
-                    name_to_id = {v: k for k, v in collection_name_by_id.items()}
-                    all_names = [collection_name_by_id[cid] for cid in collection_ids_sorted]
-                    current_names = [collection_name_by_id[cid] for cid in col_ids if cid in collection_name_by_id]
-
-                    selected = st.multiselect(
-                        "Add to collections",
-                        options=all_names,
-                        default=current_names,
-                        key=f"ms_{qid}",
-                    )
-
-                    if st.button("Save collections", key=f"save_cols_{qid}", type="primary", use_container_width=True):
-                        desired_ids = set(name_to_id[n] for n in selected if n in name_to_id)
-                        current_ids = set(col_ids)
-
-                        to_add = desired_ids - current_ids
-                        to_remove = current_ids - desired_ids
-
-                        # optimistic local update
-                        q = st.session_state.quotes.get(qid, {})
-                        q.setdefault("collections", {})
-                        for cid in to_add:
-                            q["collections"][cid] = True
-                            put_value(f"/quotes/{qid}/collections/{cid}", True)
-                        for cid in to_remove:
-                            q["collections"].pop(cid, None)
-                            delete_data(f"/quotes/{qid}/collections/{cid}")
-
-                        st.session_state.quotes[qid] = q
-                        st.session_state.pulse_hero = True
-                        mark_last_action(qid)
-                        st.toast("Collections updated ✅")
-                        st.rerun()
-
+                editing = st.session_state.editing_collections_qid == qid
+                if st.button("📁 Collections", key=f"edit_cols_{qid}", type="primary" if editing else "secondary",
+                             use_container_width=True):
+                    st.session_state.editing_collections_qid = None if editing else qid
+                    st.rerun()
             with a4:
                 if st.button("🗑 Delete", key=f"ask_del_{qid}", use_container_width=True):
                     st.session_state.pending_delete_quote_id = qid
@@ -638,13 +1309,35 @@ if st.session_state.page == "Quotes":
                     )
                     st.rerun()
 
+            if editing:
+                render_collection_editor(qid, col_ids)
+    if store.loading:
+        # Placeholders for the rest of the page until the load finishes
+        render_skeleton_cards(min(SKELETON_CARDS, page_size - (end - start)))
+    metrics.observe("render", time.perf_counter() - render_started)
+
+    # Pager
+    if page > 0 or has_next:
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("◀ Prev", disabled=page == 0, use_container_width=True):
+                st.session_state.quote_page = page - 1
+                st.rerun()
+        with p2:
+            st.caption(f"Page {page + 1}" if total is None else f"Page {page + 1} of {page_count}")
+        with p3:
+            if st.button("Next ▶", disabled=not has_next, use_container_width=True):
+                if server_paged:
+                    st.session_state.quote_cursors = st.session_state.quote_cursors[:page + 1] + [server_page.next]
+                st.session_state.quote_page = page + 1
+                st.rerun()
+
 
 # ==========================================
 # ================= CHAT ===================
 # ==========================================
 if st.session_state.page == "Chat":
-    # Auto-refresh ONLY here (this is the main “speed fix”)
-    st_autorefresh(interval=POLL_SECONDS * 1000, key="refresh_chat")
+    chat_live = hub is not None and hub.live("chat")
 
     with st.container(border=True):
         st.subheader("Chat")
@@ -652,9 +1345,22 @@ if st.session_state.page == "Chat":
             st.warning("Set a username in the sidebar to chat.")
 
     if st.session_state.username.strip():
-        # Chat can be fetched live; it’s okay here because the page is already refreshing
-        messages = get_data_cached("/chat") or {}
-        items = sorted(messages.items(), key=lambda x: (x[1].get("ts") or ""))
+        chat_buffer = st.session_state.chat_buffer
+        if sync_chat(chat_buffer):
+            st.session_state.chat_poll.activity()
+        if not chat_live:
+            chat_poller()
+
+        # Older messages (earlier in /chat, then the archive) only when asked for
+        if chat_buffer.has_earlier and chat_buffer.items:
+            if st.button("⬆ Load earlier", key="chat_load_earlier", use_container_width=True):
+                try:
+                    with metrics.timer("chat_fetch"):
+                        if not chat_buffer.load_earlier(get_client()):
+                            st.toast("That's the whole history.")
+                except FirebaseError:
+                    st.toast("Couldn't load earlier messages ❌")
+        items = chat_buffer.messages
 
         if not items:
             st.info("No chat messages yet.")
@@ -676,11 +1382,32 @@ if st.session_state.page == "Chat":
                 sent = st.form_submit_button("Send", use_container_width=True)
 
                 if sent and msg.strip():
-                    requests.post(
-                        fb("/chat"),
-                        json={"user": st.session_state.username.strip(), "text": msg.strip(), "ts": now_iso_z()},
-                        timeout=8,
+                    post_data_return_key(
+                        "/chat",
+                        {"user": st.session_state.username.strip(), "text": msg.strip(), "ts": now_iso_z()},
                     )
+                    if get_shared_cache() is not None:
+                        get_shared_cache().invalidate("chat")
+                    st.session_state.chat_poll.activity()   # and the rerun below shows it at once
                     st.session_state.pulse_hero = True
                     st.toast("Sent ✅")
                     st.rerun()
+
+
+# ---------- Diagnostics (end of a completed rerun) ----------
+metrics.observe("rerun", time.perf_counter() - run_started)
+profile_text = None
+if profiler is not None:
+    profiler.disable()
+    st.session_state.pop("profiler", None)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+    profile_text = out.getvalue()
+if show_diagnostics or profile_text:
+    render_diagnostics(metrics, profile_text)
+
+
+# ---------- Live updates from the listeners / write queue ----------
+st.session_state.live_poll.activity()   # a full rerun: the user (or a change) was just here
+live_watcher(st.session_state.page == "Quotes",
+             st.session_state.page == "Chat" and bool(st.session_state.username.strip()))
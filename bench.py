@@ -0,0 +1,231 @@
+"""Microbenchmarks for the quote pipeline at 1k / 10k / 100k quotes.
+
+Stages (see pipeline.py):
+
+- clean:     clean_quote_text over every quote (legacy HTML included)
+- load:      filling a fresh QuoteStore (search index + secondary indexes)
+- normalize: NormalizedCache cold, then warm (`normalize_warm`)
+- search:    a mix of ranked / unranked queries
+- select:    filter + sort for the usual views
+- prepare:   render-prep of the first pages of those views
+
+Each stage records the best of `--repeat` timings and, in a separate run under
+tracemalloc, its peak memory. Results are saved as JSON (default
+`.bench/<git sha>.json`) and can be compared against an earlier file:
+
+    python bench.py                                   # 1k, 10k, 100k
+    python bench.py --sizes 10000 --compare .bench/1a2b3c4.json --threshold 0.2
+
+With --compare, the exit status is 1 when a stage got slower or bigger by more
+than the threshold (and by more than the noise floor).
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pipeline
+from emulator import seed_data
+from normalize import NormalizedCache, clean_quote_text
+from store import QuoteStore
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+LEGACY_HTML_RATIO = 0.2          # share of quotes with HTML saved into their text
+NOISE_FLOOR_SECONDS = 0.001      # smaller differences are never regressions
+NOISE_FLOOR_KIB = 64
+QUERIES = ["time", "vir", "courage today", "seneca", "marcus aurelius", "zzz", "t"]
+PAGE_SIZE = 20
+
+
+def synthetic_quotes(n: int, legacy_ratio: float = LEGACY_HTML_RATIO, seed: int = 0) -> dict:
+    """`n` quotes shaped like production, a share of them with legacy HTML in the text."""
+    data = seed_data(n, collections=20, chat=0, seed=seed)
+    if not legacy_ratio:
+        return data
+    step = max(1, round(1 / legacy_ratio))
+    for i, q in enumerate(data["quotes"].values()):
+        if i % step:
+            continue
+        if (i // step) % 2:
+            # what the old UI saved: the meta line rendered into the quote itself
+            q["text"] += f' <div class="muted">Added: {q["created_at"]}</div>'
+        else:
+            q["text"] = f"<p>{q['text']}<br></p>  <span>  </span>"
+    return data
+
+
+# ---------- stages ----------
+def _views(uid: str, collection_id: str) -> list[dict]:
+    return [
+        {"sort_mode": "Newest first"},
+        {"sort_mode": "Oldest first"},
+        {"sort_mode": "Author A–Z"},
+        {"sort_mode": "Newest first", "fav_uid": uid},
+        {"sort_mode": "Newest first", "collection_id": collection_id},
+        {"sort_mode": pipeline.BEST_MATCH, "query": "courage"},
+    ]
+
+
+def stages(data: dict) -> list[tuple[str, object, object]]:
+    """(name, setup, run): `setup()` builds fresh state outside the timing, `run(state)` is timed."""
+    quotes = data["quotes"]
+    uid = "user-0"
+    collection_id = next(iter(data["collections"]))
+
+    def loaded_store():
+        store = QuoteStore()
+        for name in ("quotes", "collections"):
+            store.replace(name, data[name])   # what the background load does per tree, minus the threads
+        return store
+
+    warm = loaded_store()
+    for qid, q in quotes.items():
+        warm.records.get(qid, q)
+
+    def select_all(store):
+        out = []
+        for view in _views(uid, collection_id):
+            scores = pipeline.search(store, view.get("query", ""), view["sort_mode"])
+            out.append(pipeline.select(store, scores, view["sort_mode"], fav_uid=view.get("fav_uid"),
+                                       collection_id=view.get("collection_id")))
+        return out
+
+    view_ids = select_all(warm)
+
+    def prepare_all(store):
+        for ids in view_ids:
+            for page in range(3):
+                pipeline.prepare(store, quotes, ids[page * PAGE_SIZE:(page + 1) * PAGE_SIZE], uid)
+
+    def normalize_all(cache):
+        for qid, q in quotes.items():
+            cache.get(qid, q)
+
+    def warm_cache():
+        cache = NormalizedCache()
+        normalize_all(cache)
+        return cache
+
+    return [
+        ("clean", lambda: None, lambda _: [clean_quote_text(q.get("text") or "") for q in quotes.values()]),
+        ("load", lambda: None, lambda _: loaded_store()),
+        ("normalize", NormalizedCache, normalize_all),
+        ("normalize_warm", warm_cache, normalize_all),
+        ("search", lambda: warm, lambda store: [pipeline.search(store, q, pipeline.BEST_MATCH) for q in QUERIES]),
+        ("select", lambda: warm, select_all),
+        ("prepare", lambda: warm, prepare_all),
+    ]
+
+
+def measure(setup, run, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - t0)
+        del state
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = run(state)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    del result, state
+    return {"seconds": round(best, 6), "peak_kib": round(peak / 1024, 1)}
+
+
+def run_suite(sizes, repeat: int = 3, seed: int = 0, log=print) -> dict:
+    results = {}
+    for n in sizes:
+        data = synthetic_quotes(n, seed=seed)
+        results[str(n)] = {}
+        for name, setup, run in stages(data):
+            r = results[str(n)][name] = measure(setup, run, repeat)
+            log(f"{n:>8} {name:<15}{r['seconds'] * 1000:>10.2f} ms{r['peak_kib']:>12.1f} KiB")
+    return results
+
+
+# ---------- saving / comparing ----------
+def _git_sha() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    """Human-readable regressions of `new` against `base` (empty when none)."""
+    found = []
+    for size, stages_new in new["results"].items():
+        for stage, r in stages_new.items():
+            old = base.get("results", {}).get(size, {}).get(stage)
+            if not old:
+                continue
+            checks = (
+                ("time", r["seconds"], old["seconds"], NOISE_FLOOR_SECONDS, "ms", 1000),
+                ("memory", r["peak_kib"], old["peak_kib"], NOISE_FLOOR_KIB, "KiB", 1),
+            )
+            for what, now, before, floor, unit, scale in checks:
+                if now - before > floor and now > before * (1 + threshold):
+                    found.append(
+                        f"{size} {stage} {what}: {before * scale:.2f} -> {now * scale:.2f} {unit} "
+                        f"(+{(now / before - 1) * 100 if before else float('inf'):.0f}%)"
+                    )
+    return found
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--label", help="name for this run (default: git short sha)")
+    ap.add_argument("--out", help="results file (default: .bench/<label>.json)")
+    ap.add_argument("--compare", help="earlier results file to check for regressions")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown / growth (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    label = args.label or _git_sha() or time.strftime("%Y%m%d-%H%M%S")
+    doc = {
+        "label": label,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": run_suite(args.sizes, args.repeat, args.seed),
+    }
+
+    out = args.out or os.path.join(".bench", f"{label}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    print(f"saved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        regressions = compare(base, doc, args.threshold)
+        if regressions:
+            print(f"regressions vs {base.get('label', args.compare)}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regressions vs {base.get('label', args.compare)} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Streaming bulk import / export of quotes.
+
+Import reads JSONL or CSV one row at a time. Each row is validated and its
+text cleaned with `clean_quote_text`, and it gets a push-style key made
+client-side (or keeps its `id` when re-importing an export). Quotes are
+written in multi-path PATCHes of `batch_size`, so 10k quotes take about 20
+requests instead of 10k POSTs. A row whose `id` is already in the database
+only writes the fields it carries, so re-importing a CSV export (which has
+no `fav_by`) keeps every user's favourites. Any other row writes the whole
+quote, with created_at defaulted. The existing ids come from one shallow GET
+of /quotes, made when the first row with an id shows up.
+
+Export pages through /quotes by key, so only one page is in memory at a
+time, and writes JSONL (collections, then quotes) or CSV (quotes only).
+
+    python bulk.py import quotes.csv --batch-size 500
+    python bulk.py export backup.jsonl
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from delta import SERVER_TIMESTAMP
+from normalize import SCHEMA_VERSION, clean_quote_text, parse_iso_z
+from rtdb import FirebaseClient, FirebaseError, push_key
+
+BATCH_SIZE = 500              # quotes per PATCH
+_ALWAYS_WRITTEN = {"text", "updated_at", "schema_version"}   # re-imported quotes: the rest only if in the row
+EXPORT_PAGE = 1000            # quotes per GET while exporting
+MAX_TEXT_CHARS = 5000
+MAX_ERRORS_KEPT = 100
+CSV_FIELDS = ["id", "text", "author", "created_at", "collections"]
+
+_BAD_KEY_CHARS = set("./#$[]")
+
+
+class RowError(ValueError):
+    """A row that can't be imported (reported, then skipped)."""
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    collections: int = 0
+    skipped: int = 0
+    requests: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)   # (row number, reason)
+
+
+def _valid_key(key) -> bool:
+    return isinstance(key, str) and 0 < len(key) <= 768 and not (_BAD_KEY_CHARS & set(key))
+
+
+def _now_iso_z() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _flags(value) -> dict[str, bool]:
+    """{id: True} from a dict, a list or a "a;b;c" string."""
+    if isinstance(value, dict):
+        ids = [k for k, v in value.items() if v]
+    elif isinstance(value, list):
+        ids = value
+    elif isinstance(value, str):
+        ids = [p.strip() for p in value.split(";")]
+    else:
+        ids = []
+    return {k: True for k in ids if _valid_key(k)}
+
+
+# ---------- reading ----------
+def detect_format(name: str) -> str:
+    return "csv" if name.lower().endswith(".csv") else "jsonl"
+
+
+def iter_rows(f, fmt: str):
+    """(row number, dict) from a text stream, without reading it all."""
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(f), start=2):   # line 1 is the header
+            yield n, row
+        return
+    for n, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield n, RowError(f"invalid JSON: {e}")
+            continue
+        yield n, row if isinstance(row, dict) else RowError("not a JSON object")
+
+
+def clean_row(row: dict) -> tuple[str, str, dict]:
+    """(kind, key, payload) for one import row. Raises RowError."""
+    kind = row.get("kind") or "quote"
+    key = row.get("id") or None
+    if key is not None and not _valid_key(key):
+        raise RowError(f"invalid id {key!r}")
+
+    if kind == "collection":
+        name = (row.get("name") or "").strip()
+        if not name or key is None:
+            raise RowError("collection needs an id and a name")
+        return kind, key, {"name": name, "created_at": (row.get("created_at") or "").strip() or _now_iso_z()}
+    if kind != "quote":
+        raise RowError(f"unknown kind {kind!r}")
+
+    text = clean_quote_text(str(row.get("text") or ""))
+    if not text:
+        raise RowError("empty text")
+    if len(text) > MAX_TEXT_CHARS:
+        raise RowError(f"text longer than {MAX_TEXT_CHARS} characters")
+    created = str(row.get("created_at") or "").strip()
+    if created and parse_iso_z(created) is None:
+        raise RowError(f"bad created_at {created!r}")
+    return kind, key or push_key(), {
+        "text": text,
+        "author": str(row.get("author") or "").strip(),
+        "created_at": created or _now_iso_z(),
+        "fav_by": _flags(row.get("fav_by")),
+        "collections": _flags(row.get("collections")),
+        "updated_at": SERVER_TIMESTAMP,
+        "schema_version": SCHEMA_VERSION,
+    }
+
+
+# ---------- import ----------
+def import_quotes(client: FirebaseClient, rows, batch_size: int = BATCH_SIZE, dry_run: bool = False,
+                  on_progress=None) -> ImportResult:
+    """Write rows from `iter_rows()` as batched PATCHes.
+
+    `on_progress(result)` is called after every batch. With `dry_run` rows are
+    validated and counted but nothing is written. A failed PATCH raises
+    FirebaseError; earlier batches stay written, and re-running an import that
+    carries ids is idempotent.
+    """
+    result = ImportResult()
+    batch = client.batch()
+    pending = {"quote": 0, "collection": 0}
+    existing: set[str] | None = None     # quote ids already in the database, fetched on first need
+
+    def flush():
+        if dry_run:
+            batch.updates.clear()
+        elif len(batch):
+            batch.commit()
+            result.requests += 1
+        result.imported += pending["quote"]
+        result.collections += pending["collection"]
+        pending.update(quote=0, collection=0)
+        if on_progress is not None:
+            on_progress(result)
+
+    for n, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            kind, key, payload = clean_row(row)
+        except RowError as e:
+            result.skipped += 1
+            if len(result.errors) < MAX_ERRORS_KEPT:
+                result.errors.append((n, str(e)))
+            continue
+        if kind == "quote" and row.get("id") and existing is None:
+            existing = set(client.get("/quotes", {"shallow": "true"}) or {})
+            result.requests += 1
+        if kind == "quote" and row.get("id") and key in existing:
+            # Leave the fields this row doesn't carry as they are
+            for name, value in payload.items():
+                if name in _ALWAYS_WRITTEN or name in row:
+                    batch.set(f"/quotes/{key}/{name}", value)
+        else:
+            batch.set(f"/{'quotes' if kind == 'quote' else 'collections'}/{key}", payload)
+        pending[kind] += 1
+        if pending["quote"] + pending["collection"] >= batch_size:
+            flush()
+    flush()
+    return result
+
+
+# ---------- export ----------
+def iter_quotes(client: FirebaseClient, page_size: int = EXPORT_PAGE, after: str | None = None):
+    """(key, quote) for every quote (after the key `after`), a page at a time in key order."""
+    for page in client.pages("/quotes", page_size, after=after):
+        for key in sorted(page):
+            yield key, page[key]
+
+
+def export_quotes(client: FirebaseClient, out, fmt: str = "jsonl", page_size: int = EXPORT_PAGE) -> int:
+    """Stream quotes (and, for JSONL, collections) to the text stream `out`. Returns quotes written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for key, q in iter_quotes(client, page_size):
+            q = q if isinstance(q, dict) else {}
+            writer.writerow({
+                "id": key,
+                "text": q.get("text") or "",
+                "author": q.get("author") or "",
+                "created_at": q.get("created_at") or "",
+                "collections": ";".join(sorted(_flags(q.get("collections")))),
+            })
+            count += 1
+        return count
+
+    for cid, c in sorted((client.get("/collections") or {}).items()):
+        if isinstance(c, dict):
+            out.write(json.dumps({"kind": "collection", "id": cid, **c}, ensure_ascii=False) + "\n")
+    for key, q in iter_quotes(client, page_size):
+        if isinstance(q, dict):
+            out.write(json.dumps({"kind": "quote", "id": key, **q}, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+# ---------- command line ----------
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--url", default=os.environ.get("HJ_FIREBASE_DB_URL"),
+                    help="database URL (default: $HJ_FIREBASE_DB_URL)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="import quotes from a JSONL or CSV file ('-' for stdin)")
+    imp.add_argument("file")
+    imp.add_argument("--format", choices=["jsonl", "csv"])
+    imp.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    imp.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    exp = sub.add_parser("export", help="export quotes (and collections) to a file ('-' for stdout)")
+    exp.add_argument("file")
+    exp.add_argument("--format", choices=["jsonl", "csv"])
+    args = ap.parse_args()
+
+    if not args.url:
+        ap.error("no database URL: pass --url or set HJ_FIREBASE_DB_URL")
+    client = FirebaseClient(args.url)
+    fmt = args.format or detect_format(args.file)
+
+    try:
+        if args.command == "import":
+            f = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8-sig", newline="")
+            with f:
+                result = import_quotes(
+                    client, iter_rows(f, fmt), batch_size=args.batch_size, dry_run=args.dry_run,
+                    on_progress=lambda r: print(f"\r{r.imported} quotes, {r.skipped} skipped", end="",
+                                                file=sys.stderr),
+                )
+            print(file=sys.stderr)
+            for n, reason in result.errors:
+                print(f"row {n}: {reason}", file=sys.stderr)
+            print(f"{'validated' if args.dry_run else 'imported'} {result.imported} quotes, "
+                  f"{result.collections} collections, skipped {result.skipped}, {result.requests} requests")
+        else:
+            f = sys.stdout if args.file == "-" else open(args.file, "w", encoding="utf-8", newline="")
+            with f:
+                n = export_quotes(client, f, fmt)
+            print(f"exported {n} quotes", file=sys.stderr)
+    except FirebaseError as e:
+        sys.exit(f"error: {e}")
+
+
+if __name__ == "__main__":
+    main()
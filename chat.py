@@ -0,0 +1,206 @@
+"""Incremental chat sync, retention and the day-bucketed archive.
+
+Chat messages are pushed with POST, so their keys are RTDB push IDs that sort
+chronologically. That lets us page through `/chat` with `orderBy="$key"`
+(no `.indexOn` rule needed): the first load asks for the last N messages and
+every later poll asks only for keys after the newest one we already hold.
+
+Retention: `/chat` only keeps the newest KEEP_LIVE messages. `compact()` moves
+older ones to `/chat_archive/<YYYY-MM-DD>/<key>`, a chunk at a time, each
+chunk as one atomic multi-path PATCH (copy + delete). Sessions hold a bounded
+live tail and page backwards on demand ("load earlier"): first through
+`/chat`, then through the archive, newest day first.
+
+Polling (when the chat listener is down) follows a `PollSchedule` per
+session: the base interval right after activity, then backing off while the
+room is quiet.
+"""
+
+import threading
+import time
+
+from rtdb import PUSH_CHARS, FirebaseClient, FirebaseError
+
+CHAT_PATH = "/chat"
+ARCHIVE_PATH = "/chat_archive"
+INITIAL_LIMIT = 50        # messages fetched on the first load of a session
+BUFFER_LIMIT = 200        # live messages a session keeps; older ones are dropped
+EARLIER_PAGE = 50         # messages per "load earlier"
+KEEP_LIVE = 500           # messages left in /chat by compaction
+COMPACT_CHUNK = 500       # messages moved per PATCH
+COMPACT_INTERVAL_SECONDS = 600
+POLL_BACKOFF = 2.0        # interval multiplier per poll that brought nothing
+
+
+def key_time_ms(key: str) -> int | None:
+    """Creation time encoded in the first 8 characters of a push ID."""
+    if len(key) < 8:
+        return None
+    ms = 0
+    for ch in key[:8]:
+        i = PUSH_CHARS.find(ch)
+        if i < 0:
+            return None
+        ms = ms * 64 + i
+    return ms
+
+
+def day_of(key: str, msg: dict) -> str:
+    """Archive bucket (YYYY-MM-DD, UTC) of a message: its `ts`, else its push ID time."""
+    ts = (msg.get("ts") or "").strip() if isinstance(msg, dict) else ""
+    if len(ts) >= 10 and ts[4] == "-" and ts[7] == "-":
+        return ts[:10]
+    ms = key_time_ms(key)
+    return time.strftime("%Y-%m-%d", time.gmtime(ms / 1000)) if ms is not None else "unknown"
+
+
+class PollSchedule:
+    """Per-session chat poll interval: `base` after activity, x`backoff` per quiet poll, up to `cap`."""
+
+    def __init__(self, base: float, cap: float, backoff: float = POLL_BACKOFF):
+        self.base = base
+        self.cap = max(base, cap)
+        self.backoff = backoff
+        self.quiet_polls = 0
+
+    @property
+    def interval(self) -> float:
+        if self.backoff <= 1:
+            return self.base
+        return min(self.cap, self.base * self.backoff ** self.quiet_polls)
+
+    def record(self, arrived: int):
+        """Account for one poll that brought `arrived` messages."""
+        if arrived:
+            self.quiet_polls = 0
+        elif self.interval < self.cap:
+            self.quiet_polls += 1
+
+    def activity(self):
+        """Something happened in this session (e.g. it sent a message): back to the base interval."""
+        self.quiet_polls = 0
+
+
+class ChatBuffer:
+    """Per-session chat state: a bounded live tail plus history loaded on demand."""
+
+    def __init__(self, initial_limit: int = INITIAL_LIMIT, max_size: int = BUFFER_LIMIT):
+        self.initial_limit = initial_limit
+        self.max_size = max_size
+        self.items: list[tuple[str, dict]] = []     # live tail, oldest first
+        self.history: list[tuple[str, dict]] = []   # "load earlier" pages, oldest first
+        self.cursor: str | None = None   # newest key seen
+        self.has_earlier = True          # False once /chat and the archive are exhausted
+        self._days: list[str] | None = None
+
+    @property
+    def messages(self) -> list[tuple[str, dict]]:
+        return self.history + self.items
+
+    def sync(self, client: FirebaseClient) -> int:
+        """Fetch messages newer than the cursor and append them. Returns how many arrived."""
+        if self.cursor is None:
+            fresh = client.query(CHAT_PATH, "$key", limit_to_last=self.initial_limit)
+        else:
+            # startAt is inclusive, so the cursor itself comes back and is skipped below
+            fresh = client.query(CHAT_PATH, "$key", start_at=self.cursor)
+        return self.extend(fresh)
+
+    def extend(self, messages: dict) -> int:
+        new = sorted(
+            (k, m) for k, m in (messages or {}).items()
+            if isinstance(m, dict) and (self.cursor is None or k > self.cursor)
+        )
+        if not new:
+            return 0
+        self.items.extend(new)
+        if len(self.items) > self.max_size:
+            del self.items[: len(self.items) - self.max_size]
+            # History no longer joins up with the tail; paging restarts from the tail
+            self.history.clear()
+            self.has_earlier = True
+        self.cursor = new[-1][0]
+        return len(new)
+
+    def load_earlier(self, client: FirebaseClient, limit: int = EARLIER_PAGE) -> int:
+        """Prepend up to `limit` messages older than the oldest one held. Returns how many."""
+        oldest = self.messages[0] if self.messages else None
+        if oldest is None:
+            return 0
+        older = self._older(client, CHAT_PATH, oldest[0], limit)
+        if not older:
+            if self._days is None:
+                self._days = sorted(client.get(ARCHIVE_PATH, {"shallow": "true"}) or {})
+            for day in reversed([d for d in self._days if d <= day_of(*oldest)]):
+                older = self._older(client, f"{ARCHIVE_PATH}/{day}", oldest[0], limit)
+                if older:
+                    break
+        if not older:
+            self.has_earlier = False
+            return 0
+        self.history[:0] = older
+        return len(older)
+
+    @staticmethod
+    def _older(client: FirebaseClient, path: str, before: str, limit: int) -> list[tuple[str, dict]]:
+        # endAt is inclusive: ask for one extra and drop `before` itself
+        page = client.query(path, "$key", end_at=before, limit_to_last=limit + 1)
+        return sorted((k, m) for k, m in page.items() if k < before and isinstance(m, dict))
+
+
+def compact(client: FirebaseClient, keep: int = KEEP_LIVE, chunk: int = COMPACT_CHUNK) -> int:
+    """Move all but the newest `keep` messages of /chat into the archive. Returns how many moved.
+
+    Safe to run from several processes at once: moving a message twice
+    writes the same archive value and deletes an already missing key.
+    """
+    keys = sorted(client.get(CHAT_PATH, {"shallow": "true"}) or {})
+    if len(keys) <= keep:
+        return 0
+    cutoff = keys[len(keys) - keep - 1]
+    moved = 0
+    while True:
+        page = client.query(CHAT_PATH, "$key", end_at=cutoff, limit_to_first=chunk)
+        if not page:
+            break
+        batch = client.batch()
+        for key, msg in page.items():
+            if isinstance(msg, dict):
+                batch.set(f"{ARCHIVE_PATH}/{day_of(key, msg)}/{key}", msg)
+            batch.delete(f"{CHAT_PATH}/{key}")
+        batch.commit()
+        moved += len(page)
+        if len(page) < chunk:
+            break
+    return moved
+
+
+class ChatCompactor:
+    """Background thread that runs `compact()` every `interval` seconds."""
+
+    def __init__(self, client: FirebaseClient, interval: float = COMPACT_INTERVAL_SECONDS, keep: int = KEEP_LIVE):
+        self.client = client
+        self.interval = interval
+        self.keep = keep
+        self.last_error: str | None = None
+        self.stats = {"runs": 0, "moved": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chat-compactor", daemon=True)
+
+    def start(self) -> "ChatCompactor":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.stats["moved"] += compact(self.client, self.keep)
+                self.last_error = None
+            except FirebaseError as e:
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+            self.stats["runs"] += 1
+            self._stop.wait(self.interval)
@@ -0,0 +1,117 @@
+"""Delta sync for /quotes.
+
+Instead of re-downloading the whole tree (every quote with every user's
+`fav_by` map), a sync round costs:
+
+1. `?shallow=true` on /quotes: just the key set, diffed against local state
+   to find added and deleted quotes;
+2. one GET per new quote;
+3. `orderBy="updated_at"&startAt=<marker>`: only quotes changed since the
+   newest `updated_at` we hold.
+
+The app's own writes stamp `updated_at` with the RTDB server timestamp
+(`updated_at_stamps` is hooked into the write queue), so edits made by any
+session show up in step 3. Querying by `updated_at` needs
+`".indexOn": ["updated_at"]` on /quotes. Without it, RTDB answers 400 and
+the caller should fall back to a full download.
+"""
+
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from rtdb import FirebaseClient
+
+SERVER_TIMESTAMP = {".sv": "timestamp"}
+FETCH_WORKERS = 8
+MAX_SINGLE_FETCHES = 500       # more new quotes than this: a full download is cheaper
+
+
+@dataclass
+class QuoteDelta:
+    upserts: dict[str, dict] = field(default_factory=dict)
+    removed: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.upserts or self.removed)
+
+
+class TooManyChanges(Exception):
+    """The delta is big enough that a full download is the better choice."""
+
+
+def _marker(q) -> int | None:
+    v = q.get("updated_at") if isinstance(q, Mapping) else None
+    return v if isinstance(v, int) else None
+
+
+def updated_at_stamps(paths) -> dict[str, object]:
+    """`updated_at` server-timestamp writes for every quote a round of writes edits.
+
+    Whole-quote writes (add/delete) are skipped: stamping below them would
+    overlap in the same PATCH, and a deleted quote has nothing to stamp.
+    """
+    whole: set[str] = set()
+    touched: set[str] = set()
+    for path in paths:
+        parts = path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "quotes":
+            continue
+        if len(parts) == 2:
+            whole.add(parts[1])
+        elif parts[2] != "updated_at":
+            touched.add(parts[1])
+    return {f"/quotes/{qid}/updated_at": SERVER_TIMESTAMP for qid in touched - whole}
+
+
+class QuoteDeltaSync:
+    def __init__(self, client: FirebaseClient):
+        self.client = client
+        self.marker: int | None = None    # newest updated_at already applied
+
+    def _seed_marker(self, local):
+        if self.marker is None:
+            markers = [m for m in map(_marker, local.values()) if m is not None]
+            self.marker = max(markers) if markers else 0
+
+    def _fetch_one(self, qid: str):
+        return qid, self.client.get(f"/quotes/{qid}")
+
+    def diff(self, local) -> QuoteDelta:
+        """What changed on the server relative to `local` (a qid -> quote mapping).
+
+        Raises FirebaseError on network errors (status 400 means the
+        updated_at index is missing), and TooManyChanges when too many quotes
+        are new to fetch them one by one.
+        """
+        self._seed_marker(local)
+        delta = QuoteDelta()
+
+        keys = self.client.get("/quotes", {"shallow": "true"}) or {}
+        delta.removed = [qid for qid in local if qid not in keys]
+        new_ids = [qid for qid in keys if qid not in local]
+        if len(new_ids) > MAX_SINGLE_FETCHES:
+            raise TooManyChanges(f"{len(new_ids)} new quotes")
+
+        changed = self.client.query("/quotes", "updated_at", start_at=self.marker)
+        for qid, q in changed.items():
+            # startAt is inclusive: the quote at the marker comes back every round
+            if qid in keys and isinstance(q, dict) and local.get(qid) != q:
+                delta.upserts[qid] = q
+
+        missing = [qid for qid in new_ids if qid not in delta.upserts]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(missing))) as pool:
+                for qid, q in pool.map(self._fetch_one, missing):
+                    if isinstance(q, dict):
+                        delta.upserts[qid] = q
+
+        markers = [m for m in map(_marker, delta.upserts.values()) if m is not None]
+        if markers:
+            self.marker = max([self.marker or 0] + markers)
+        return delta
+
+    def reset(self, quotes):
+        """Re-seed the marker after a full download."""
+        self.marker = None
+        self._seed_marker(quotes)
@@ -0,0 +1,431 @@
+"""Local stand-in for the Firebase Realtime Database REST API.
+
+Implements the subset the app uses, so it can be load-tested without
+touching the real project:
+
+- GET / PUT / POST / PATCH / DELETE on `<path>.json`, `print=silent`;
+- `shallow=true`, `orderBy` ("$key", "$value" or a child) with
+  `startAt` / `endAt` / `equalTo` / `limitToFirst` / `limitToLast`;
+- `X-Firebase-ETag` / `If-None-Match` (304 when unchanged);
+- `{".sv": "timestamp"}` server values and chronological push keys;
+- `text/event-stream` listeners (`put` / `keep-alive` events);
+- optionally, the `.indexOn` entries of a rules file (e.g. database.indexes.json):
+  ordering by a child that isn't indexed then fails with 400, as on RTDB.
+
+Latency, jitter and error rate can be injected per request. `seed_data()`
+builds a library of any size with adjustable payloads.
+
+    python emulator.py --port 9000 --quotes 10000 --latency-ms 40 --rules database.indexes.json
+    HJ_FIREBASE_DB_URL=http://127.0.0.1:9000 streamlit run app.py
+"""
+
+import argparse
+import hashlib
+import json
+import queue
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from rtdb import push_key
+
+KEEPALIVE_SECONDS = 30
+
+
+def _split(path: str) -> list[str]:
+    if path.endswith(".json"):
+        path = path[:-5]
+    return [p for p in path.strip("/").split("/") if p]
+
+
+def _within(inner: list[str], outer: list[str]) -> bool:
+    return inner[: len(outer)] == outer
+
+
+def _prune(node):
+    """Drop empty objects and nulls, as RTDB never stores them."""
+    if isinstance(node, dict):
+        out = {k: v for k, v in ((k, _prune(v)) for k, v in node.items()) if v is not None}
+        return out or None
+    return node
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _event(name: str, data) -> bytes:
+    return f"event: {name}\ndata: ".encode() + _encode(data) + b"\n\n"
+
+
+def _order_value(v):
+    # RTDB ordering: null < false < true < numbers < strings < objects
+    if v is None:
+        return (0, 0)
+    if v is False:
+        return (1, 0)
+    if v is True:
+        return (2, 0)
+    if isinstance(v, (int, float)):
+        return (3, v)
+    if isinstance(v, str):
+        return (4, v)
+    return (5, 0)
+
+
+def indexes_from_rules(rules: dict) -> dict[str, set[str]]:
+    """"/path" -> indexed children, from the `.indexOn` entries of a parsed rules file."""
+    out: dict[str, set[str]] = {}
+
+    def walk(node, path):
+        if not isinstance(node, dict):
+            return
+        index_on = node.get(".indexOn")
+        if index_on:
+            out[path or "/"] = {index_on} if isinstance(index_on, str) else set(index_on)
+        for key, child in node.items():
+            if not key.startswith("."):
+                walk(child, f"{path}/{key}")
+
+    walk(rules.get("rules", rules), "")
+    return out
+
+
+class Emulator:
+    def __init__(self, data: dict | None = None, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, indexes: dict[str, set[str]] | None = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # None: every child can be ordered by; otherwise "/path" -> indexed children (else 400)
+        self.indexes = indexes
+
+        self._lock = threading.RLock()
+        self._root = _prune(data or {}) or {}
+        self._subs: list[tuple[list[str], dict, queue.Queue]] = []
+        self.stats: dict[str, int] = {}
+
+    # ---------- data ----------
+    def _node(self, parts: list[str]):
+        node = self._root
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def _set(self, parts: list[str], value):
+        value = _prune(self._server_values(value))
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        chain = [self._root]
+        node = self._root
+        for p in parts[:-1]:
+            child = node.get(p)
+            if not isinstance(child, dict):
+                if value is None:
+                    return  # deleting below something that doesn't exist
+                child = node[p] = {}
+            node = child
+            chain.append(node)
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+        # Parents left empty by a delete disappear too
+        for depth in range(len(parts) - 1, 0, -1):
+            if chain[depth]:
+                break
+            chain[depth - 1].pop(parts[depth - 1], None)
+
+    def _server_values(self, value):
+        if value == {".sv": "timestamp"}:
+            return int(time.time() * 1000)
+        if isinstance(value, dict):
+            return {k: self._server_values(v) for k, v in value.items()}
+        return value
+
+    def view(self, parts: list[str], q: dict):
+        node = self._node(parts)
+        if not isinstance(node, dict):
+            return node
+        if q.get("shallow") == "true":
+            return {k: (True if isinstance(v, dict) else v) for k, v in node.items()}
+        if "orderBy" not in q:
+            return node
+
+        order_by = json.loads(q["orderBy"])
+        if order_by == "$key":
+            def key_of(item):
+                return (4, item[0])
+        elif order_by == "$value":
+            def key_of(item):
+                return _order_value(item[1])
+        else:
+            indexed = None if self.indexes is None else self.indexes.get("/" + "/".join(parts), set())
+            if indexed is not None and order_by not in indexed:
+                raise ValueError(f'Index not defined, add ".indexOn": "{order_by}", for path '
+                                 f'"/{"/".join(parts)}", to the rules')
+
+            def key_of(item):
+                v = item[1]
+                return _order_value(v.get(order_by) if isinstance(v, dict) else None)
+
+        items = sorted(node.items(), key=lambda item: (key_of(item), item[0]))
+        if "equalTo" in q:
+            eq = _order_value(json.loads(q["equalTo"])) if order_by != "$key" else (4, json.loads(q["equalTo"]))
+            items = [i for i in items if key_of(i) == eq]
+        if "startAt" in q:
+            lo = json.loads(q["startAt"])
+            lo = (4, lo) if order_by == "$key" else _order_value(lo)
+            items = [i for i in items if key_of(i) >= lo]
+        if "endAt" in q:
+            hi = json.loads(q["endAt"])
+            hi = (4, hi) if order_by == "$key" else _order_value(hi)
+            items = [i for i in items if key_of(i) <= hi]
+        if "limitToFirst" in q:
+            items = items[: int(q["limitToFirst"])]
+        if "limitToLast" in q:
+            items = items[-int(q["limitToLast"]):] if int(q["limitToLast"]) else []
+        return dict(items)
+
+    # ---------- listeners ----------
+    def subscribe(self, parts: list[str], q: dict) -> queue.Queue:
+        events: queue.Queue = queue.Queue()
+        with self._lock:
+            self.stats["STREAM"] = self.stats.get("STREAM", 0) + 1
+            events.put(_event("put", {"path": "/", "data": self.view(parts, q)}))
+            self._subs.append((parts, q, events))
+        return events
+
+    def unsubscribe(self, events: queue.Queue):
+        with self._lock:
+            self._subs = [s for s in self._subs if s[2] is not events]
+
+    def _notify(self, written: list[list[str]]):
+        for parts, q, events in self._subs:
+            if not any(_within(w, parts) or _within(parts, w) for w in written):
+                continue
+            filtered = any(k in q for k in ("orderBy", "shallow"))
+            if filtered or any(_within(parts, w) for w in written):
+                # Query windows and writes above the listener: resend the whole view
+                events.put(_event("put", {"path": "/", "data": self.view(parts, q)}))
+                continue
+            for w in written:
+                rel = w[len(parts):]
+                events.put(_event("put", {"path": "/" + "/".join(rel), "data": self._node(w)}))
+
+    # ---------- requests ----------
+    def handle(self, method: str, parts: list[str], q: dict, body, headers) -> tuple[int, bytes, dict]:
+        """One REST call -> (status, encoded body, extra headers).
+
+        Bodies are encoded under the lock: views share the live tree.
+        """
+        with self._lock:
+            self.stats[method] = self.stats.get(method, 0) + 1
+            if method == "GET":
+                try:
+                    data = _encode(self.view(parts, q))
+                except ValueError as e:
+                    return 400, _encode({"error": str(e)}), {}
+                extra = {}
+                if headers.get("X-Firebase-ETag") == "true":
+                    etag = hashlib.sha1(data).hexdigest()
+                    extra["ETag"] = etag
+                    if headers.get("If-None-Match") == etag:
+                        return 304, b"", extra
+                return 200, data, extra
+
+            if method == "PUT":
+                self._set(parts, body)
+                written, result = [parts], self._node(parts)
+            elif method == "POST":
+                key = push_key()
+                self._set(parts + [key], body)
+                written, result = [parts + [key]], {"name": key}
+            elif method == "PATCH":
+                if not isinstance(body, dict):
+                    return 400, _encode({"error": "PATCH body must be an object"}), {}
+                written = [parts + _split(k) for k in body]
+                for w, v in zip(written, body.values()):
+                    self._set(w, v)
+                result = self._node(parts)
+            elif method == "DELETE":
+                self._set(parts, None)
+                written, result = [parts], None
+            else:
+                return 405, _encode({"error": f"{method} not supported"}), {}
+            self._notify(written)
+            if q.get("print") == "silent":
+                return 204, b"", {}
+            return 200, _encode(result), {}
+
+    def serve(self, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Start serving from a daemon thread; the URL is http://host:<server.server_address[1]>."""
+        server = ThreadingHTTPServer((host, port), _handler_for(self))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="rtdb-emulator", daemon=True).start()
+        return server
+
+
+def _handler_for(emu: Emulator):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, data: bytes, extra: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, method: str):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+
+            delay = emu.latency_ms + random.random() * emu.jitter_ms
+            if delay:
+                time.sleep(delay / 1000)
+            if emu.error_rate and random.random() < emu.error_rate:
+                self._reply(503, _encode({"error": "injected failure"}))
+                return
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                self._reply(400, _encode({"error": "Invalid data; couldn't parse JSON object."}))
+                return
+            self._reply(*emu.handle(method, _split(url.path), q, body, self.headers))
+
+        def _stream(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            events = emu.subscribe(_split(url.path), q)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                while True:
+                    try:
+                        chunk = events.get(timeout=KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        chunk = _event("keep-alive", None)
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+            except OSError:
+                pass  # listener went away
+            finally:
+                emu.unsubscribe(events)
+                self.close_connection = True
+
+        def do_GET(self):
+            if "text/event-stream" in (self.headers.get("Accept") or ""):
+                self._stream()
+            else:
+                self._handle("GET")
+
+        def do_PUT(self):
+            self._handle("PUT")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+        def do_DELETE(self):
+            self._handle("DELETE")
+
+    return Handler
+
+
+def seed_data(quotes: int = 1000, collections: int = 10, chat: int = 200, text_bytes: int = 120,
+              favs_per_quote: int = 2, users: int = 50, seed: int = 0) -> dict:
+    """A synthetic library shaped like the app's data (sizes are tunable)."""
+    rnd = random.Random(seed)
+    words = ["time", "mind", "virtue", "nature", "fortune", "change", "fear", "courage", "today", "reason",
+             "death", "joy", "habit", "truth", "patience", "silence", "work", "friend", "soul", "path"]
+    authors = ["Marcus Aurelius", "Seneca", "Epictetus", "Lao Tzu", "Confucius", "Rumi", "Anonymous"]
+    uids = [f"user-{i}" for i in range(users)]
+    col_ids = [f"-col{i:04d}" for i in range(collections)]
+
+    def text() -> str:
+        out = []
+        while sum(len(w) + 1 for w in out) < text_bytes:
+            out.append(rnd.choice(words))
+        return " ".join(out).capitalize() + "."
+
+    def seconds(i: int) -> int:
+        return 1_600_000_000 + i * 3600
+
+    def stamp(i: int) -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds(i)))
+
+    # Real push keys made at the item's time: they sort before anything pushed today,
+    # like old data would, so new chat messages and quotes land after the seeded ones
+    return {
+        "quotes": {
+            push_key(seconds(i) * 1000): {
+                "text": text(),
+                "author": rnd.choice(authors),
+                "created_at": stamp(i),
+                "fav_by": {uid: True for uid in rnd.sample(uids, min(favs_per_quote, users))},
+                "collections": {cid: True for cid in rnd.sample(col_ids, min(1, collections))} if i % 3 == 0 else {},
+            }
+            for i in range(quotes)
+        },
+        "collections": {cid: {"name": f"Collection {i}", "created_at": stamp(i)} for i, cid in enumerate(col_ids)},
+        "chat": {
+            push_key(seconds(i) * 1000): {"user": rnd.choice(uids), "text": text()[:60], "ts": stamp(i)}
+            for i in range(chat)
+        },
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    ap.add_argument("--quotes", type=int, default=1000)
+    ap.add_argument("--collections", type=int, default=10)
+    ap.add_argument("--chat", type=int, default=200)
+    ap.add_argument("--text-bytes", type=int, default=120)
+    ap.add_argument("--favs-per-quote", type=int, default=2)
+    ap.add_argument("--load", help="start from this JSON export instead of synthetic data")
+    ap.add_argument("--rules", help="enforce the .indexOn entries of this rules file (e.g. database.indexes.json)")
+    args = ap.parse_args()
+
+    if args.load:
+        with open(args.load, encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        data = seed_data(args.quotes, args.collections, args.chat, args.text_bytes, args.favs_per_quote)
+    indexes = None
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            indexes = indexes_from_rules(json.load(f))
+    emu = Emulator(data, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                   indexes=indexes)
+    server = emu.serve(args.port, args.host)
+    print(f"RTDB emulator on http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Secondary indexes over the quote library, stored column-wise.
+
+Maintained by the store next to the quotes themselves, so the list views no
+longer scan and re-sort every quote per rerun. Each quote gets an integer row;
+per-row data lives in flat columns instead of one small object per quote:
+
+- created_at as epoch milliseconds in an `array('q')`
+- the lowercased author as an interned string (one copy per distinct author)
+- collection membership as one bitset (`bytearray`) per integer-coded collection
+- user id -> set of favourited rows
+- rows ordered by (created_at, id) and by (author, id) in `array('l')`, kept
+  sorted with bisect
+
+The previous version of each quote (the store never mutates one in place) says
+which favourites and collections to unlink when it changes, so no per-row
+copies of those are kept. A view is then set / bit tests over rows and an
+ordered walk or a small sort of just the matching rows.
+"""
+
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import timezone
+
+from normalize import parse_iso_z
+
+SORT_NEWEST = "newest"
+SORT_OLDEST = "oldest"
+SORT_AUTHOR = "author"
+
+NO_TIME = -(2 ** 62)          # created_at missing or unreadable: sorts as the oldest
+
+_EMPTY: frozenset = frozenset()
+
+
+def epoch_ms(iso_z: str) -> int:
+    dt = parse_iso_z(iso_z.strip()) if iso_z else None
+    if dt is None:
+        return NO_TIME
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _flags(value) -> list[str]:
+    return [k for k, v in value.items() if v] if isinstance(value, dict) else []
+
+
+class QuoteIndexes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}         # qid -> row
+        self._free: list[int] = []               # rows of removed quotes, reused first
+        self._qid: list[str | None] = []         # row -> qid
+        self._source: list[dict | None] = []     # row -> quote dict it was indexed from
+        self._created = array("q")               # row -> epoch ms
+        self._author: list[str] = []             # row -> interned lowercase author
+        self._col_code: dict[str, int] = {}      # collection id -> code
+        self._col_bits: list[bytearray] = []     # code -> membership bitset over rows
+        self._col_size: list[int] = []           # code -> member count
+        self._favs: dict[str, set[int]] = {}     # uid -> rows
+        self._by_created = array("l")            # rows sorted by (created, qid)
+        self._by_author = array("l")             # rows sorted by (author, qid)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ---------- row keys ----------
+    def _created_key(self, row: int):
+        return self._created[row], self._qid[row]
+
+    def _author_key(self, row: int):
+        return self._author[row], self._qid[row]
+
+    def _order_insert(self, order: array, row: int, key):
+        order.insert(bisect_left(order, key(row), key=key), row)
+
+    def _order_remove(self, order: array, row: int, key):
+        i = bisect_left(order, key(row), key=key)
+        if i < len(order) and order[i] == row:
+            del order[i]
+
+    # ---------- bitsets ----------
+    def _code(self, cid: str) -> int:
+        code = self._col_code.get(cid)
+        if code is None:
+            code = self._col_code[cid] = len(self._col_bits)
+            self._col_bits.append(bytearray())
+            self._col_size.append(0)
+        return code
+
+    def _set_bit(self, code: int, row: int, on: bool):
+        bits = self._col_bits[code]
+        i, mask = row >> 3, 1 << (row & 7)
+        if i >= len(bits):
+            if not on:
+                return
+            bits.extend(bytes(i + 1 - len(bits)))
+        if bool(bits[i] & mask) == on:
+            return
+        bits[i] ^= mask
+        self._col_size[code] += 1 if on else -1
+
+    def _bit_rows(self, code: int):
+        """Rows whose bit is set, lazily (only walked if this restriction drives the scan)."""
+        for i, byte in enumerate(self._col_bits[code]):
+            if byte:
+                base = i << 3
+                for j in range(8):
+                    if byte >> j & 1:
+                        yield base + j
+
+    def _has_bit(self, code: int, row: int) -> bool:
+        bits = self._col_bits[code]
+        i = row >> 3
+        return i < len(bits) and bool(bits[i] & (1 << (row & 7)))
+
+    # ---------- maintenance ----------
+    def _new_row(self, qid: str) -> int:
+        if self._free:
+            row = self._free.pop()
+            self._qid[row] = qid
+        else:
+            row = len(self._qid)
+            self._qid.append(qid)
+            self._source.append(None)
+            self._created.append(NO_TIME)
+            self._author.append("")
+        self._rows[qid] = row
+        return row
+
+    def _unlink_members(self, row: int, old: dict, new: dict | None):
+        new = new or {}
+        for uid in set(_flags(old.get("fav_by"))) - set(_flags(new.get("fav_by"))):
+            rows = self._favs.get(uid)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._favs[uid]
+        for cid in set(_flags(old.get("collections"))) - set(_flags(new.get("collections"))):
+            code = self._col_code.get(cid)
+            if code is not None:
+                self._set_bit(code, row, False)
+
+    def _put(self, qid: str, q: dict, lists: bool = True):
+        row = self._rows.get(qid)
+        old = self._source[row] if row is not None else None
+        if old is q:
+            return
+        if row is None:
+            row = self._new_row(qid)
+        created = epoch_ms(q.get("created_at") or "")
+        author = sys.intern((q.get("author") or "").strip().lower())
+
+        if old is not None:
+            self._unlink_members(row, old, q)
+        if old is None or created != self._created[row]:
+            if lists and old is not None:
+                self._order_remove(self._by_created, row, self._created_key)
+            self._created[row] = created
+            if lists:
+                self._order_insert(self._by_created, row, self._created_key)
+        if old is None or author != self._author[row]:
+            if lists and old is not None:
+                self._order_remove(self._by_author, row, self._author_key)
+            self._author[row] = author
+            if lists:
+                self._order_insert(self._by_author, row, self._author_key)
+        for uid in _flags(q.get("fav_by")):
+            self._favs.setdefault(uid, set()).add(row)
+        for cid in _flags(q.get("collections")):
+            self._set_bit(self._code(cid), row, True)
+        self._source[row] = q
+
+    def _remove(self, qid: str, lists: bool = True):
+        row = self._rows.pop(qid, None)
+        if row is None:
+            return
+        if lists:
+            self._order_remove(self._by_created, row, self._created_key)
+            self._order_remove(self._by_author, row, self._author_key)
+        self._unlink_members(row, self._source[row] or {}, None)
+        self._qid[row] = None
+        self._source[row] = None
+        self._created[row] = NO_TIME
+        self._author[row] = ""
+        self._free.append(row)
+
+    def _resort(self):
+        rows = sorted(self._rows.values(), key=self._created_key)
+        self._by_created = array("l", rows)
+        rows.sort(key=self._author_key)
+        self._by_author = array("l", rows)
+
+    def put(self, qid: str, q: dict):
+        """Index a new or changed quote (bisect insert/remove only for keys that moved)."""
+        with self._lock:
+            self._put(qid, q)
+
+    def remove(self, qid: str):
+        with self._lock:
+            self._remove(qid)
+
+    def sync(self, quotes):
+        """Bring the indexes in line with a full quotes tree, touching only what changed."""
+        with self._lock:
+            gone = [qid for qid in self._rows if qid not in quotes]
+            changed = [
+                (qid, q) for qid, q in quotes.items()
+                if qid not in self._rows or self._source[self._rows[qid]] is not q
+            ]
+            # Many changes (first load, big reload): re-sort once instead of bisecting each
+            bulk = len(gone) + len(changed) > max(64, len(self._rows) // 16)
+            for qid in gone:
+                self._remove(qid, lists=not bulk)
+            for qid, q in changed:
+                self._put(qid, q or {}, lists=not bulk)
+            if bulk:
+                self._resort()
+
+    # ---------- queries ----------
+    def is_fav(self, qid: str, uid: str) -> bool:
+        row = self._rows.get(qid)
+        return row is not None and row in self._favs.get(uid, _EMPTY)
+
+    def query(self, *, fav_uid: str | None = None, collection_id: str | None = None, within=None,
+              sort: str = SORT_NEWEST) -> list[str]:
+        """Ordered quote ids for a view.
+
+        `fav_uid` / `collection_id` restrict to those index sets, `within` to
+        any container of ids (e.g. search hits); all restrictions are ANDed.
+        """
+        with self._lock:
+            order = self._by_author if sort == SORT_AUTHOR else self._by_created
+            newest = sort == SORT_NEWEST
+            qids = self._qid
+
+            # (size, rows, membership test) per restriction; the smallest drives the scan
+            tests = []
+            if fav_uid is not None:
+                fav_rows = self._favs.get(fav_uid, _EMPTY)
+                tests.append((len(fav_rows), fav_rows, fav_rows.__contains__))
+            if collection_id is not None:
+                code = self._col_code.get(collection_id)
+                if code is None:
+                    return []
+                tests.append((self._col_size[code], self._bit_rows(code),
+                              lambda row, code=code: self._has_bit(code, row)))
+            if within is not None:
+                rows = self._rows
+                tests.append((len(within), (rows[qid] for qid in within if qid in rows),
+                              lambda row: qids[row] in within))
+
+            if not tests:
+                return [qids[row] for row in (reversed(order) if newest else order)]
+
+            tests.sort(key=lambda t: t[0])
+            if tests[0][0] * 8 >= len(order):
+                # Many candidates: walk the pre-sorted rows, testing each
+                checks = [check for _, _, check in tests]
+                ids = [qids[row] for row in order if all(check(row) for check in checks)]
+                if newest:
+                    ids.reverse()
+                return ids
+            # Few: collect them from the smallest restriction and sort just those
+            checks = [check for _, _, check in tests[1:]]
+            members = [row for row in tests[0][1] if all(check(row) for check in checks)]
+            members.sort(key=self._author_key if sort == SORT_AUTHOR else self._created_key, reverse=newest)
+            return [qids[row] for row in members]
@@ -0,0 +1,139 @@
+"""Server-side ordered, keyset-paged reads of /quotes.
+
+The in-memory views need every quote downloaded and sorted locally.
+`QuotePager` instead asks RTDB for the one page on screen, ordered by a
+child (`orderBy="created_at"` with `limitToFirst` / `limitToLast`), and moves
+between pages with keyset cursors: the (created_at, key) of the last row
+shown, sent back as `startAt` (oldest first) or `endAt` (newest first). Only
+the rows on screen are transferred, however large the library is.
+
+The REST API takes a value but no key for `startAt` / `endAt`, so rows that
+share the cursor's value come back again and are dropped here. The cursor
+counts how many of those were already shown (itself included) and the next
+request asks for that many more rows, so a page is one request even deep
+inside a run of equal values. A cursor on a quote without created_at bounds
+at null.
+
+Ordering by a child needs `".indexOn"` for it on /quotes. database.indexes.json
+holds the index entries the app uses (created_at here, updated_at for delta
+sync). Merge them into the project's existing rules rather than deploying the
+file as is: it has no `.read` / `.write` rules of its own. Without the index
+RTDB answers 400; `has_index()` checks.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from rtdb import NULL, FirebaseClient, FirebaseError
+
+ORDER_BY = "created_at"
+PAGE_TTL_SECONDS = 10.0       # a page is refetched when older than this (or after a write)
+MAX_CACHED_PAGES = 256
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Where a page ends: the order value and key of its last row."""
+
+    value: object
+    key: str
+    ties: int = 1                      # rows shown so far with this value, the cursor row included
+
+
+@dataclass(frozen=True)
+class Page:
+    items: list[tuple[str, dict]]      # (key, quote) in display order
+    next: Cursor | None                # None: this is the last page
+
+
+def order_key(value) -> tuple:
+    """RTDB's child ordering: null < false < true < numbers < strings < objects."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+class QuotePager:
+    def __init__(self, client: FirebaseClient, order_by: str = ORDER_BY, ttl: float = PAGE_TTL_SECONDS):
+        self.client = client
+        self.order_by = order_by
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pages: dict[tuple, tuple[float, Page]] = {}   # (newest, size, cursor) -> (fetched, page)
+        self.stats = {"pages": 0, "hits": 0, "requests": 0}
+
+    def _row_key(self, item: tuple[str, dict]) -> tuple:
+        q = item[1]
+        return order_key(q.get(self.order_by) if isinstance(q, dict) else None), item[0]
+
+    def has_index(self) -> bool:
+        """False when RTDB refuses to order /quotes by `order_by` (no `.indexOn`)."""
+        try:
+            self.client.query("/quotes", self.order_by, limit_to_first=1)
+        except FirebaseError as e:
+            if e.status == 400:
+                return False
+            raise
+        return True
+
+    def invalidate(self):
+        """Forget every cached page, e.g. after a write."""
+        with self._lock:
+            self._pages.clear()
+
+    def page(self, size: int, *, newest: bool = True, after: Cursor | None = None) -> Page:
+        """The `size` rows that follow `after` (the first page when None), newest or oldest first."""
+        cache_key = (newest, size, after)
+        with self._lock:
+            cached = self._pages.get(cache_key)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self.stats["hits"] += 1
+                return cached[1]
+
+        # One extra says whether another page follows; the inclusive bound returns the shown ties again
+        limit = size + 1 + (after.ties if after is not None else 0)
+        while True:
+            rows = self._fetch(newest, after, limit)
+            items = sorted(rows.items(), key=self._row_key, reverse=newest)
+            if after is not None:
+                bound = (order_key(after.value), after.key)
+                items = [i for i in items if (self._row_key(i) < bound if newest else self._row_key(i) > bound)]
+            if len(items) > size or len(rows) < limit:
+                break
+            limit *= 2         # more tied rows than counted (written meanwhile): widen the window
+
+        next_cursor = None
+        if len(items) > size:
+            items = items[:size]
+            key, q = items[-1]
+            value = q.get(self.order_by) if isinstance(q, dict) else None
+            last = order_key(value)
+            ties = sum(1 for i in items if self._row_key(i)[0] == last)
+            if after is not None and order_key(after.value) == last:
+                ties += after.ties
+            next_cursor = Cursor(value, key, ties)
+        page = Page(items, next_cursor)
+
+        with self._lock:
+            if len(self._pages) >= MAX_CACHED_PAGES:
+                self._pages.clear()
+            self._pages[cache_key] = (time.monotonic(), page)
+            self.stats["pages"] += 1
+        return page
+
+    def _fetch(self, newest: bool, after: Cursor | None, limit: int) -> dict:
+        with self._lock:
+            self.stats["requests"] += 1
+        value = None
+        if after is not None:
+            value = NULL if after.value is None else after.value
+        if newest:
+            return self.client.query("/quotes", self.order_by, end_at=value, limit_to_last=limit)
+        return self.client.query("/quotes", self.order_by, start_at=value, limit_to_first=limit)
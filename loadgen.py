@@ -0,0 +1,211 @@
+"""Multi-session load generator for app.py.
+
+Drives N simulated sessions through Streamlit's AppTest. Sessions search,
+page, toggle favourites and poll the chat. The report gives rerun latency
+percentiles per action and the requests the database saw.
+
+AppTest keeps one mock runtime per process, so the sessions of one process
+take turns (round-robin). They share the cached client, store, listeners and
+write queue, just like the sessions of one server process. `--processes P`
+spreads the sessions over P worker processes, which behave like P server
+processes running at the same time on one host (they share HJ_CACHE_DIR, so
+`--shared-cache` makes them share RTDB reads like app.py's HJ_SHARED_CACHE).
+
+By default the sessions talk to an in-process `emulator.Emulator`:
+
+    python loadgen.py --sessions 8 --steps 40 --quotes 10000 --latency-ms 40
+    python loadgen.py --url http://127.0.0.1:9000        # an emulator started separately
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from emulator import Emulator, seed_data
+from metrics import percentile
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SEARCH_WORDS = ["", "time", "mind", "seneca", "vir", "courage today", "marcus", "zzz"]
+ACTION_WEIGHTS = {"search": 4, "fav": 3, "page": 1, "chat": 2}
+
+
+def _buttons(at, prefix: str) -> list:
+    return [b for b in at.button if (b.key or "").startswith(prefix)]
+
+
+def _text_input(at, label: str):
+    return next(t for t in at.text_input if t.label == label)
+
+
+class Session:
+    def __init__(self, n: int, rnd: random.Random, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.name = f"loadgen-{n}"
+        self.rnd = rnd
+        self.at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.latencies: dict[str, list[float]] = {}
+        self.errors = 0
+
+    def _timed(self, action: str, step):
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            self.errors += 1
+            return
+        self.latencies.setdefault(action, []).append(time.perf_counter() - t0)
+        if self.at.exception:
+            self.errors += 1
+
+    def start(self):
+        self._timed("first", self.at.run)
+        self._timed("username", lambda: _text_input(self.at, "Username").set_value(self.name).run())
+
+    def step(self):
+        action = self.rnd.choices(list(ACTION_WEIGHTS), weights=list(ACTION_WEIGHTS.values()))[0]
+        at = self.at
+        if action == "search":
+            self._timed(action, lambda: _text_input(at, "Search").set_value(self.rnd.choice(SEARCH_WORDS)).run())
+        elif action == "fav":
+            favs = _buttons(at, "fav_")
+            if favs:
+                self._timed(action, lambda: self.rnd.choice(favs).click().run())
+        elif action == "page":
+            pager = [b for b in at.button if b.label in ("Next ▶", "◀ Prev") and not b.disabled]
+            if pager:
+                self._timed(action, lambda: self.rnd.choice(pager).click().run())
+        else:
+            nav = at.sidebar.radio[0]
+            self._timed("chat", lambda: nav.set_value("Chat").run())
+            for _ in range(self.rnd.randint(1, 3)):
+                self._timed("chat", at.run)   # what a poll that brought messages / the live watcher reruns
+            self._timed("chat", lambda: at.sidebar.radio[0].set_value("Quotes").run())
+
+
+def _drive(first: int, count: int, steps: int, url: str, think_ms: float, seed: int,
+           timeout: float) -> tuple[dict[str, list[float]], int]:
+    """Run sessions first..first+count-1 round-robin in this process."""
+    os.environ.setdefault("HJ_CACHE_DIR", tempfile.mkdtemp(prefix="hj-loadgen-"))
+    os.environ["HJ_FIREBASE_DB_URL"] = url
+    rnd = random.Random(seed * 1000 + first)
+    pool = [Session(first + i, random.Random(rnd.random()), timeout) for i in range(count)]
+    for s in pool:
+        s.start()
+    for _ in range(steps):
+        for s in pool:
+            s.step()
+            if think_ms:
+                time.sleep(s.rnd.random() * think_ms / 1000)
+
+    merged: dict[str, list[float]] = {}
+    for s in pool:
+        for action, values in s.latencies.items():
+            merged.setdefault(action, []).extend(values)
+    return merged, sum(s.errors for s in pool)
+
+
+def run(sessions: int, steps: int, url: str, emulator: Emulator | None = None, processes: int = 1,
+        think_ms: float = 0.0, seed: int = 0, timeout: float = 60.0) -> dict:
+    """Run the load and return the report (also what `--json` prints)."""
+    os.environ.setdefault("HJ_CACHE_DIR", tempfile.mkdtemp(prefix="hj-loadgen-"))   # one per "host"
+    requests_before = dict(emulator.stats) if emulator is not None else {}
+    processes = max(1, min(processes, sessions))
+    shares = [sessions // processes + (i < sessions % processes) for i in range(processes)]
+    jobs = [(sum(shares[:i]), n, steps, url, think_ms, seed, timeout) for i, n in enumerate(shares)]
+
+    t0 = time.perf_counter()
+    if processes == 1:
+        results = [_drive(*jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(processes) as workers:
+            results = workers.starmap(_drive, jobs)
+    elapsed = time.perf_counter() - t0
+
+    merged: dict[str, list[float]] = {}
+    for latencies, _ in results:
+        for action, values in latencies.items():
+            merged.setdefault(action, []).extend(values)
+    report = {
+        "sessions": sessions,
+        "processes": processes,
+        "steps": steps,
+        "seconds": round(elapsed, 2),
+        "errors": sum(errors for _, errors in results),
+        "reruns": {},
+        "requests": {},
+    }
+    for action, values in sorted(merged.items()):
+        values.sort()
+        report["reruns"][action] = {
+            "n": len(values),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1),
+        }
+    if emulator is not None:
+        report["requests"] = {
+            method: n - requests_before.get(method, 0) for method, n in sorted(emulator.stats.items())
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['sessions']} sessions ({report['processes']} processes) x {report['steps']} steps "
+          f"in {report['seconds']}s, "
+          f"{report['errors']} errors")
+    print(f"{'action':<10}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for action, r in report["reruns"].items():
+        print(f"{action:<10}{r['n']:>6}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['max_ms']:>10}")
+    if report["requests"]:
+        print("requests: " + ", ".join(f"{m} {n}" for m, n in report["requests"].items()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sessions", type=int, default=4)
+    ap.add_argument("--steps", type=int, default=20)
+    ap.add_argument("--processes", type=int, default=1, help="worker processes (server processes) to spread over")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="random pause of up to this between steps")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--url", help="use this RTDB / emulator instead of starting one in-process")
+    ap.add_argument("--quotes", type=int, default=1000)
+    ap.add_argument("--chat", type=int, default=200)
+    ap.add_argument("--text-bytes", type=int, default=120)
+    ap.add_argument("--favs-per-quote", type=int, default=2)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--shared-cache", action="store_true", help="share RTDB reads between the processes")
+    ap.add_argument("--server-paging", action="store_true", help="browse quotes a page at a time from RTDB")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+    if args.shared_cache:
+        os.environ["HJ_SHARED_CACHE"] = "1"
+    if args.server_paging:
+        os.environ["HJ_SERVER_PAGING"] = "1"
+
+    emu = None
+    url = args.url
+    if url is None:
+        emu = Emulator(
+            seed_data(args.quotes, chat=args.chat, text_bytes=args.text_bytes,
+                      favs_per_quote=args.favs_per_quote, seed=args.seed),
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+        )
+        url = f"http://127.0.0.1:{emu.serve(0).server_address[1]}"
+
+    report = run(args.sessions, args.steps, url, emulator=emu, processes=args.processes,
+                 think_ms=args.think_ms, seed=args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
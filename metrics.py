@@ -0,0 +1,162 @@
+"""Timing and counter hooks for the app's hot paths.
+
+One `Metrics` per server process collects:
+
+- phase timings (load, filter, render, RTDB calls, ...) in a rolling window
+  per name, summarized as p50 / p95 / max plus lifetime count and sum;
+- counters, either bumped directly or read from registered sources (the
+  RTDB client's request/byte stats, the write queue, the listeners).
+
+The state exports as JSON lines or as Prometheus text. `serve()` puts both on
+a small side HTTP server, because Streamlit can't add routes of its own.
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WINDOW = 512                  # samples kept per timing for the percentiles
+PROM_PREFIX = "hj"
+
+_PROM_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def _prom_name(name: str) -> str:
+    return _PROM_NAME_RE.sub("_", name).strip("_").lower()
+
+
+class Metrics:
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque] = {}
+        self._totals: dict[str, list] = {}       # name -> [count, sum seconds]
+        self._counters: dict[str, float] = {}
+        self._sources: dict[str, object] = {}    # prefix -> callable returning {name: number}
+
+    # ---------- recording ----------
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._totals[name] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def count(self, name: str, n: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def add_source(self, prefix: str, read):
+        """Report `read()` (a dict of numbers) as counters named `prefix.<key>`."""
+        with self._lock:
+            self._sources[prefix] = read
+
+    # ---------- reading ----------
+    def timings(self) -> dict[str, dict]:
+        """name -> {count, total, p50, p95, max} (percentiles over the last `window` samples)."""
+        with self._lock:
+            items = [(name, sorted(s), tuple(self._totals[name])) for name, s in self._samples.items()]
+        out = {}
+        for name, values, (count, total) in sorted(items):
+            out[name] = {
+                "count": count,
+                "total": total,
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "max": values[-1] if values else 0.0,
+            }
+        return out
+
+    def counters(self) -> dict[str, float]:
+        with self._lock:
+            out = dict(self._counters)
+            sources = list(self._sources.items())
+        for prefix, read in sources:
+            try:
+                values = read() or {}
+            except Exception:
+                continue  # a broken source must not take the panel down
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    out[f"{prefix}.{key}"] = value
+        return dict(sorted(out.items()))
+
+    # ---------- export ----------
+    def to_jsonl(self) -> str:
+        ts = round(time.time(), 3)
+        lines = [
+            json.dumps({"ts": ts, "type": "timing", "name": name, **stats}, separators=(",", ":"))
+            for name, stats in self.timings().items()
+        ]
+        lines += [
+            json.dumps({"ts": ts, "type": "counter", "name": name, "value": value}, separators=(",", ":"))
+            for name, value in self.counters().items()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def to_prometheus(self) -> str:
+        seconds = f"{PROM_PREFIX}_phase_seconds"
+        lines = [f"# TYPE {seconds} summary"]
+        for name, stats in self.timings().items():
+            label = f'phase="{name}"'
+            lines.append(f'{seconds}{{{label},quantile="0.5"}} {stats["p50"]:.6f}')
+            lines.append(f'{seconds}{{{label},quantile="0.95"}} {stats["p95"]:.6f}')
+            lines.append(f"{seconds}_sum{{{label}}} {stats['total']:.6f}")
+            lines.append(f"{seconds}_count{{{label}}} {stats['count']}")
+        for name, value in self.counters().items():
+            metric = f"{PROM_PREFIX}_{_prom_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics (Prometheus text) and /metrics.jsonl from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body, ctype = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif path == "/metrics.jsonl":
+                    body, ctype = metrics.to_jsonl(), "application/x-ndjson"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
@@ -0,0 +1,167 @@
+"""One-time migration of /quotes to the current schema version.
+
+Old records can carry the "Added:" HTML div (and other tags) the early UI
+saved into the quote text, so the app used to run `clean_quote_text` on every
+quote on every rerun. This pages through /quotes by key and, for each record
+below `SCHEMA_VERSION`, writes back the cleaned text (only when it changed),
+the schema version and a fresh `updated_at`, in multi-path PATCHes of
+`batch_size` quotes. Migrated records skip cleaning in the app.
+
+Only the `text`, `schema_version` and `updated_at` children are written, so
+favourites or collection changes made while it runs are never overwritten.
+After every committed batch the last key is saved to a checkpoint file; an
+interrupted run continues from there with `--resume`. Running it again from
+the start is also safe: migrated records are skipped.
+
+    python migrate.py --dry-run          # count and show what would change
+    python migrate.py --resume
+"""
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+
+from bulk import iter_quotes
+from delta import SERVER_TIMESTAMP
+from normalize import SCHEMA_VERSION, clean_quote_text, is_migrated
+from rtdb import FirebaseClient, FirebaseError
+
+BATCH_SIZE = 500              # quotes per PATCH
+SCAN_PAGE = 1000              # quotes per GET
+CHECKPOINT_FILE = ".migrate_checkpoint.json"
+MAX_SAMPLES_KEPT = 20
+
+
+@dataclass
+class MigrationResult:
+    scanned: int = 0
+    migrated: int = 0
+    text_changed: int = 0
+    requests: int = 0
+    last_key: str | None = None
+    samples: list[tuple[str, str, str]] = field(default_factory=list)   # (key, before, after)
+
+
+def migrate_updates(key: str, q: dict) -> dict:
+    """Multi-path updates that bring one stored quote to SCHEMA_VERSION ({} when already there)."""
+    if is_migrated(q):
+        return {}
+    updates = {
+        f"/quotes/{key}/schema_version": SCHEMA_VERSION,
+        f"/quotes/{key}/updated_at": SERVER_TIMESTAMP,
+    }
+    text = q.get("text") or ""
+    cleaned = clean_quote_text(text)
+    if cleaned != text:
+        updates[f"/quotes/{key}/text"] = cleaned
+    return updates
+
+
+def migrate_quotes(client: FirebaseClient, batch_size: int = BATCH_SIZE, page_size: int = SCAN_PAGE,
+                   dry_run: bool = False, after: str | None = None, on_batch=None) -> MigrationResult:
+    """Migrate every quote after the key `after` (all of them when None).
+
+    `on_batch(result)` is called after each batch is written; `result.last_key`
+    is then the last key whose migration is committed, i.e. the place to
+    resume from. With `dry_run` nothing is written and `on_batch` is still
+    called, so progress shows. A failed PATCH raises FirebaseError.
+    """
+    result = MigrationResult(last_key=after)
+    batch = client.batch()
+    pending = {"migrated": 0, "text_changed": 0}
+    scanned_to = after
+
+    def flush():
+        if dry_run:
+            batch.updates.clear()
+        elif len(batch):
+            batch.commit()
+            result.requests += 1
+        result.migrated += pending["migrated"]
+        result.text_changed += pending["text_changed"]
+        pending.update(migrated=0, text_changed=0)
+        result.last_key = scanned_to
+        if on_batch is not None:
+            on_batch(result)
+
+    for key, q in iter_quotes(client, page_size, after=after):
+        result.scanned += 1
+        scanned_to = key
+        updates = migrate_updates(key, q) if isinstance(q, dict) else {}
+        if not updates:
+            continue
+        for path, value in updates.items():
+            batch.set(path, value)
+        pending["migrated"] += 1
+        if f"/quotes/{key}/text" in updates:
+            pending["text_changed"] += 1
+            if len(result.samples) < MAX_SAMPLES_KEPT:
+                result.samples.append((key, q.get("text") or "", updates[f"/quotes/{key}/text"]))
+        if pending["migrated"] >= batch_size:
+            flush()
+    flush()
+    return result
+
+
+# ---------- checkpoint ----------
+def load_checkpoint(path: str, url: str) -> str | None:
+    """The key to resume after, if `path` holds a checkpoint for this database."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("url") != url or state.get("schema_version") != SCHEMA_VERSION:
+        return None
+    return state.get("last_key")
+
+
+def save_checkpoint(path: str, url: str, last_key: str | None):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "schema_version": SCHEMA_VERSION, "last_key": last_key}, f)
+    os.replace(tmp, path)
+
+
+# ---------- command line ----------
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--url", default=os.environ.get("HJ_FIREBASE_DB_URL"),
+                    help="database URL (default: $HJ_FIREBASE_DB_URL)")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--dry-run", action="store_true", help="scan and report, write nothing")
+    ap.add_argument("--resume", action="store_true", help="continue after the key in the checkpoint file")
+    ap.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    args = ap.parse_args()
+
+    if not args.url:
+        ap.error("no database URL: pass --url or set HJ_FIREBASE_DB_URL")
+    client = FirebaseClient(args.url)
+    after = load_checkpoint(args.checkpoint, args.url) if args.resume else None
+    if after:
+        print(f"resuming after {after}", file=sys.stderr)
+
+    def on_batch(r: MigrationResult):
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, args.url, r.last_key)
+        print(f"\r{r.scanned} scanned, {r.migrated} migrated", end="", file=sys.stderr)
+
+    try:
+        result = migrate_quotes(client, batch_size=args.batch_size, dry_run=args.dry_run,
+                                after=after, on_batch=on_batch)
+    except FirebaseError as e:
+        print(file=sys.stderr)
+        sys.exit(f"error: {e} (run again with --resume to continue)")
+    print(file=sys.stderr)
+
+    if args.dry_run:
+        for key, before, after_text in result.samples:
+            print(f"{key}:\n  - {before!r}\n  + {after_text!r}")
+    print(f"{'would migrate' if args.dry_run else 'migrated'} {result.migrated} of {result.scanned} quotes "
+          f"to schema {SCHEMA_VERSION} ({result.text_changed} with cleaned text), {result.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Quote normalization shared by the app, the store and the search index.
+
+`NormalizedCache` memoizes the render-ready form of each quote (cleaned text,
+parsed date, escaped HTML, formatted timestamp) so a rerun only re-processes
+quotes that were added or changed since the last one.
+"""
+
+import html as html_lib
+import re
+import threading
+from datetime import datetime
+
+
+# ---------- Clean old “HTML got saved into quote text” ----------
+_MUTED_ADDED_DIV_RE = re.compile(
+    r'<div\s+class=(["\'])muted\1>\s*Added:\s*.*?</div>',
+    flags=re.IGNORECASE | re.DOTALL,
+)
+_ANY_HTML_TAG_RE = re.compile(r"</?[^>]+>")
+
+
+def clean_quote_text(text: str) -> str:
+    if not text:
+        return ""
+    s = text.strip()
+    s = _MUTED_ADDED_DIV_RE.sub("", s).strip()
+    lower = s.lower()
+    if "<div" in lower or "</div" in lower or "<span" in lower or "<br" in lower or "<p" in lower:
+        s = _ANY_HTML_TAG_RE.sub("", s)
+        s = re.sub(r"\s{2,}", " ", s).strip()
+    return s
+
+
+# Records at this schema version were written (or migrated by migrate.py) with
+# clean text, so they skip clean_quote_text.
+SCHEMA_VERSION = 2
+
+
+def is_migrated(q: dict) -> bool:
+    v = q.get("schema_version")
+    return isinstance(v, int) and v >= SCHEMA_VERSION
+
+
+def quote_text(q: dict) -> str:
+    """Display text of a stored quote."""
+    text = q.get("text") or ""
+    return text.strip() if is_migrated(q) else clean_quote_text(text)
+
+
+# ---------- Time ----------
+def parse_iso_z(iso_z: str) -> datetime | None:
+    try:
+        return datetime.fromisoformat(iso_z.replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+def pretty_ts(iso_z: str) -> str:
+    dt = parse_iso_z(iso_z)
+    return dt.strftime("%d %b %Y, %H:%M UTC") if dt else iso_z
+
+
+# ---------- Render-ready records ----------
+class NormalizedQuote:
+    __slots__ = (
+        "qid", "source", "fingerprint",
+        "text", "author", "author_key", "created_raw", "created_at", "col_ids",
+        "text_html", "author_html", "pretty_ts_html", "copy_text",
+    )
+
+    def __init__(self, qid: str, q: dict, fingerprint: int, col_ids: tuple[str, ...]):
+        self.qid = qid
+        self.source = q
+        self.fingerprint = fingerprint
+
+        self.text = quote_text(q)
+        self.author = (q.get("author") or "").strip()
+        self.author_key = self.author.lower()
+        self.created_raw = (q.get("created_at") or "").strip()
+        self.created_at = parse_iso_z(self.created_raw) if self.created_raw else None
+        self.col_ids = col_ids
+
+        safe_quote = html_lib.escape(self.text)
+        self.text_html = f"“{safe_quote}”" if safe_quote else "“(empty)”"
+        self.author_html = html_lib.escape(self.author)
+        self.pretty_ts_html = html_lib.escape(pretty_ts(self.created_raw)) if self.created_raw else ""
+        self.copy_text = self.text + (f" — {self.author}" if self.author else "")
+
+
+def _content_key(q: dict) -> tuple[int, tuple[str, ...]]:
+    col_ids = tuple(sorted(cid for cid, v in (q.get("collections") or {}).items() if v))
+    return hash((q.get("text"), q.get("author"), q.get("created_at"), col_ids)), col_ids
+
+
+class NormalizedCache:
+    """qid -> NormalizedQuote, rebuilt only when a quote's content fingerprint changes.
+
+    Stored quote dicts are never mutated in place (the store copies on write),
+    so the same dict object means unchanged content and skips even hashing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: dict[str, NormalizedQuote] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, qid: str, q: dict) -> NormalizedQuote:
+        rec = self._records.get(qid)
+        if rec is not None and rec.source is q:
+            return rec
+        fp, col_ids = _content_key(q)
+        if rec is not None and rec.fingerprint == fp:
+            rec.source = q
+            return rec
+        rec = NormalizedQuote(qid, q, fp, col_ids)
+        with self._lock:
+            self._records[qid] = rec
+        return rec
+
+    def evict(self, qid: str):
+        with self._lock:
+            self._records.pop(qid, None)
+
+    def retain(self, quotes):
+        """Drop records of quotes that are no longer in `quotes`."""
+        with self._lock:
+            for qid in [qid for qid in self._records if qid not in quotes]:
+                del self._records[qid]
@@ -0,0 +1,77 @@
+"""The quote list pipeline as plain functions over a `QuoteStore`.
+
+    search -> select (filter + sort via the indexes) -> page -> prepare (normalize + render-prep)
+
+The Streamlit script only calls these and draws widgets; bench.py times the
+very same steps on synthetic libraries.
+"""
+
+from indexes import SORT_AUTHOR, SORT_NEWEST, SORT_OLDEST
+from store import QuoteStore
+
+SORT_MODES = ["Newest first", "Oldest first", "Author A–Z", "Best match"]
+BEST_MATCH = "Best match"
+SERVER_SORT_MODES = SORT_MODES[:2]   # orders RTDB can serve itself (orderBy created_at)
+_SORT_KEYS = {"Oldest first": SORT_OLDEST, "Author A–Z": SORT_AUTHOR}
+
+
+def search(store: QuoteStore, query: str, sort_mode: str) -> dict[str, int] | None:
+    """Search hits for `query` (None: no query). Scores only when sorting by best match."""
+    return store.search.search(query, rank=sort_mode == BEST_MATCH)
+
+
+def select(store: QuoteStore, scores: dict[str, int] | None, sort_mode: str, *,
+           fav_uid: str | None = None, collection_id: str | None = None) -> list[str]:
+    """Ordered ids of the quotes in a view (favourites / collection / search hits)."""
+    ids = store.indexes.query(
+        fav_uid=fav_uid,
+        collection_id=collection_id,
+        within=scores,
+        sort=_SORT_KEYS.get(sort_mode, SORT_NEWEST),
+    )
+    if sort_mode == BEST_MATCH and scores:
+        ids.sort(key=scores.__getitem__, reverse=True)  # stable: newest first within a score
+    return ids
+
+
+def page_window(total: int, page: int, page_size: int) -> tuple[int, int, int, int]:
+    """(page, page_count, start, end) with `page` clamped to the pages that exist."""
+    page_count = max(1, -(-total // page_size))
+    page = max(0, min(page, page_count - 1))
+    start = page * page_size
+    return page, page_count, start, min(start + page_size, total)
+
+
+class QuoteCard:
+    """Everything the render loop needs for one quote."""
+
+    __slots__ = ("qid", "quote", "record", "is_fav", "meta_html")
+
+    def __init__(self, qid: str, quote: dict, record, is_fav: bool, meta_html: str):
+        self.qid = qid
+        self.quote = quote
+        self.record = record
+        self.is_fav = is_fav
+        self.meta_html = meta_html
+
+
+def prepare(store: QuoteStore, quotes, ids, uid: str, show_meta: bool = True) -> list[QuoteCard]:
+    """Render-ready cards for `ids` (one page), normalized through the store's record cache.
+
+    Ids missing from `quotes` are skipped: the indexes can be one write ahead
+    of the snapshot a rerun works from.
+    """
+    cards = []
+    for qid in ids:
+        q = quotes.get(qid)
+        if q is None:
+            continue
+        rec = store.records.get(qid, q)
+        meta_bits = []
+        if rec.author:
+            meta_bits.append(f"— {rec.author_html}")
+        if show_meta and rec.created_raw:
+            meta_bits.append(f"Added: {rec.pretty_ts_html}")
+        is_fav = bool((q.get("fav_by") or {}).get(uid))
+        cards.append(QuoteCard(qid, q, rec, is_fav, " • ".join(meta_bits)))
+    return cards
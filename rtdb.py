@@ -0,0 +1,319 @@
+"""Thin REST client for the Firebase Realtime Database.
+
+One `FirebaseClient` is shared by the whole server process: it keeps a pooled
+keep-alive `requests.Session` so repeated calls reuse the same TCP+TLS
+connection, and it owns the timeout / retry policy for every call.
+"""
+
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# (connect, read) timeouts in seconds, per kind of operation
+READ_TIMEOUT = (3.05, 8)
+WRITE_TIMEOUT = (3.05, 8)
+STREAM_TIMEOUT = (3.05, 75)      # RTDB sends a keep-alive every ~30s
+
+MAX_RETRIES = 2                  # extra attempts after the first one
+BACKOFF_BASE_SECONDS = 0.25      # 0.25s, 0.5s, 1s ... (+ jitter)
+POOL_SIZE = 16
+
+# 408 / 429 / 5xx are worth another try; everything else is final
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# A query bound that is JSON null itself (None leaves the bound out)
+NULL = object()
+
+# Push IDs: 8 chars of milliseconds + 12 random chars, in an alphabet that sorts like ASCII
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_push_lock = threading.Lock()
+_last_push: tuple[int, list[int]] = (0, [0] * 12)
+
+
+def push_key(now_ms: int | None = None) -> str:
+    """A push-style key generated client-side, like the Firebase SDKs do.
+
+    Keys sort by creation time; within one millisecond the random part is
+    incremented, so keys made in a burst keep their order too.
+    """
+    global _last_push
+    now = int(time.time() * 1000) if now_ms is None else now_ms
+    with _push_lock:
+        last, rand = _last_push
+        if now == last:
+            rand = list(rand)
+            for i in range(11, -1, -1):
+                if rand[i] != 63:
+                    rand[i] += 1
+                    break
+                rand[i] = 0
+        else:
+            rand = [random.randrange(64) for _ in range(12)]
+        _last_push = (now, rand)
+    stamp = "".join(PUSH_CHARS[(now >> (6 * i)) & 63] for i in range(7, -1, -1))
+    return stamp + "".join(PUSH_CHARS[r] for r in rand)
+
+
+def _never_sent(exc: requests.RequestException) -> bool:
+    """True when the connection failed before any of the request could be sent."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)   # urllib3's MaxRetryError wraps the cause
+    return isinstance(reason, NewConnectionError)
+
+
+class FirebaseError(Exception):
+    """Raised when a request still fails after all retries."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class FirebaseClient:
+    def __init__(self, base_url: str, pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES,
+                 metrics=None):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.metrics = metrics      # optional metrics.Metrics: per-method call timings
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+
+    # ---------- plumbing ----------
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.strip('/')}.json"
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _request(self, method: str, path: str, **kwargs):
+        if self.metrics is None:
+            return self._send(method, path, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return self._send(method, path, **kwargs)
+        finally:
+            self.metrics.observe(f"rtdb.{method}", time.perf_counter() - t0)
+
+    def _send(self, method: str, path: str, *, params=None, json=None, headers=None, timeout,
+              idempotent: bool = True):
+        """Send one request with bounded retries and exponential backoff.
+
+        Non-idempotent requests (POST) are only retried when the connection
+        could not be established, so a push is never duplicated. A connection
+        dropped after sending ("Connection aborted") is not retried, since the
+        server may have applied the request.
+        """
+        last_exc: Exception | None = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+                time.sleep(BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)) * (1 + random.random() * 0.5))
+            self._count("requests")
+            try:
+                resp = self._session.request(
+                    method, self.url(path), params=params, json=json, headers=headers, timeout=timeout
+                )
+            except requests.ConnectionError as e:
+                last_exc = e
+                if idempotent or _never_sent(e):
+                    continue
+                break
+            except requests.Timeout as e:
+                last_exc = e
+                if idempotent:
+                    continue
+                break
+            except requests.RequestException as e:
+                last_exc = e
+                break
+
+            self._count("bytes_out", len(resp.request.body or b""))
+            self._count("bytes_in", len(resp.content))
+            if resp.ok:
+                return resp
+            last_exc = FirebaseError(f"{method} {path} -> HTTP {resp.status_code}", status=resp.status_code)
+            if not (idempotent and resp.status_code in _RETRY_STATUS):
+                break
+
+        self._count("errors")
+        if isinstance(last_exc, FirebaseError):
+            raise last_exc
+        raise FirebaseError(f"{method} {path} failed: {last_exc}") from last_exc
+
+    # ---------- reads ----------
+    def get(self, path: str, params: dict | None = None):
+        resp = self._request("GET", path, params=params, timeout=READ_TIMEOUT)
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise FirebaseError(f"GET {path} returned invalid JSON") from e
+
+    def get_if_changed(self, path: str, etag: str | None = None) -> tuple[object, str | None, bool]:
+        """Conditional read: (data, etag, changed).
+
+        Asks RTDB for the location's ETag and sends the one we hold as
+        If-None-Match. On 304, or when the returned ETag equals ours, the data
+        is unchanged and `data` is None.
+        """
+        headers = {"X-Firebase-ETag": "true"}
+        if etag:
+            headers["If-None-Match"] = etag
+        resp = self._request("GET", path, headers=headers, timeout=READ_TIMEOUT)
+        new_etag = resp.headers.get("ETag") or None
+        if resp.status_code == 304 or (etag and new_etag == etag):
+            return None, etag, False
+        try:
+            return resp.json(), new_etag, True
+        except ValueError as e:
+            raise FirebaseError(f"GET {path} returned invalid JSON") from e
+
+    def query(
+        self,
+        path: str,
+        order_by: str,
+        *,
+        start_at=None,
+        end_at=None,
+        limit_to_first: int | None = None,
+        limit_to_last: int | None = None,
+    ) -> dict:
+        """Filtered read (`orderBy` + `startAt`/`endAt` + `limitTo*`).
+
+        `order_by` is "$key", "$value" or a child name; RTDB wants every
+        filter value JSON-encoded in the query string. Pass `NULL` to bound
+        at null (rows missing the child), since None means "no bound".
+        """
+        params = {"orderBy": json.dumps(order_by)}
+        if start_at is not None:
+            params["startAt"] = json.dumps(None if start_at is NULL else start_at)
+        if end_at is not None:
+            params["endAt"] = json.dumps(None if end_at is NULL else end_at)
+        if limit_to_first is not None:
+            params["limitToFirst"] = int(limit_to_first)
+        if limit_to_last is not None:
+            params["limitToLast"] = int(limit_to_last)
+        return self.get(path, params) or {}
+
+    def pages(self, path: str, page_size: int, *, after: str | None = None, max_page_size: int | None = None):
+        """Children of `path` in key order, one dict per request (resuming past the key `after`).
+
+        With `max_page_size` the page size doubles after every page up to that,
+        so the first page comes back quickly and a big tree still takes few requests.
+        """
+        size = page_size
+        while True:
+            if after is None:
+                page = self.query(path, "$key", limit_to_first=size)
+            else:
+                # startAt is inclusive: one extra, and `after` itself is skipped
+                page = self.query(path, "$key", start_at=after, limit_to_first=size + 1)
+                page.pop(after, None)
+            if not page:
+                return
+            yield page
+            if len(page) < size:
+                return
+            after = max(page)
+            if max_page_size:
+                size = min(max_page_size, size * 2)
+
+    def open_stream(self, path: str, params: dict | None = None) -> requests.Response:
+        """Open a `text/event-stream` listener on `path` (caller reads and closes it)."""
+        self._count("requests")
+        try:
+            resp = self._session.get(
+                self.url(path),
+                params=params,
+                headers={"Accept": "text/event-stream"},
+                stream=True,
+                timeout=STREAM_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            self._count("errors")
+            raise FirebaseError(f"STREAM {path} failed: {e}") from e
+        if not resp.ok:
+            resp.close()
+            self._count("errors")
+            raise FirebaseError(f"STREAM {path} -> HTTP {resp.status_code}", status=resp.status_code)
+        return resp
+
+    # ---------- writes ----------
+    # print=silent makes RTDB answer 204 without echoing the written body back.
+    def put(self, path: str, value):
+        self._request("PUT", path, params={"print": "silent"}, json=value, timeout=WRITE_TIMEOUT)
+
+    def patch(self, path: str, updates: dict):
+        self._request("PATCH", path, params={"print": "silent"}, json=updates, timeout=WRITE_TIMEOUT)
+
+    def delete(self, path: str):
+        self._request("DELETE", path, params={"print": "silent"}, timeout=WRITE_TIMEOUT)
+
+    def post(self, path: str, value) -> str:
+        """Push a child and return its generated key (needs the response body, so not silent)."""
+        resp = self._request("POST", path, json=value, timeout=WRITE_TIMEOUT, idempotent=False)
+        try:
+            return (resp.json() or {})["name"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise FirebaseError(f"POST {path} returned no key") from e
+
+    def batch(self) -> "WriteBatch":
+        return WriteBatch(self)
+
+    def close(self):
+        self._session.close()
+
+
+class WriteBatch:
+    """Collects sets/deletes and flushes them as one atomic multi-path PATCH.
+
+    RTDB applies every location of a root PATCH in a single transaction, so
+    either all writes land or none do. Deleting a location is a `null` value.
+
+        batch = client.batch()
+        batch.set("/quotes/q1/collections/c1", True)
+        batch.delete("/quotes/q1/collections/c2")
+        batch.commit()
+    """
+
+    def __init__(self, client: FirebaseClient):
+        self.client = client
+        self.updates: dict[str, object] = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        key = path.strip("/")
+        if not key:
+            raise ValueError("batch paths must point below the database root")
+        return key
+
+    def set(self, path: str, value) -> "WriteBatch":
+        self.updates[self._key(path)] = value
+        return self
+
+    def delete(self, path: str) -> "WriteBatch":
+        self.updates[self._key(path)] = None
+        return self
+
+    def __len__(self) -> int:
+        return len(self.updates)
+
+    def commit(self):
+        """Send everything collected so far in one round trip (no-op when empty)."""
+        if not self.updates:
+            return
+        self.client.patch("/", self.updates)
+        self.updates = {}
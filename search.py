@@ -0,0 +1,147 @@
+"""Incremental inverted index over quote text and authors.
+
+Tokens are lowercase `\\w+` runs of the cleaned text and the author. Each
+token maps to the set of quote ids containing it, and a sorted vocabulary
+lets a prefix become a bisect range instead of a scan. Queries are ANDed
+word by word, and every word also matches as a prefix ("stoi" finds "stoic").
+
+The index keeps a fingerprint of each quote's raw text/author, so `sync()`
+after a full reload only re-tokenizes quotes that actually changed.
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+
+from normalize import clean_quote_text, is_migrated
+
+_TOKEN_RE = re.compile(r"\w+")
+_MAX_CHAR = "\U0010ffff"
+
+# Per query word: where it matched, best first
+SCORE_AUTHOR_EXACT = 4
+SCORE_TEXT_EXACT = 3
+SCORE_AUTHOR_PREFIX = 2
+SCORE_TEXT_PREFIX = 1
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class SearchIndex:
+    def __init__(self, clean=clean_quote_text):
+        self.clean = clean
+        self._lock = threading.Lock()
+        self._postings: dict[str, set[str]] = {}
+        self._vocab: list[str] = []     # sorted keys of _postings
+        # qid -> (fingerprint, text tokens, author tokens)
+        self._docs: dict[str, tuple[int, frozenset, frozenset]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------- maintenance ----------
+    def _link(self, token: str, qid: str):
+        ids = self._postings.get(token)
+        if ids is None:
+            ids = self._postings[token] = set()
+            insort(self._vocab, token)
+        ids.add(qid)
+
+    def _unlink(self, token: str, qid: str):
+        ids = self._postings.get(token)
+        if ids is None:
+            return
+        ids.discard(qid)
+        if not ids:
+            del self._postings[token]
+            i = bisect_left(self._vocab, token)
+            if i < len(self._vocab) and self._vocab[i] == token:
+                del self._vocab[i]
+
+    def _remove(self, qid: str):
+        doc = self._docs.pop(qid, None)
+        if doc is None:
+            return
+        for token in doc[1] | doc[2]:
+            self._unlink(token, qid)
+
+    def _add(self, qid: str, text: str, author: str, migrated: bool = False):
+        fp = hash((text, author))
+        doc = self._docs.get(qid)
+        if doc is not None and doc[0] == fp:
+            return
+        self._remove(qid)
+        text_tokens = frozenset(tokenize(text if migrated else self.clean(text)))
+        author_tokens = frozenset(tokenize(author))
+        self._docs[qid] = (fp, text_tokens, author_tokens)
+        for token in text_tokens | author_tokens:
+            self._link(token, qid)
+
+    def add(self, qid: str, text: str, author: str, migrated: bool = False):
+        """Index (or re-index) one quote from its raw stored text and author.
+
+        `migrated` text is already clean (see normalize.SCHEMA_VERSION).
+        """
+        with self._lock:
+            self._add(qid, text or "", author or "", migrated)
+
+    def remove(self, qid: str):
+        with self._lock:
+            self._remove(qid)
+
+    def sync(self, quotes) -> None:
+        """Bring the index in line with a full quotes tree, touching only what changed."""
+        with self._lock:
+            for qid in [qid for qid in self._docs if qid not in quotes]:
+                self._remove(qid)
+            for qid, q in quotes.items():
+                q = q or {}
+                self._add(qid, q.get("text") or "", q.get("author") or "", is_migrated(q))
+
+    # ---------- queries ----------
+    def _prefix_ids(self, prefix: str) -> set[str]:
+        lo = bisect_left(self._vocab, prefix)
+        hi = bisect_left(self._vocab, prefix + _MAX_CHAR, lo)
+        if hi - lo == 1:
+            return self._postings[self._vocab[lo]]
+        out: set[str] = set()
+        for token in self._vocab[lo:hi]:
+            out |= self._postings[token]
+        return out
+
+    def search(self, query: str, rank: bool = False) -> dict[str, int] | None:
+        """Quote ids matching every word of `query` (as word or prefix).
+
+        Returns None when the query has no words (no filtering), otherwise a
+        dict of qid -> score; scores are only computed when `rank` is True.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return None
+        with self._lock:
+            # Longest words first: they usually have the smallest candidate sets
+            hits: set[str] | None = None
+            for term in sorted(terms, key=len, reverse=True):
+                ids = self._prefix_ids(term)
+                hits = set(ids) if hits is None else hits & ids
+                if not hits:
+                    return {}
+            if not rank:
+                return dict.fromkeys(hits, 0)
+            return {qid: self._score(qid, terms) for qid in hits}
+
+    def _score(self, qid: str, terms: list[str]) -> int:
+        _, text_tokens, author_tokens = self._docs[qid]
+        score = 0
+        for term in terms:
+            if term in author_tokens:
+                score += SCORE_AUTHOR_EXACT
+            elif term in text_tokens:
+                score += SCORE_TEXT_EXACT
+            elif any(t.startswith(term) for t in author_tokens):
+                score += SCORE_AUTHOR_PREFIX
+            else:
+                score += SCORE_TEXT_PREFIX
+        return score
@@ -0,0 +1,193 @@
+"""Host-wide cache of RTDB reads, shared by every server process on the host.
+
+Each server process used to fetch `/quotes`, `/collections` and the chat tail
+on its own, so N processes behind a load balancer cost N fetches per refresh
+and could show different data for a while. `SharedCache` keeps one copy of
+each entry in a local SQLite file in WAL mode (readers never block the
+writer), with:
+
+- a TTL per read: a fresh entry is served as is;
+- one elected fetcher per key: when an entry is stale, the process that takes
+  the key's lease refetches it while the others keep serving the stale copy
+  (or wait for it, if there is none yet). A lease that outlives
+  `lease_seconds` (its process died) can be taken over;
+- version stamps: every stored fetch bumps the entry's version, so a process
+  only decodes an entry again when the version changed, and callers adopt
+  new data by comparing versions. `invalidate(key)` marks an entry stale for
+  everyone, e.g. after a write.
+
+Fetchers get the entry's last ETag and return `(data, etag)`, or None when
+nothing changed (the entry is then just marked fresh again).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+LEASE_SECONDS = 15.0          # a fetch that takes longer than this can be taken over
+WAIT_POLL_SECONDS = 0.05      # how often a process without data checks for the elected fetch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key        TEXT PRIMARY KEY,
+    version    INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    etag       TEXT,
+    data       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key     TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class SharedCache:
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._decoded: dict[str, tuple[int, object]] = {}   # key -> (version, data) last decoded here
+        self.stats = {"hits": 0, "stale": 0, "fetches": 0, "unchanged": 0, "waits": 0, "decodes": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # autocommit; writes take the lock up front with BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    # ---------- entries ----------
+    def _head(self, key: str) -> tuple[int, float, str | None] | None:
+        return self._db().execute(
+            "SELECT version, fetched_at, etag FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+
+    def _data(self, key: str, version: int):
+        """The entry's data, decoded at most once per version in this process."""
+        with self._lock:
+            cached = self._decoded.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        row = self._db().execute("SELECT version, data FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        version, data = row[0], json.loads(row[1])
+        self._count("decodes")
+        with self._lock:
+            self._decoded[key] = (version, data)
+        return data
+
+    def get(self, key: str) -> tuple[int, object] | None:
+        """(version, data) as stored, however old; None when there is no entry."""
+        head = self._head(key)
+        if head is None:
+            return None
+        return head[0], self._data(key, head[0])
+
+    def invalidate(self, key: str):
+        """Mark `key` stale for every process; the next read elects a fetcher."""
+        self._db().execute("UPDATE entries SET fetched_at = 0 WHERE key = ?", (key,))
+
+    # ---------- leases ----------
+    def _try_lease(self, key: str, ttl: float) -> bool:
+        """Take the key's lease unless someone holds it or the entry was just refreshed."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            head = db.execute("SELECT fetched_at FROM entries WHERE key = ?", (key,)).fetchone()
+            lease = db.execute("SELECT expires FROM leases WHERE key = ?", (key,)).fetchone()
+            if (head is not None and now - head[0] < ttl) or (lease is not None and lease[0] > now):
+                db.execute("ROLLBACK")
+                return False
+            db.execute("INSERT OR REPLACE INTO leases (key, owner, expires) VALUES (?, ?, ?)",
+                       (key, self.owner, now + self.lease_seconds))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def _release(self, key: str):
+        self._db().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def _store(self, key: str, result):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if result is None:
+                self._count("unchanged")
+                db.execute("UPDATE entries SET fetched_at = ? WHERE key = ?", (now, key))
+            else:
+                data, etag = result
+                db.execute(
+                    "INSERT INTO entries (key, version, fetched_at, etag, data) VALUES (?, 1, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET version = version + 1, fetched_at = excluded.fetched_at, "
+                    "etag = excluded.etag, data = excluded.data",
+                    (key, now, etag, json.dumps(data, separators=(",", ":"))),
+                )
+            db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    # ---------- reads ----------
+    def fetch(self, key: str, ttl: float, fetch) -> tuple[int, object]:
+        """(version, data) for `key`, refetched through `fetch(etag)` once per host when older than `ttl`.
+
+        Processes that lose the election get the stale entry right away, or
+        wait for the elected fetch when there is no entry at all. Exceptions
+        from `fetch` propagate (the lease is released first).
+        """
+        waited = False
+        deadline = time.monotonic() + self.lease_seconds
+        while True:
+            head = self._head(key)
+            if head is not None and time.time() - head[1] < ttl:
+                self._count("hits")
+                return head[0], self._data(key, head[0])
+            if self._try_lease(key, ttl):
+                break
+            head = self._head(key)
+            if head is not None:
+                self._count("hits" if time.time() - head[1] < ttl else "stale")
+                return head[0], self._data(key, head[0])
+            if time.monotonic() > deadline:
+                break   # the elected fetcher is stuck and no entry exists: fetch ourselves
+            if not waited:
+                self._count("waits")
+                waited = True
+            time.sleep(WAIT_POLL_SECONDS)
+
+        self._count("fetches")
+        etag = head[2] if head is not None else None
+        try:
+            result = fetch(etag)
+        except BaseException:
+            self._release(key)
+            raise
+        if result is None and head is None:
+            result = ({}, None)   # "unchanged" with nothing stored: store an empty entry
+        self._store(key, result)
+        head = self._head(key)
+        return head[0], self._data(key, head[0])
@@ -0,0 +1,77 @@
+"""On-disk snapshots of RTDB trees for fast cold starts.
+
+Each tree ("quotes", "collections") is kept as one compact JSON file holding
+the data and the RTDB ETag it was downloaded with. A new server process serves
+the snapshot at once and revalidates it in the background with a conditional
+request; "🔄 Refresh" uses the same conditional request, so neither downloads
+the tree again when nothing changed.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from rtdb import FirebaseClient
+
+FORMAT_VERSION = 1
+
+
+class SnapshotCache:
+    def __init__(self, client: FirebaseClient, directory: str):
+        self.client = client
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._etags: dict[str, str | None] = {}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(self._file(name))
+
+    def load(self, name: str) -> dict | None:
+        """Last-known tree from disk (None if there is no usable snapshot)."""
+        try:
+            with open(self._file(name), encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(doc, dict) or doc.get("format") != FORMAT_VERSION:
+            return None
+        with self._lock:
+            self._etags[name] = doc.get("etag")
+        return doc.get("data") or {}
+
+    def save(self, name: str, data, etag: str | None):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temp file and rename, so a crash never leaves half a snapshot
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                # default=dict: the store's quotes are Quote records, not dicts
+                json.dump({"format": FORMAT_VERSION, "etag": etag, "data": data}, f, separators=(",", ":"),
+                          default=dict)
+            os.replace(tmp, self._file(name))
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._etags[name] = etag
+
+    def fetch(self, name: str) -> dict | None:
+        """Revalidate `name` against RTDB. Returns the new tree, or None if unchanged.
+
+        Raises FirebaseError when the database can't be reached.
+        """
+        with self._lock:
+            etag = self._etags.get(name)
+        data, new_etag, changed = self.client.get_if_changed(f"/{name}", etag)
+        if not changed:
+            return None
+        data = data or {}
+        self.save(name, data, new_etag)
+        return data
@@ -0,0 +1,435 @@
+"""Process-wide quote/collection store shared by every session.
+
+Sessions used to hold their own copy of `/quotes` and `/collections`; now one
+`QuoteStore` per server process holds them. Writers go through the store's
+methods, which apply each change once under a lock and publish a new
+immutable `Snapshot` (copy-on-write: only the top-level dict and the touched
+quote are copied). Readers grab `store.snapshot()` at the start of a rerun and
+render from it without locking, so a concurrent write never tears a render.
+
+The store also maintains the search index, the secondary (favourite,
+collection, sort-order) indexes and the normalized-record cache, all kept in
+step incrementally by the same write methods.
+
+Quotes the store owns are kept as `Quote` records: the RTDB fields in slots
+with interned authors, instead of one dict per quote. A tree adopted from a
+listener is shared with the listener and stays as its dicts.
+"""
+
+import sys
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from indexes import QuoteIndexes
+from normalize import NormalizedCache, is_migrated
+from search import SearchIndex
+from stream import LiveTree
+
+
+_FIELDS = ("text", "author", "created_at", "updated_at", "schema_version", "fav_by", "collections")
+_FIELD_SET = frozenset(_FIELDS)
+_ABSENT = object()
+
+
+class Quote(Mapping):
+    """One stored quote: its fields in slots instead of a dict, read like one (`q.get("text")`).
+
+    Never changed after it is built (edits build a new one), so identity
+    still means "unchanged" to the indexes. Authors are interned (one string
+    per author, not one per quote). Fields outside the usual set go to a
+    small dict.
+    """
+
+    __slots__ = _FIELDS + ("_extra",)
+
+    def __init__(self, data: Mapping):
+        get = data.get
+        self.text = get("text", _ABSENT)
+        author = get("author", _ABSENT)
+        self.author = sys.intern(author) if type(author) is str else author
+        self.created_at = get("created_at", _ABSENT)
+        self.updated_at = get("updated_at", _ABSENT)
+        self.schema_version = get("schema_version", _ABSENT)
+        self.fav_by = get("fav_by", _ABSENT)
+        self.collections = get("collections", _ABSENT)
+        self._extra = None if _FIELD_SET.issuperset(data) else \
+            {k: v for k, v in data.items() if k not in _FIELD_SET}
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is not _ABSENT:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is _ABSENT else value
+        return default if self._extra is None else self._extra.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _ABSENT
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for name in _FIELDS:
+            if getattr(self, name) is not _ABSENT:
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        n = sum(1 for name in _FIELDS if getattr(self, name) is not _ABSENT)
+        return n + (len(self._extra) if self._extra is not None else 0)
+
+    def __eq__(self, other):
+        if isinstance(other, Quote):
+            return all(getattr(self, n) == getattr(other, n) for n in _FIELDS) and self._extra == other._extra
+        if type(other) is not dict and not isinstance(other, Mapping):
+            return NotImplemented
+        present = 0
+        for name in _FIELDS:
+            value = getattr(self, name)
+            if other.get(name, _ABSENT) != value:
+                return False
+            present += value is not _ABSENT
+        extra = self._extra or {}
+        return len(other) == present + len(extra) and all(other.get(k, _ABSENT) == v for k, v in extra.items())
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Quote({dict(self)!r})"
+
+
+def compact(q):
+    """`q` as a `Quote` (quotes that already are one, and non-dict values, are returned as is)."""
+    return q if isinstance(q, Quote) or not isinstance(q, Mapping) else Quote(q)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    quotes: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    collections: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+
+class QuoteStore:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._quotes: dict = {}
+        self._collections: dict = {}
+        self._snapshot = Snapshot(0)
+        self._live_versions: dict[str, int] = {}   # listener name -> tree version applied
+        self._shared_versions: dict[str, int] = {}   # shared-cache entry -> version applied
+        self.loaded = False
+        self.loading = False
+        self.trees: set[str] = set()   # trees held in full (quotes may be partial when paged from RTDB)
+        self._loading_left: set[str] = set()   # trees the background load still owns
+        self._on_loaded = None
+        self.search = SearchIndex()
+        self.records = NormalizedCache()
+        self.indexes = QuoteIndexes()
+
+    # ---------- reads ----------
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    # ---------- plumbing ----------
+    def _publish(self):
+        self._snapshot = Snapshot(
+            self._snapshot.version + 1,
+            MappingProxyType(self._quotes),
+            MappingProxyType(self._collections),
+        )
+
+    def _edit_quote(self, qid: str) -> dict | None:
+        """Copy-on-write: give back a private copy of quote `qid` to mutate (None if gone)."""
+        q = self._quotes.get(qid)
+        if q is None:
+            return None
+        q = dict(q)
+        q["fav_by"] = dict(q.get("fav_by") or {})
+        q["collections"] = dict(q.get("collections") or {})
+        return q
+
+    def _store_edit(self, qid: str, q: dict):
+        """Put back a quote changed through `_edit_quote`."""
+        q = Quote(q)
+        self._quotes = dict(self._quotes)
+        self._quotes[qid] = q
+        self.indexes.put(qid, q)
+
+    def _compacted(self, data) -> dict:
+        """`data` with every quote as a `Quote`, reusing the one held when nothing changed."""
+        held = self._quotes
+        out = {}
+        for qid, q in (data or {}).items():
+            if not isinstance(q, Quote) and isinstance(q, Mapping):
+                current = held.get(qid)
+                q = current if isinstance(current, Quote) and current == q else Quote(q)
+            out[qid] = q
+        return out
+
+    # ---------- loading ----------
+    def load_in_background(self, load, names=("quotes", "collections"), on_done=None) -> bool:
+        """Load trees without blocking the caller: one thread per tree, so the trees load in parallel.
+
+        `load(name, publish)` returns the full tree and may call
+        `publish(part)` with what it has so far, which is shown at once
+        (e.g. quotes page by page). A tree that reaches the store another way
+        first (listener, refresh) is no longer touched by its loader. Trees
+        already held or loading are skipped, so a tree left out of the first
+        load can follow later. `on_done()` runs in its own thread once every
+        tree is in. Returns True for the call that started a load.
+        """
+        with self._lock:
+            names = [n for n in names if n not in self.trees and n not in self._loading_left]
+            if not names:
+                return False
+            self.loading = True
+            self._loading_left.update(names)
+            if on_done is not None:
+                self._on_loaded = on_done
+        for name in names:
+            threading.Thread(target=self._load_tree, args=(name, load), name=f"load-{name}",
+                             daemon=True).start()
+        return True
+
+    def _load_tree(self, name: str, load):
+        def publish(part):
+            with self._lock:
+                if name in self._loading_left:
+                    self._set_tree(name, part)
+                    self._publish()
+
+        try:
+            data = load(name, publish)
+        except Exception:
+            data = None   # keep whatever was published; "Refresh" or the listeners catch up
+        with self._lock:
+            if name not in self._loading_left:
+                return
+            if data is not None:
+                self._set_tree(name, data)
+            on_done = self._finish_loading(name)
+            self._publish()
+        self._run_on_done(on_done)
+
+    def _finish_loading(self, name: str):
+        """Hand `name` over from the background load. Returns `on_done` when that was the last tree."""
+        if name not in self._loading_left:
+            return None
+        self._loading_left.discard(name)
+        self.trees.add(name)
+        if self._loading_left:
+            return None
+        self.loading = False
+        self.loaded = True
+        on_done, self._on_loaded = self._on_loaded, None
+        return on_done
+
+    @staticmethod
+    def _run_on_done(on_done):
+        # Only after the finished trees are published, so on_done sees them in snapshot()
+        if on_done is not None:
+            threading.Thread(target=on_done, daemon=True).start()
+
+    def _set_tree(self, name: str, data: dict, shared: bool = False):
+        if name == "quotes":
+            # A listener's tree (`shared`) is kept as is rather than held a second time
+            self._quotes = dict(data or {}) if shared else self._compacted(data)
+            self.search.sync(self._quotes)
+            self.indexes.sync(self._quotes)
+            self.records.retain(self._quotes)
+        else:
+            self._collections = dict(data or {})
+
+    def replace(self, name: str, data: dict, shared: bool = False):
+        with self._lock:
+            self._set_tree(name, data, shared)
+            self.trees.add(name)
+            on_done = None
+            if self.loading:
+                on_done = self._finish_loading(name)
+            else:
+                self.loaded = True
+            self._publish()
+        self._run_on_done(on_done)
+
+    def pull_live(self, name: str, tree: LiveTree) -> bool:
+        """Adopt a listener's tree once per change (not once per session). Returns True if adopted.
+
+        Unchanged quotes keep their identity in the tree, so the indexes only
+        redo the quotes an event actually touched.
+        """
+        if self._live_versions.get(name) == tree.version:
+            return False
+        with self._lock:
+            if self._live_versions.get(name) == tree.version:
+                return False
+            version, data = tree.snapshot()
+            self._live_versions[name] = version
+            self.replace(name, data, shared=True)
+            return True
+
+    def pull_shared(self, name: str, version: int, data: dict) -> bool:
+        """Adopt a tree from the host-wide shared cache once per entry version. Returns True if adopted."""
+        if self._shared_versions.get(name) == version:
+            return False
+        with self._lock:
+            if self._shared_versions.get(name) == version:
+                return False
+            self._shared_versions[name] = version
+            self.replace(name, data)
+            return True
+
+    def _put_quote(self, qid: str, q: dict):
+        q = compact(q)
+        self._quotes = dict(self._quotes)
+        self._quotes[qid] = q
+        self.search.add(qid, q.get("text") or "", q.get("author") or "", is_migrated(q))
+        self.indexes.put(qid, q)
+
+    def _drop_quote(self, qid: str):
+        self._quotes = dict(self._quotes)
+        self._quotes.pop(qid, None)
+        self.search.remove(qid)
+        self.records.evict(qid)
+        self.indexes.remove(qid)
+
+    def apply_delta(self, upserts: dict, removed):
+        """Apply a delta-sync round (changed/new quotes, deleted ids) as one new snapshot."""
+        if not upserts and not removed:
+            return
+        with self._lock:
+            quotes = dict(self._quotes)    # one copy for the whole round
+            for qid in removed:
+                if quotes.pop(qid, None) is not None:
+                    self.search.remove(qid)
+                    self.records.evict(qid)
+                    self.indexes.remove(qid)
+            for qid, q in upserts.items():
+                quotes[qid] = q = compact(q)
+                self.search.add(qid, q.get("text") or "", q.get("author") or "", is_migrated(q))
+                self.indexes.put(qid, q)
+            self._quotes = quotes
+            self._publish()
+
+    # ---------- optimistic writes ----------
+    def add_quote(self, qid: str, payload: dict):
+        with self._lock:
+            self._put_quote(qid, payload)
+            self._publish()
+
+    def delete_quote(self, qid: str):
+        with self._lock:
+            if qid not in self._quotes:
+                return
+            self._drop_quote(qid)
+            self._publish()
+
+    def set_fav(self, qid: str, uid: str, on: bool):
+        with self._lock:
+            q = self._edit_quote(qid)
+            if q is None:
+                return
+            if on:
+                q["fav_by"][uid] = True
+            else:
+                q["fav_by"].pop(uid, None)
+            self._store_edit(qid, q)
+            self._publish()
+
+    def set_quote_collections(self, qid: str, add=(), remove=()):
+        with self._lock:
+            q = self._edit_quote(qid)
+            if q is None:
+                return
+            for cid in add:
+                q["collections"][cid] = True
+            for cid in remove:
+                q["collections"].pop(cid, None)
+            self._store_edit(qid, q)
+            self._publish()
+
+    def set_collection_members(self, cid: str, qids, on: bool) -> list[str]:
+        """Add (or remove) many quotes to one collection as one new snapshot. Returns the ids that changed."""
+        with self._lock:
+            quotes = dict(self._quotes)    # one copy for the whole batch
+            changed = []
+            for qid in qids:
+                q = quotes.get(qid)
+                if q is None or bool((q.get("collections") or {}).get(cid)) == on:
+                    continue
+                q = dict(q)
+                q["collections"] = dict(q.get("collections") or {})
+                if on:
+                    q["collections"][cid] = True
+                else:
+                    q["collections"].pop(cid, None)
+                quotes[qid] = q = Quote(q)
+                self.indexes.put(qid, q)
+                changed.append(qid)
+            if changed:
+                self._quotes = quotes
+                self._publish()
+            return changed
+
+    def add_collection(self, cid: str, payload: dict):
+        with self._lock:
+            self._collections = dict(self._collections)
+            self._collections[cid] = payload
+            self._publish()
+
+    def apply_write(self, path: str, value):
+        """Apply one RTDB-style write (None deletes) under /quotes or /collections.
+
+        Used to roll back optimistic changes whose write failed.
+        """
+        parts = [p for p in path.strip("/").split("/") if p]
+        if len(parts) < 2 or parts[0] not in ("quotes", "collections"):
+            return
+        root, key, rest = parts[0], parts[1], parts[2:]
+        with self._lock:
+            current = (self._quotes if root == "quotes" else self._collections).get(key)
+            if rest:
+                if current is None:
+                    return
+                value = _with_path(current, rest, value)
+            if root == "collections":
+                self._collections = dict(self._collections)
+                if value is None:
+                    self._collections.pop(key, None)
+                else:
+                    self._collections[key] = value
+            elif value is None:
+                self._drop_quote(key)
+            else:
+                self._put_quote(key, value)
+            self._publish()
+
+
+def _with_path(node: dict, keys: list[str], value) -> dict:
+    """Copy of `node` with `value` set (or removed, if None) at `keys`."""
+    node = dict(node)
+    head = keys[0]
+    if len(keys) == 1:
+        child = value
+    else:
+        child = _with_path(node.get(head) if isinstance(node.get(head), dict) else {}, keys[1:], value)
+    if child is None or child == {}:
+        node.pop(head, None)
+    else:
+        node[head] = child
+    return node
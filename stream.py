@@ -0,0 +1,223 @@
+"""Server-Sent Events listeners for RTDB locations.
+
+RTDB's REST API streams a location when asked for `text/event-stream`: the
+first `put` event carries the whole location, later `put`/`patch` events carry
+only what changed. A `LiveTree` mirrors one location from those events and
+bumps its `version` only when the data actually changed, so sessions can
+compare integers instead of polling the database.
+
+Trees are copy-on-write: an event copies only the dicts on the path it
+touches, so a snapshot is never mutated afterwards and unchanged children
+keep their identity from one version to the next.
+"""
+
+import json
+import threading
+
+import requests
+
+from rtdb import FirebaseClient, FirebaseError
+
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+
+def iter_events(lines):
+    """Yield (event, data) pairs from an iterator of SSE text lines."""
+    event, data = None, []
+    for line in lines:
+        if line is None:
+            continue
+        if not line:
+            if event is not None:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+def _split(path: str) -> list[str]:
+    return [p for p in (path or "").strip("/").split("/") if p]
+
+
+class LiveTree:
+    """Thread-safe mirror of one RTDB location, fed by stream events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.data: dict = {}
+        self.version = 0
+        self.ready = False       # True once the initial full `put` arrived
+
+    def _set(self, parts: list[str], value) -> bool:
+        if not parts:
+            value = value if isinstance(value, dict) else {}
+            if value == self.data:
+                return False
+            # A full put (initial load, reconnect): keep the old object for every unchanged child
+            old = self.data
+            self.data = {k: old[k] if old.get(k) == v else v for k, v in value.items()}
+            return True
+
+        node = self.data
+        for p in parts[:-1]:
+            node = node.get(p) if isinstance(node, dict) else None
+        current = node.get(parts[-1]) if isinstance(node, dict) else None
+        if current == value:
+            return False
+
+        def rebuild(node, i: int) -> dict:
+            node = dict(node) if isinstance(node, dict) else {}
+            key = parts[i]
+            child = value if i == len(parts) - 1 else rebuild(node.get(key), i + 1)
+            if child is None or child == {}:
+                node.pop(key, None)      # RTDB has no empty nodes
+            else:
+                node[key] = child
+            return node
+
+        self.data = rebuild(self.data, 0)
+        return True
+
+    def apply(self, event: str, path: str, data) -> bool:
+        """Apply one `put`/`patch` event. Returns True if anything changed."""
+        parts = _split(path)
+        with self._lock:
+            if event == "put":
+                changed = self._set(parts, data)
+            elif event == "patch":
+                changed = False
+                for k, v in (data or {}).items():
+                    changed = self._set(parts + _split(k), v) or changed
+            else:
+                return False
+            if not parts and event == "put":
+                self.ready = True
+            if changed:
+                self.version += 1
+            return changed
+
+    def snapshot(self) -> tuple[int, dict]:
+        """Current (version, data). Treat `data` as read-only; it is shared."""
+        with self._lock:
+            return self.version, self.data
+
+
+class RTDBStream:
+    """Background thread that keeps one event-stream open and feeds a LiveTree.
+
+    Reconnects with exponential backoff. Every (re)connect starts with a full
+    `put` of the location, which is how the tree resumes after a drop.
+    """
+
+    def __init__(self, client: FirebaseClient, path: str, tree: LiveTree, params: dict | None = None):
+        self.client = client
+        self.path = path
+        self.params = params
+        self.tree = tree
+        self.connected = False
+        self.last_error: str | None = None
+        self.bytes_in = 0           # event-stream text received (approximate, in characters)
+
+        self._stop = threading.Event()
+        self._resp: requests.Response | None = None
+        self._thread = threading.Thread(target=self._run, name=f"rtdb-stream{path}", daemon=True)
+
+    def start(self) -> "RTDBStream":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._resp is not None:
+            self._resp.close()
+
+    def _run(self):
+        delay = RECONNECT_MIN_SECONDS
+        while not self._stop.is_set():
+            try:
+                self._resp = self.client.open_stream(self.path, self.params)
+                self.connected = True
+                delay = RECONNECT_MIN_SECONDS
+                if self._consume(self._resp):
+                    return
+            except (FirebaseError, requests.RequestException, ValueError) as e:
+                self.last_error = str(e)
+            finally:
+                self.connected = False
+                if self._resp is not None:
+                    self._resp.close()
+                    self._resp = None
+            self._stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def _counted(self, lines):
+        for line in lines:
+            self.bytes_in += len(line) + 1
+            yield line
+
+    def _consume(self, resp: requests.Response) -> bool:
+        """Read events until the connection drops. Returns True if the stream must not reconnect."""
+        for event, raw in iter_events(self._counted(resp.iter_lines(decode_unicode=True))):
+            if self._stop.is_set():
+                return True
+            if event in ("put", "patch"):
+                payload = json.loads(raw)
+                self.tree.apply(event, payload.get("path", "/"), payload.get("data"))
+            elif event == "cancel":
+                # Security rules no longer allow reading this location
+                self.last_error = f"stream cancelled: {raw}"
+                return True
+            elif event == "auth_revoked":
+                return False
+        return False
+
+
+class LiveHub:
+    """The process-wide set of streams shared by every session."""
+
+    def __init__(self, client: FirebaseClient, chat_window: int, names=("quotes", "collections", "chat")):
+        self.client = client
+        self.chat_window = chat_window
+        self.trees = {name: LiveTree() for name in ("quotes", "collections", "chat")}
+        self._lock = threading.Lock()
+        self._started = False
+        self.streams = {name: self._stream(name) for name in names}
+
+    def _stream(self, name: str) -> RTDBStream:
+        if name == "chat":
+            # Only the newest messages; older ones are fetched on demand
+            params = {"orderBy": json.dumps("$key"), "limitToLast": int(self.chat_window)}
+            return RTDBStream(self.client, "/chat", self.trees["chat"], params=params)
+        return RTDBStream(self.client, f"/{name}", self.trees[name])
+
+    def start(self) -> "LiveHub":
+        with self._lock:
+            self._started = True
+            for s in self.streams.values():
+                s.start()
+        return self
+
+    def watch(self, name: str):
+        """Start listening to `name` too (no-op when it already has a listener)."""
+        with self._lock:
+            if name in self.streams:
+                return
+            stream = self.streams[name] = self._stream(name)
+            if self._started:
+                stream.start()
+
+    def live(self, name: str) -> bool:
+        """True when `name` is connected and has received its initial snapshot."""
+        stream = self.streams.get(name)
+        return stream is not None and stream.connected and self.trees[name].ready
+
+    def stats(self) -> dict[str, int]:
+        out = {}
+        for name, stream in self.streams.items():
+            out[f"{name}_connected"] = int(stream.connected)
+            out[f"{name}_bytes_in"] = stream.bytes_in
+        return out
+
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The app's modules live at the repository root, not in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emulator import Emulator  # noqa: E402
+from rtdb import FirebaseClient  # noqa: E402
+
+
+@pytest.fixture
+def emulator_client():
+    """`make(data, indexes)` -> (Emulator, FirebaseClient) served on a free local port."""
+    servers, clients = [], []
+
+    def make(data: dict, indexes: dict[str, set[str]] | None = None):
+        emu = Emulator(data, indexes=indexes)
+        server = emu.serve(0)
+        client = FirebaseClient(f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+        servers.append(server)
+        clients.append(client)
+        return emu, client
+
+    yield make
+    for client in clients:
+        client.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,100 @@
+import io
+
+import bulk
+from normalize import SCHEMA_VERSION, parse_iso_z
+
+
+def existing_library() -> dict:
+    return {
+        "quotes": {
+            "q1": {"text": "Old one", "author": "Seneca", "created_at": "2024-01-01T00:00:00Z",
+                   "fav_by": {"u1": True, "u2": True}, "collections": {"c1": True}},
+            "q2": {"text": "Old two", "author": "Epictetus", "created_at": "2024-01-02T00:00:00Z",
+                   "fav_by": {"u3": True}},
+        },
+        "collections": {"c1": {"name": "Stoics", "created_at": "2024-01-01T00:00:00Z"}},
+    }
+
+
+def run_import(client, text: str, fmt: str, **kwargs) -> bulk.ImportResult:
+    return bulk.import_quotes(client, bulk.iter_rows(io.StringIO(text), fmt), **kwargs)
+
+
+def test_csv_reimport_keeps_favourites(emulator_client):
+    _, client = emulator_client(existing_library())
+    out = io.StringIO()
+    assert bulk.export_quotes(client, out, "csv") == 2
+
+    csv_text = out.getvalue().replace("Old one", "New one")
+    result = run_import(client, csv_text, "csv")
+    assert (result.imported, result.skipped) == (2, 0)
+
+    q1 = client.get("/quotes/q1")
+    assert q1["text"] == "New one"
+    assert q1["fav_by"] == {"u1": True, "u2": True}
+    assert q1["collections"] == {"c1": True}
+    assert q1["schema_version"] == SCHEMA_VERSION
+    assert isinstance(q1["updated_at"], int)
+    assert client.get("/quotes/q2/fav_by") == {"u3": True}
+
+
+def test_jsonl_round_trip_keeps_everything(emulator_client):
+    _, client = emulator_client(existing_library())
+    out = io.StringIO()
+    bulk.export_quotes(client, out, "jsonl")
+
+    result = run_import(client, out.getvalue(), "jsonl")
+    assert (result.imported, result.collections) == (2, 1)
+    quotes = client.get("/quotes")
+    for qid, before in existing_library()["quotes"].items():
+        assert {k: quotes[qid].get(k) for k in before} == before
+
+
+def test_row_fields_replace_only_what_they_carry(emulator_client):
+    _, client = emulator_client(existing_library())
+    run_import(client, '{"id": "q1", "text": "Edited", "fav_by": {"u9": true}}\n', "jsonl")
+    q1 = client.get("/quotes/q1")
+    assert q1["fav_by"] == {"u9": True}           # carried by the row: replaced
+    assert q1["collections"] == {"c1": True}      # not carried: kept
+    assert q1["author"] == "Seneca"
+    assert q1["created_at"] == "2024-01-01T00:00:00Z"
+
+
+def test_new_id_writes_the_whole_quote(emulator_client):
+    _, client = emulator_client(existing_library())
+    run_import(client, "id,text\nfresh,Brand new\n", "csv")
+    fresh = client.get("/quotes/fresh")
+    assert fresh["text"] == "Brand new"
+    assert parse_iso_z(fresh["created_at"]) is not None
+    assert fresh["schema_version"] == SCHEMA_VERSION
+
+
+def test_rows_without_id_get_push_keys(emulator_client):
+    _, client = emulator_client({})
+    result = run_import(client, "text,author\nOne,A\nTwo,B\n", "csv", batch_size=1)
+    assert (result.imported, result.requests) == (2, 2)
+    quotes = client.get("/quotes")
+    assert sorted(q["text"] for q in quotes.values()) == ["One", "Two"]
+    assert all(len(key) == 20 for key in quotes)
+
+
+def test_bad_rows_are_reported_and_skipped(emulator_client):
+    _, client = emulator_client({})
+    rows = "\n".join([
+        '{"text": "fine"}',
+        "not json",
+        '{"text": ""}',
+        '{"text": "bad date", "created_at": "yesterday"}',
+        '{"id": "a/b", "text": "bad id"}',
+        '{"kind": "collection", "name": "No id"}',
+    ])
+    result = run_import(client, rows, "jsonl")
+    assert (result.imported, result.skipped) == (1, 5)
+    assert [n for n, _ in result.errors] == [2, 3, 4, 5, 6]
+
+
+def test_dry_run_writes_nothing(emulator_client):
+    _, client = emulator_client(existing_library())
+    result = run_import(client, '{"id": "q1", "text": "Edited"}\n{"text": "New"}\n', "jsonl", dry_run=True)
+    assert result.imported == 2
+    assert client.get("/quotes") == existing_library()["quotes"]
@@ -0,0 +1,85 @@
+from chat import ARCHIVE_PATH, ChatBuffer, PollSchedule, compact
+from rtdb import push_key
+
+DAY_MS = 86_400_000
+START_MS = 1_704_067_200_000    # 2024-01-01T00:00:00Z
+
+
+def messages(n: int, start_ms: int = START_MS, step_ms: int = 1000) -> dict:
+    return {push_key(start_ms + i * step_ms): {"user": "u", "text": f"m{i}"} for i in range(n)}
+
+
+def texts(buffer: ChatBuffer) -> list[str]:
+    return [m["text"] for _, m in buffer.messages]
+
+
+def test_sync_fetches_the_tail_then_only_new_messages(emulator_client):
+    _, client = emulator_client({"chat": messages(10)})
+    buffer = ChatBuffer(initial_limit=4)
+    assert buffer.sync(client) == 4
+    assert texts(buffer) == ["m6", "m7", "m8", "m9"]
+
+    assert buffer.sync(client) == 0        # the cursor itself comes back and is skipped
+    client.post("/chat", {"user": "u", "text": "new"})
+    assert buffer.sync(client) == 1
+    assert texts(buffer)[-1] == "new"
+
+
+def test_live_tail_is_bounded(emulator_client):
+    _, client = emulator_client({"chat": messages(3)})
+    buffer = ChatBuffer(max_size=5)
+    buffer.sync(client)
+    for _ in range(4):
+        client.post("/chat", {"user": "u", "text": "more"})
+    buffer.sync(client)
+    assert len(buffer.items) == 5
+    assert buffer.cursor == max(client.get("/chat"))
+
+
+def test_load_earlier_pages_backwards_through_chat(emulator_client):
+    _, client = emulator_client({"chat": messages(7)})
+    buffer = ChatBuffer(initial_limit=3)
+    buffer.sync(client)
+    assert buffer.load_earlier(client, limit=3) == 3
+    assert buffer.load_earlier(client, limit=3) == 1
+    assert texts(buffer) == [f"m{i}" for i in range(7)]
+    assert buffer.load_earlier(client, limit=3) == 0
+    assert not buffer.has_earlier
+
+
+
+def test_compact_moves_old_messages_into_day_buckets(emulator_client):
+    chat = {**messages(3), **messages(4, START_MS + DAY_MS)}
+    _, client = emulator_client({"chat": chat})
+    assert compact(client, keep=2, chunk=2) == 5
+    assert sorted(client.get("/chat")) == sorted(chat)[-2:]
+    archive = client.get(ARCHIVE_PATH)
+    assert {day: len(msgs) for day, msgs in archive.items()} == {"2024-01-01": 3, "2024-01-02": 2}
+    assert compact(client, keep=2) == 0
+
+
+def test_load_earlier_continues_into_the_archive(emulator_client):
+    chat = {**messages(3), **messages(4, START_MS + DAY_MS)}
+    _, client = emulator_client({"chat": chat})
+    compact(client, keep=2)
+    buffer = ChatBuffer()
+    buffer.sync(client)
+    assert texts(buffer) == ["m2", "m3"]
+    while buffer.load_earlier(client, limit=2):
+        pass
+    assert texts(buffer) == ["m0", "m1", "m2", "m0", "m1", "m2", "m3"]
+    assert not buffer.has_earlier
+
+
+def test_poll_schedule_backs_off_while_quiet():
+    schedule = PollSchedule(2, 20)
+    intervals = []
+    for _ in range(6):
+        intervals.append(schedule.interval)
+        schedule.record(0)
+    assert intervals == [2, 4, 8, 16, 20, 20]
+    schedule.record(3)
+    assert schedule.interval == 2
+    schedule.record(0)
+    schedule.activity()
+    assert schedule.interval == 2
@@ -0,0 +1,88 @@
+import pytest
+
+import delta
+from delta import SERVER_TIMESTAMP, QuoteDeltaSync, TooManyChanges, updated_at_stamps
+from rtdb import FirebaseError
+from store import QuoteStore
+
+INDEXED = {"/quotes": {"updated_at"}}
+
+
+def library() -> dict:
+    return {
+        "quotes": {
+            f"q{i}": {"text": f"quote {i}", "created_at": "2024-01-01T00:00:00Z", "updated_at": 1000 + i,
+                      "fav_by": {"u1": True}}
+            for i in range(5)
+        }
+    }
+
+
+def local_store(client) -> QuoteStore:
+    store = QuoteStore()
+    store.replace("quotes", client.get("/quotes"))
+    return store
+
+
+def test_diff_finds_added_changed_and_removed_quotes(emulator_client):
+    _, client = emulator_client(library(), INDEXED)
+    store = local_store(client)
+    sync = QuoteDeltaSync(client)
+    assert not sync.diff(store.snapshot().quotes)
+
+    client.put("/quotes/new", {"text": "new", "updated_at": SERVER_TIMESTAMP})
+    client.patch("/", {"quotes/q1/fav_by/u2": True, "quotes/q1/updated_at": SERVER_TIMESTAMP})
+    client.delete("/quotes/q2")
+    d = sync.diff(store.snapshot().quotes)
+    assert sorted(d.upserts) == ["new", "q1"]
+    assert d.upserts["q1"]["fav_by"] == {"u1": True, "u2": True}
+    assert d.removed == ["q2"]
+
+    store.apply_delta(d.upserts, d.removed)
+    assert store.snapshot().quotes == client.get("/quotes")
+    # The quote at the marker comes back (startAt is inclusive) but is not reported again
+    assert not sync.diff(store.snapshot().quotes)
+
+
+def test_changes_without_updated_at_stamp_are_not_seen(emulator_client):
+    # Why the write queue stamps every edited quote: delta sync only looks past the marker
+    _, client = emulator_client(library(), INDEXED)
+    store = local_store(client)
+    sync = QuoteDeltaSync(client)
+    sync.diff(store.snapshot().quotes)
+    client.put("/quotes/q3/text", "edited elsewhere")
+    assert not sync.diff(store.snapshot().quotes)
+
+
+def test_too_many_new_quotes(emulator_client, monkeypatch):
+    monkeypatch.setattr(delta, "MAX_SINGLE_FETCHES", 2)
+    _, client = emulator_client(library(), INDEXED)
+    sync = QuoteDeltaSync(client)
+    with pytest.raises(TooManyChanges):
+        sync.diff({})
+
+
+def test_missing_index_is_a_400(emulator_client):
+    _, client = emulator_client(library(), {})
+    with pytest.raises(FirebaseError) as e:
+        QuoteDeltaSync(client).diff({})
+    assert e.value.status == 400
+
+
+def test_reset_reseeds_the_marker():
+    sync = QuoteDeltaSync(client=None)
+    sync.reset({"a": {"updated_at": 5}, "b": {"updated_at": 9}, "c": {"text": "no stamp"}})
+    assert sync.marker == 9
+    sync.reset({})
+    assert sync.marker == 0
+
+
+def test_updated_at_stamps():
+    stamps = updated_at_stamps([
+        "/quotes/q1/fav_by/u1",
+        "/quotes/q1/collections/c1",
+        "/quotes/q2",                  # whole-quote write: no stamp below it
+        "/quotes/q3/updated_at",
+        "/collections/c1",
+    ])
+    assert stamps == {"/quotes/q1/updated_at": SERVER_TIMESTAMP}
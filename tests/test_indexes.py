@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from indexes import SORT_AUTHOR, SORT_NEWEST, SORT_OLDEST, QuoteIndexes, epoch_ms
+
+USERS = [f"u{i}" for i in range(5)]
+COLLECTIONS = [f"c{i}" for i in range(4)]
+AUTHORS = ["Seneca", "seneca ", "Marcus Aurelius", "Epictetus", "", None]
+
+
+def random_quote(rnd: random.Random) -> dict:
+    q = {
+        "text": "t",
+        "author": rnd.choice(AUTHORS),
+        # Few distinct times, so ties on created_at are common; some missing or unreadable
+        "created_at": rnd.choice([f"2024-01-0{d}T00:00:00Z" for d in range(1, 6)] + ["", None, "garbage"]),
+        "fav_by": {u: True for u in rnd.sample(USERS, rnd.randint(0, 2))},
+        "collections": {c: True for c in rnd.sample(COLLECTIONS, rnd.randint(0, 2))},
+    }
+    return {k: v for k, v in q.items() if v is not None}
+
+
+def brute_force(quotes: dict, *, fav_uid=None, collection_id=None, within=None, sort=SORT_NEWEST) -> list[str]:
+    ids = [
+        qid for qid, q in quotes.items()
+        if (fav_uid is None or (q.get("fav_by") or {}).get(fav_uid))
+        and (collection_id is None or (q.get("collections") or {}).get(collection_id))
+        and (within is None or qid in within)
+    ]
+    if sort == SORT_AUTHOR:
+        return sorted(ids, key=lambda qid: ((quotes[qid].get("author") or "").strip().lower(), qid))
+    ids.sort(key=lambda qid: (epoch_ms(quotes[qid].get("created_at") or ""), qid), reverse=sort == SORT_NEWEST)
+    return ids
+
+
+def views(rnd: random.Random, quotes: dict):
+    within = set(rnd.sample(sorted(quotes), min(len(quotes), 7)))
+    for sort in (SORT_NEWEST, SORT_OLDEST, SORT_AUTHOR):
+        yield {"sort": sort}
+        for uid in USERS:
+            yield {"sort": sort, "fav_uid": uid}
+        for cid in COLLECTIONS + ["missing"]:
+            yield {"sort": sort, "collection_id": cid}
+        yield {"sort": sort, "within": within}
+        yield {"sort": sort, "fav_uid": USERS[0], "collection_id": COLLECTIONS[0], "within": within}
+
+
+def check(idx: QuoteIndexes, quotes: dict, rnd: random.Random):
+    assert len(idx) == len(quotes)
+    for view in views(rnd, quotes):
+        assert idx.query(**view) == brute_force(quotes, **view), view
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query_matches_brute_force_through_edits(seed):
+    rnd = random.Random(seed)
+    quotes = {f"q{i:03}": random_quote(rnd) for i in range(200)}
+    idx = QuoteIndexes()
+    idx.sync(quotes)
+    check(idx, quotes, rnd)
+
+    for step in range(300):
+        qid = f"q{rnd.randrange(260):03}"
+        if qid in quotes and rnd.random() < 0.3:
+            del quotes[qid]
+            idx.remove(qid)
+        else:
+            # A fresh dict, as the store never mutates a quote in place
+            quotes[qid] = random_quote(rnd)
+            idx.put(qid, quotes[qid])
+        if step % 50 == 0:
+            check(idx, quotes, rnd)
+    check(idx, quotes, rnd)
+
+
+def test_sync_applies_small_and_bulk_changes():
+    rnd = random.Random(42)
+    quotes = {f"q{i:03}": random_quote(rnd) for i in range(300)}
+    idx = QuoteIndexes()
+    idx.sync(quotes)
+
+    small = dict(quotes)
+    small["q000"] = random_quote(rnd)
+    del small["q001"]
+    small["new"] = random_quote(rnd)
+    idx.sync(small)
+    check(idx, small, rnd)
+
+    bulk = {qid: (random_quote(rnd) if i % 2 else q) for i, (qid, q) in enumerate(small.items()) if i % 5}
+    idx.sync(bulk)
+    check(idx, bulk, rnd)
+
+
+def test_is_fav_follows_changes():
+    idx = QuoteIndexes()
+    idx.put("q1", {"fav_by": {"u1": True}})
+    assert idx.is_fav("q1", "u1")
+    idx.put("q1", {"fav_by": {"u1": False, "u2": True}})
+    assert not idx.is_fav("q1", "u1")
+    assert idx.is_fav("q1", "u2")
+    idx.remove("q1")
+    assert not idx.is_fav("q1", "u2")
+    assert idx.query(fav_uid="u2") == []
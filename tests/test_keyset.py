@@ -0,0 +1,119 @@
+import pytest
+
+from keyset import QuotePager, order_key
+
+PAGE = 4
+
+
+def library() -> dict:
+    """Quotes whose created_at ties across more than a page, plus some with none at all."""
+    quotes = {}
+    for i in range(6):
+        quotes[f"a{i}"] = {"text": "t", "created_at": "2024-01-01T00:00:00Z"}      # 6 tied rows
+    for i in range(3):
+        quotes[f"b{i}"] = {"text": "t", "created_at": f"2024-02-0{i + 1}T00:00:00Z"}
+    for i in range(5):
+        quotes[f"n{i}"] = {"text": "t"}                                              # null created_at
+    quotes["z0"] = {"text": "t", "created_at": "2024-03-01T00:00:00Z"}
+    quotes["z1"] = {"text": "t", "created_at": "2024-03-01T00:00:00Z"}
+    return quotes
+
+
+def expected(quotes: dict, newest: bool) -> list[str]:
+    return sorted(quotes, key=lambda k: (order_key(quotes[k].get("created_at")), k), reverse=newest)
+
+
+def walk(pager: QuotePager, newest: bool) -> list[list[str]]:
+    pages, after = [], None
+    while True:
+        page = pager.page(PAGE, newest=newest, after=after)
+        pages.append([key for key, _ in page.items])
+        if page.next is None:
+            return pages
+        last_key, last = page.items[-1]
+        assert (page.next.value, page.next.key) == (last.get("created_at"), last_key)
+        after = page.next
+
+
+@pytest.mark.parametrize("newest", [True, False])
+def test_pages_cover_every_row_once_in_order(emulator_client, newest):
+    quotes = library()
+    _, client = emulator_client({"quotes": quotes}, {"/quotes": {"created_at"}})
+    pages = walk(QuotePager(client), newest)
+
+    assert all(len(p) == PAGE for p in pages[:-1])
+    assert 0 < len(pages[-1]) <= PAGE
+    assert [key for p in pages for key in p] == expected(quotes, newest)
+
+
+def test_exact_multiple_of_page_size_ends_without_empty_page(emulator_client):
+    quotes = {f"q{i}": {"created_at": f"2024-01-0{i + 1}T00:00:00Z"} for i in range(PAGE * 2)}
+    _, client = emulator_client({"quotes": quotes}, {"/quotes": {"created_at"}})
+    assert [len(p) for p in walk(QuotePager(client), True)] == [PAGE, PAGE]
+
+
+def recorded_queries(client) -> list[tuple[dict, int]]:
+    """Wrap `client.get` to record (params, rows returned) per request."""
+    calls = []
+    get = client.get
+
+    def recording_get(path, params=None):
+        out = get(path, params)
+        calls.append((dict(params or {}), len(out or {})))
+        return out
+
+    client.get = recording_get
+    return calls
+
+
+@pytest.mark.parametrize("newest", [True, False])
+def test_each_later_page_is_one_request(emulator_client, newest):
+    quotes = {f"q{i:02}": {"created_at": f"2024-01-{i + 1:02}T00:00:00Z"} for i in range(PAGE * 5)}
+    _, client = emulator_client({"quotes": quotes}, {"/quotes": {"created_at"}})
+    calls = recorded_queries(client)
+    pages = walk(QuotePager(client), newest)
+    assert len(pages) == 5
+    assert len(calls) == 5
+    assert all(rows <= PAGE + 2 for _, rows in calls)
+
+
+@pytest.mark.parametrize("newest", [True, False])
+def test_paging_across_rows_without_created_at_stays_bounded(emulator_client, newest):
+    quotes = {f"d{i:02}": {"created_at": f"2024-01-{i + 1:02}T00:00:00Z"} for i in range(20)}
+    quotes.update({f"n{i:02}": {"text": "t"} for i in range(PAGE * 3)})
+    _, client = emulator_client({"quotes": quotes}, {"/quotes": {"created_at"}})
+    calls = recorded_queries(client)
+    pages = walk(QuotePager(client), newest)
+
+    assert [key for p in pages for key in p] == expected(quotes, newest)
+    bound = "endAt" if newest else "startAt"
+    null_cursor_calls = [(params, rows) for params, rows in calls if params.get(bound) == "null"]
+    assert null_cursor_calls, "a cursor on a row without created_at must still bound the query"
+    # One request per page, even inside the run of rows tied at null
+    assert len(calls) == len(pages)
+    assert sum(rows for _, rows in calls) <= len(quotes) + len(pages) * (PAGE * 3 + 2)
+
+
+def test_pages_are_cached_until_invalidated(emulator_client):
+    emu, client = emulator_client({"quotes": library()}, {"/quotes": {"created_at"}})
+    pager = QuotePager(client)
+    first = pager.page(PAGE)
+    assert pager.page(PAGE) is first
+    assert pager.stats["hits"] == 1
+
+    client.put("/quotes/z9", {"text": "t", "created_at": "2025-01-01T00:00:00Z"})
+    assert pager.page(PAGE) is first
+    pager.invalidate()
+    assert pager.page(PAGE).items[0][0] == "z9"
+
+
+def test_has_index(emulator_client):
+    _, indexed = emulator_client({"quotes": library()}, {"/quotes": {"created_at"}})
+    _, unindexed = emulator_client({"quotes": library()}, {})
+    assert QuotePager(indexed).has_index()
+    assert not QuotePager(unindexed).has_index()
+
+
+def test_order_key_follows_rtdb_ordering():
+    values = ["b", "a", 10, 2.5, True, False, None, {"x": 1}]
+    assert sorted(values, key=order_key) == [None, False, True, 2.5, 10, "a", "b", {"x": 1}]
@@ -0,0 +1,70 @@
+import pytest
+
+import migrate
+from normalize import SCHEMA_VERSION
+
+LEGACY = '<p>Be brief.</p> <div class="muted">Added: 2024-01-01</div>'
+
+
+def legacy_library(n: int = 12) -> dict:
+    quotes = {f"q{i:02}": {"text": LEGACY, "fav_by": {"u1": True}} for i in range(n)}
+    quotes["q05"] = {"text": "Already clean", "schema_version": SCHEMA_VERSION}
+    return {"quotes": quotes}
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_interrupted_run_resumes_from_checkpoint(emulator_client, tmp_path):
+    _, client = emulator_client(legacy_library())
+    checkpoint = str(tmp_path / "checkpoint.json")
+    url = client.base_url
+
+    def stop_after_first_batch(result):
+        migrate.save_checkpoint(checkpoint, url, result.last_key)
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        migrate.migrate_quotes(client, batch_size=4, page_size=5, on_batch=stop_after_first_batch)
+
+    after = migrate.load_checkpoint(checkpoint, url)
+    assert after == "q03"     # the first batch of 4 migrations ends there
+    quotes = client.get("/quotes")
+    assert [k for k, q in sorted(quotes.items()) if q.get("schema_version") == SCHEMA_VERSION] == \
+        ["q00", "q01", "q02", "q03", "q05"]
+
+    result = migrate.migrate_quotes(client, batch_size=4, page_size=5, after=after)
+    assert result.scanned == 8
+    assert result.migrated == 7             # q05 was already migrated
+    assert result.last_key == "q11"
+
+    for key, q in client.get("/quotes").items():
+        assert q["schema_version"] == SCHEMA_VERSION
+        if key != "q05":
+            assert q["text"] == "Be brief."
+            assert q["fav_by"] == {"u1": True}
+            assert isinstance(q["updated_at"], int)
+
+
+def test_second_run_writes_nothing(emulator_client):
+    _, client = emulator_client(legacy_library())
+    migrate.migrate_quotes(client, batch_size=5)
+    again = migrate.migrate_quotes(client, batch_size=5)
+    assert (again.scanned, again.migrated, again.requests) == (12, 0, 0)
+
+
+def test_dry_run_reports_samples_without_writing(emulator_client):
+    _, client = emulator_client(legacy_library(3))
+    result = migrate.migrate_quotes(client, dry_run=True)
+    assert (result.migrated, result.text_changed, result.requests) == (3, 3, 0)
+    assert result.samples[0] == ("q00", LEGACY, "Be brief.")
+    assert client.get("/quotes/q00/text") == LEGACY
+
+
+def test_checkpoint_belongs_to_one_database(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    migrate.save_checkpoint(path, "http://a", "q10")
+    assert migrate.load_checkpoint(path, "http://a") == "q10"
+    assert migrate.load_checkpoint(path, "http://b") is None
+    assert migrate.load_checkpoint(str(tmp_path / "missing.json"), "http://a") is None
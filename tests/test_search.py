@@ -0,0 +1,50 @@
+from search import SCORE_AUTHOR_EXACT, SCORE_TEXT_PREFIX, SearchIndex
+
+
+def quotes() -> dict:
+    return {
+        "q1": {"text": "<p>The Stoic endures.</p>", "author": "Seneca"},
+        "q2": {"text": "Stoicism is a practice", "author": "Epictetus"},
+        "q3": {"text": "Seneca wrote letters", "author": "Anon"},
+    }
+
+
+def test_words_are_anded_and_match_as_prefixes():
+    index = SearchIndex()
+    index.sync(quotes())
+    assert index.search("") is None
+    assert set(index.search("stoi")) == {"q1", "q2"}
+    assert set(index.search("stoic endures")) == {"q1"}
+    assert index.search("stoic missing") == {}
+    assert set(index.search("p")) == {"q2"}        # markup is cleaned before indexing
+
+
+def test_ranking_prefers_author_and_exact_matches():
+    index = SearchIndex()
+    index.sync(quotes())
+    scores = index.search("seneca", rank=True)
+    assert scores["q1"] == SCORE_AUTHOR_EXACT
+    assert scores["q1"] > scores["q3"]
+    assert index.search("stoi", rank=True)["q2"] == SCORE_TEXT_PREFIX
+
+
+def test_sync_only_touches_what_changed():
+    tokenized = []
+
+    def clean(text):
+        tokenized.append(text)
+        return text
+
+    index = SearchIndex(clean=clean)
+    data = quotes()
+    index.sync(data)
+    tokenized.clear()
+
+    data = {**data, "q2": {"text": "Changed text", "author": "Epictetus"}}
+    del data["q3"]
+    index.sync(data)
+    assert tokenized == ["Changed text"]
+    assert len(index) == 2
+    assert index.search("letters") == {}
+    assert index.search("stoicism") == {}
+    assert set(index.search("changed")) == {"q2"}
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from shared import SharedCache
+
+
+class Fetcher:
+    """Counts calls; returns (data, etag) from `results`, or None for "unchanged"."""
+
+    def __init__(self, *results, delay: float = 0.0):
+        self.results = list(results)
+        self.delay = delay
+        self.etags = []
+
+    @property
+    def calls(self) -> int:
+        return len(self.etags)
+
+    def __call__(self, etag):
+        self.etags.append(etag)
+        time.sleep(self.delay)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shared.sqlite")
+
+
+def test_fresh_entry_is_fetched_once_per_host(path):
+    a, b = SharedCache(path), SharedCache(path)
+    fetch = Fetcher(({"x": 1}, "e1"))
+    assert a.fetch("quotes", 60, fetch) == (1, {"x": 1})
+    assert b.fetch("quotes", 60, fetch) == (1, {"x": 1})
+    assert fetch.calls == 1
+    assert b.stats["hits"] == 1
+
+
+def test_stale_entry_is_refetched_with_its_etag(path):
+    cache = SharedCache(path)
+    fetch = Fetcher(({"x": 1}, "e1"), None, ({"x": 2}, "e2"))
+    cache.fetch("quotes", 60, fetch)
+    assert cache.fetch("quotes", 0, fetch) == (1, {"x": 1})     # unchanged: same version
+    assert cache.fetch("quotes", 0, fetch) == (2, {"x": 2})
+    assert fetch.etags == [None, "e1", "e1"]
+
+
+def test_only_the_lease_holder_fetches_others_serve_stale(path):
+    a, b = SharedCache(path), SharedCache(path)
+    a.fetch("quotes", 60, Fetcher(({"x": 1}, "e1")))
+    a.invalidate("quotes")
+
+    slow = Fetcher(({"x": 2}, "e2"), delay=0.5)
+    thread = threading.Thread(target=a.fetch, args=("quotes", 60, slow))
+    thread.start()
+    time.sleep(0.1)                     # a holds the lease now
+
+    other = Fetcher(({"x": 3}, "e3"))
+    assert b.fetch("quotes", 60, other) == (1, {"x": 1})
+    assert other.calls == 0
+    assert b.stats["stale"] == 1
+    thread.join()
+    assert b.fetch("quotes", 60, other) == (2, {"x": 2})
+
+
+def test_without_an_entry_others_wait_for_the_elected_fetch(path):
+    a, b = SharedCache(path), SharedCache(path)
+    slow = Fetcher(({"x": 1}, "e1"), delay=0.3)
+    thread = threading.Thread(target=a.fetch, args=("quotes", 60, slow))
+    thread.start()
+    time.sleep(0.05)
+    other = Fetcher(({"x": 2}, "e2"))
+    assert b.fetch("quotes", 60, other) == (1, {"x": 1})
+    assert other.calls == 0
+    assert b.stats["waits"] == 1
+    thread.join()
+
+
+def test_expired_lease_is_taken_over(path):
+    a, b = SharedCache(path, lease_seconds=0.2), SharedCache(path, lease_seconds=0.2)
+    a.fetch("quotes", 60, Fetcher(({"x": 1}, "e1")))
+    a.invalidate("quotes")
+    assert a._try_lease("quotes", 60)    # a "dies" holding the lease
+
+    fetch = Fetcher(({"x": 2}, "e2"))
+    assert b.fetch("quotes", 60, fetch) == (1, {"x": 1})     # lease still live: stale copy
+    time.sleep(0.25)
+    assert b.fetch("quotes", 60, fetch) == (2, {"x": 2})
+    assert fetch.calls == 1
+
+
+def test_failed_fetch_releases_the_lease(path):
+    a, b = SharedCache(path), SharedCache(path)
+    with pytest.raises(RuntimeError):
+        a.fetch("quotes", 60, Fetcher(RuntimeError("down")))
+    assert b.fetch("quotes", 60, Fetcher(({"x": 1}, "e1"))) == (1, {"x": 1})
+
+
+def test_entries_are_decoded_once_per_version(path):
+    a, b = SharedCache(path), SharedCache(path)
+    a.fetch("quotes", 60, Fetcher(({"x": 1}, "e1")))
+    first = b.get("quotes")[1]
+    assert b.get("quotes")[1] is first
+    assert b.stats["decodes"] == 1
@@ -0,0 +1,26 @@
+from snapshots import SnapshotCache
+
+
+def quote(text: str) -> dict:
+    return {"text": text, "author": "Seneca", "created_at": "2024-01-01T00:00:00Z"}
+
+
+def test_snapshot_revalidates_with_its_etag(emulator_client, tmp_path):
+    _, client = emulator_client({"quotes": {"q1": quote("one")}})
+    snapshots = SnapshotCache(client, str(tmp_path))
+    assert not snapshots.has("quotes")
+    assert snapshots.fetch("quotes") == {"q1": quote("one")}
+    assert snapshots.fetch("quotes") is None              # 304: nothing downloaded
+
+    client.put("/quotes/q2", quote("two"))
+    assert sorted(snapshots.fetch("quotes")) == ["q1", "q2"]
+
+    # A new process starts from the file and still revalidates conditionally
+    cold = SnapshotCache(client, str(tmp_path))
+    assert sorted(cold.load("quotes")) == ["q1", "q2"]
+    assert cold.fetch("quotes") is None
+
+
+def test_unusable_snapshot_is_ignored(tmp_path):
+    (tmp_path / "quotes.json").write_text("{not json")
+    assert SnapshotCache(None, str(tmp_path)).load("quotes") is None
@@ -0,0 +1,79 @@
+import json
+
+from snapshots import SnapshotCache
+from store import Quote, QuoteStore
+from stream import LiveTree
+
+
+def raw(text="t", **more) -> dict:
+    return {"text": text, "author": "Seneca", "created_at": "2024-01-01T00:00:00Z",
+            "fav_by": {"u1": True}, "collections": {"c1": True}, **more}
+
+
+def test_quote_reads_like_the_dict_it_was_built_from():
+    data = raw(legacy_field=1)
+    q = Quote(data)
+    assert dict(q) == data
+    assert q == data and data == q
+    assert q != raw() and raw() != q
+    assert q["text"] == "t" and q.get("updated_at") is None and q.get("updated_at", 0) == 0
+    assert "legacy_field" in q and "updated_at" not in q
+    assert len(q) == len(data)
+    assert json.loads(json.dumps(q, default=dict)) == data
+
+
+def test_authors_are_interned():
+    a = Quote({"author": "".join(["Sen", "eca"])})
+    b = Quote({"author": "".join(["Se", "neca"])})
+    assert a["author"] is b["author"]
+
+
+def test_loaded_quotes_are_compacted_and_kept_when_unchanged():
+    store = QuoteStore()
+    store.replace("quotes", {"q1": raw(), "q2": raw("other")})
+    first = store.snapshot().quotes
+    assert all(isinstance(q, Quote) for q in first.values())
+
+    store.replace("quotes", {"q1": raw(), "q2": raw("changed")})
+    second = store.snapshot().quotes
+    assert second["q1"] is first["q1"]          # equal content: same record, no re-indexing
+    assert second["q2"]["text"] == "changed"
+
+
+def test_writes_build_new_records():
+    store = QuoteStore()
+    store.replace("quotes", {"q1": raw()})
+    before = store.snapshot().quotes["q1"]
+
+    store.set_fav("q1", "u2", True)
+    after = store.snapshot().quotes["q1"]
+    assert isinstance(after, Quote) and after is not before
+    assert before["fav_by"] == {"u1": True}    # the old snapshot is untouched
+    assert after["fav_by"] == {"u1": True, "u2": True}
+    assert store.indexes.is_fav("q1", "u2")
+
+    store.set_collection_members("c2", ["q1"], True)
+    store.apply_write("/quotes/q1/text", "edited")
+    q = store.snapshot().quotes["q1"]
+    assert isinstance(q, Quote)
+    assert (q["text"], q["collections"]) == ("edited", {"c1": True, "c2": True})
+
+    store.apply_delta({"q2": raw("new")}, ["q1"])
+    assert list(store.snapshot().quotes) == ["q2"]
+    assert isinstance(store.snapshot().quotes["q2"], Quote)
+
+
+def test_listener_tree_is_shared_not_copied():
+    tree = LiveTree()
+    tree.apply("put", "/", {"q1": raw()})
+    store = QuoteStore()
+    assert store.pull_live("quotes", tree)
+    assert store.snapshot().quotes["q1"] is tree.data["q1"]
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    store = QuoteStore()
+    store.replace("quotes", {"q1": raw(), "q2": raw("two", updated_at=5)})
+    snapshots = SnapshotCache(None, str(tmp_path))
+    snapshots.save("quotes", dict(store.snapshot().quotes), None)
+    assert snapshots.load("quotes") == {"q1": raw(), "q2": raw("two", updated_at=5)}
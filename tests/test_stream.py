@@ -0,0 +1,88 @@
+from stream import LiveTree, iter_events
+
+
+def test_iter_events_parses_sse_lines():
+    lines = [
+        "event: put",
+        'data: {"path": "/", "data": {"a": 1}}',
+        "",
+        "event: keep-alive",
+        "data: null",
+        "",
+        None,                        # iter_lines yields None for keep-alive chunks
+        "event: patch",
+        'data: {"path": "/a",',
+        'data:  "data": {"b": 2}}',
+        "",
+        "data: no event line",
+        "",
+        "event: put",
+        'data: {"path": "/x", "data": 1}',   # not terminated by a blank line: not emitted
+    ]
+    assert list(iter_events(lines)) == [
+        ("put", '{"path": "/", "data": {"a": 1}}'),
+        ("keep-alive", "null"),
+        ("patch", '{"path": "/a",\n"data": {"b": 2}}'),
+    ]
+
+
+def test_initial_put_marks_ready():
+    tree = LiveTree()
+    assert not tree.ready
+    assert tree.apply("put", "/", {"q1": {"text": "a"}})
+    assert tree.ready
+    assert tree.snapshot() == (1, {"q1": {"text": "a"}})
+
+
+def test_put_of_a_child_does_not_mark_ready():
+    tree = LiveTree()
+    tree.apply("put", "/q1", {"text": "a"})
+    assert not tree.ready
+    assert tree.data == {"q1": {"text": "a"}}
+
+
+def test_nested_put_and_patch():
+    tree = LiveTree()
+    tree.apply("put", "/", {"q1": {"text": "a", "fav_by": {"u1": True}}})
+    assert tree.apply("put", "/q1/fav_by/u2", True)
+    assert tree.apply("patch", "/q1", {"text": "b", "fav_by/u1": None})
+    assert tree.data == {"q1": {"text": "b", "fav_by": {"u2": True}}}
+    assert tree.version == 3
+
+
+def test_null_removes_and_prunes_empty_parents():
+    tree = LiveTree()
+    tree.apply("put", "/", {"q1": {"fav_by": {"u1": True}}, "q2": {"text": "x"}})
+    assert tree.apply("put", "/q1/fav_by/u1", None)
+    assert tree.data == {"q2": {"text": "x"}}
+    assert tree.apply("put", "/q2", None)
+    assert tree.data == {}
+
+
+def test_unchanged_events_keep_the_version():
+    tree = LiveTree()
+    tree.apply("put", "/", {"q1": {"text": "a"}})
+    assert not tree.apply("put", "/q1/text", "a")
+    assert not tree.apply("patch", "/", {"q1/text": "a"})
+    assert not tree.apply("put", "/", {"q1": {"text": "a"}})
+    assert not tree.apply("keep-alive", "/", None)
+    assert tree.version == 1
+
+
+def test_copy_on_write_keeps_old_snapshots_and_unchanged_children():
+    tree = LiveTree()
+    tree.apply("put", "/", {"q1": {"text": "a"}, "q2": {"text": "b"}})
+    _, before = tree.snapshot()
+    q2 = before["q2"]
+
+    tree.apply("put", "/q1/text", "changed")
+    _, after = tree.snapshot()
+    assert before == {"q1": {"text": "a"}, "q2": {"text": "b"}}
+    assert after["q1"] == {"text": "changed"}
+    assert after["q2"] is q2
+
+    # A full put again (reconnect) keeps the identity of children that did not change
+    tree.apply("put", "/", {"q1": {"text": "changed"}, "q2": {"text": "b"}, "q3": {"text": "c"}})
+    _, resumed = tree.snapshot()
+    assert resumed["q2"] is q2
+    assert resumed["q1"] is after["q1"]
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+import writes
+from rtdb import FirebaseError, WriteBatch
+from writes import WriteQueue
+
+
+class FakeClient:
+    """Records each multi-path PATCH; fails the first `fail_times` of them."""
+
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.patches: list[dict] = []
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def patch(self, path: str, updates: dict):
+        assert path == "/"
+        with self._lock:
+            self.attempts += 1
+            if self.attempts <= self.fail_times:
+                raise FirebaseError("503 Service Unavailable", status=503)
+            self.patches.append(dict(updates))
+
+
+def drain(queue: WriteQueue, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while queue.pending_count():
+        assert time.monotonic() < deadline, "write queue did not drain"
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(writes, "RETRY_BACKOFF_SECONDS", 0.01)
+
+
+def make_queue(client, **kwargs) -> WriteQueue:
+    # A long enough flush delay that submits made back to back share one round
+    return WriteQueue(client, flush_delay=kwargs.pop("flush_delay", 0.2), **kwargs)
+
+
+FAV = "quotes/q1/fav_by/u1"
+
+
+def test_fav_unfav_sends_nothing():
+    client = FakeClient()
+    queue = make_queue(client)
+    queue.submit("s1", "fav", {FAV: (True, None)})
+    queue.submit("s1", "unfav", {FAV: (None, True)})
+    time.sleep(0.4)
+    drain(queue)
+    assert client.attempts == 0
+    assert queue.stats["coalesced"] == 1
+
+
+def test_fav_unfav_fav_sends_one_write():
+    client = FakeClient()
+    queue = make_queue(client)
+    queue.submit("s1", "fav", {FAV: (True, None)})
+    queue.submit("s1", "unfav", {FAV: (None, True)})
+    queue.submit("s1", "fav", {FAV: (True, None)})
+    time.sleep(0.4)
+    drain(queue)
+    assert client.patches == [{FAV: True}]
+
+
+def test_newest_value_wins():
+    client = FakeClient()
+    queue = make_queue(client)
+    queue.submit("s1", "edit", {"quotes/q1/text": ("a", "orig")})
+    queue.submit("s1", "edit", {"quotes/q1/text": ("b", "a")})
+    time.sleep(0.4)
+    drain(queue)
+    assert client.patches == [{"quotes/q1/text": "b"}]
+
+
+def test_ancestor_write_supersedes_queued_children():
+    client = FakeClient()
+    queue = make_queue(client)
+    queue.submit("s1", "fav", {FAV: (True, None), "quotes/q1/collections/c1": (True, None)})
+    queue.submit("s1", "delete", {"quotes/q1": (None, {"text": "x"})})
+    queue.submit("s1", "fav", {"quotes/q2/fav_by/u1": (True, None)})
+    time.sleep(0.4)
+    drain(queue)
+    assert client.patches == [{"quotes/q1": None, "quotes/q2/fav_by/u1": True}]
+
+
+def test_overlapping_paths_go_out_in_separate_rounds():
+    client = FakeClient()
+    queue = make_queue(client)
+    queue.submit("s1", "delete", {"quotes/q1": (None, {"text": "x"})})
+    queue.submit("s1", "restore", {"quotes/q1/text": ("x", None)})
+    time.sleep(0.4)
+    drain(queue)
+    assert client.patches == [{"quotes/q1": None}, {"quotes/q1/text": "x"}]
+
+
+def test_failed_round_is_retried():
+    client = FakeClient(fail_times=1)
+    queue = make_queue(client, flush_delay=0.01, max_attempts=3)
+    queue.submit("s1", "fav", {FAV: (True, None)})
+    drain(queue)
+    assert client.attempts == 2
+    assert client.patches == [{FAV: True}]
+    assert not queue.has_failures("s1")
+
+
+def test_write_that_keeps_failing_is_reported_with_its_restore_value():
+    client = FakeClient(fail_times=99)
+    queue = make_queue(client, flush_delay=0.01, max_attempts=2)
+    queue.submit("s1", "Favourite", {FAV: (True, None)})
+    queue.submit("s2", "Rename", {"quotes/q2/text": ("new", "old")})
+    drain(queue)
+    assert client.attempts == 2
+    assert client.patches == []
+    assert queue.stats["failed"] == 2
+
+    [failure] = queue.take_failures("s1")
+    assert failure.label == "Favourite"
+    assert failure.restore == {"/" + FAV: None}
+    assert "503" in failure.error
+    assert queue.take_failures("s1") == []
+    assert [f.restore for f in queue.take_failures("s2")] == [{"/quotes/q2/text": "old"}]
+
+
+def test_stamp_and_on_commit_hooks():
+    client = FakeClient()
+    committed = []
+    queue = make_queue(
+        client, flush_delay=0.01,
+        stamp=lambda paths: {"quotes/q1/updated_at": {".sv": "timestamp"}, "quotes/q1": "ignored"},
+        on_commit=committed.append,
+    )
+    queue.submit("s1", "fav", {FAV: (True, None)})
+    drain(queue)
+    # A stamp overlapping a queued path is left out rather than clobbering it
+    assert client.patches == [{FAV: True, "quotes/q1/updated_at": {".sv": "timestamp"}}]
+    assert committed == [["/" + FAV]]
@@ -0,0 +1,187 @@
+"""Write-behind queue for optimistic UI actions.
+
+Click handlers apply their change to the shared store, hand the matching RTDB
+writes to the process-wide `WriteQueue`, and rerun right away. A background
+thread flushes queued writes as one multi-path PATCH per round.
+
+- Coalescing: a path queued again before it was sent keeps only the newest
+  value, and a path that ends up back at its original value (fav -> unfav)
+  is dropped without any request.
+- Retries: a failed round is re-queued with backoff, up to MAX_ATTEMPTS.
+- Failures: writes that still fail are reported back to the session that
+  made them, with the values to restore, so the UI can roll back.
+- Stamps: an optional `stamp(paths)` hook adds extra writes to every round
+  (e.g. `updated_at` server timestamps); those are never coalesced or rolled back.
+- Commits: an optional `on_commit(paths)` hook runs after each successful
+  round, before the round stops counting as pending.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from rtdb import FirebaseClient, FirebaseError
+
+FLUSH_DELAY_SECONDS = 0.15     # gather clicks that arrive together into one PATCH
+MAX_ATTEMPTS = 3               # rounds per write (each round has the client's own retries)
+RETRY_BACKOFF_SECONDS = 1.0    # 1s, 2s, ...
+
+
+@dataclass
+class WriteFailure:
+    label: str
+    restore: dict[str, object]     # path -> value to put back in the local state
+    error: str
+
+
+@dataclass
+class _Pending:
+    value: object
+    before: object                 # value at this path before the first queued write
+    origin: str
+    label: str
+    attempts: int = 0
+    not_before: float = 0.0
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """True if one path is the other or its ancestor (RTDB rejects those in one PATCH)."""
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/")
+
+
+class WriteQueue:
+    def __init__(self, client: FirebaseClient, flush_delay: float = FLUSH_DELAY_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, stamp=None, on_commit=None):
+        self.client = client
+        self.flush_delay = flush_delay
+        self.max_attempts = max_attempts
+        self.stamp = stamp
+        self.on_commit = on_commit
+
+        self._cond = threading.Condition()
+        self._pending: dict[str, _Pending] = {}
+        self._in_flight = 0
+        self._failures: dict[str, list[WriteFailure]] = {}
+        self.stats = {"submitted": 0, "coalesced": 0, "sent": 0, "failed": 0}
+
+        self._thread = threading.Thread(target=self._run, name="rtdb-write-queue", daemon=True)
+        self._thread.start()
+
+    # ---------- producer side ----------
+    def submit(self, origin: str, label: str, writes: dict[str, tuple[object, object]]):
+        """Queue `{path: (new_value, value_before)}`; None as new_value deletes the path."""
+        with self._cond:
+            for path, (value, before) in writes.items():
+                path = "/" + path.strip("/")
+                self.stats["submitted"] += 1
+                queued = self._pending.get(path)
+                if queued is not None:
+                    self.stats["coalesced"] += 1
+                    before = queued.before
+                # An ancestor write supersedes anything queued below it
+                for p in [p for p in self._pending if p.startswith(path + "/")]:
+                    del self._pending[p]
+                    self.stats["coalesced"] += 1
+                if queued is not None and value == before:
+                    # Back where it started (fav -> unfav): nothing to send
+                    del self._pending[path]
+                    continue
+                self._pending.pop(path, None)
+                self._pending[path] = _Pending(value, before, origin, label)
+            self._cond.notify()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def has_failures(self, origin: str) -> bool:
+        return bool(self._failures.get(origin))
+
+    def take_failures(self, origin: str) -> list[WriteFailure]:
+        with self._cond:
+            return self._failures.pop(origin, [])
+
+    # ---------- worker side ----------
+    def _take_round(self) -> dict[str, _Pending]:
+        now = time.monotonic()
+        rnd: dict[str, _Pending] = {}
+        for path, item in list(self._pending.items()):
+            if item.not_before > now:
+                continue
+            if any(_overlaps(path, p) for p in rnd):
+                continue  # ancestor/descendant of something in this round: next round
+            rnd[path] = self._pending.pop(path)
+        return rnd
+
+    def _next_wakeup(self) -> float | None:
+        if not self._pending:
+            return None
+        return max(0.0, min(i.not_before for i in self._pending.values()) - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    wait = self._next_wakeup()
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+            time.sleep(self.flush_delay)  # let a burst of clicks coalesce
+
+            with self._cond:
+                rnd = self._take_round()
+                self._in_flight = len(rnd)
+            if not rnd:
+                continue
+
+            batch = self.client.batch()
+            for path, item in rnd.items():
+                if item.value is None:
+                    batch.delete(path)
+                else:
+                    batch.set(path, item.value)
+            if self.stamp is not None:
+                for path, value in self.stamp(list(rnd)).items():
+                    path = "/" + path.strip("/")
+                    if not any(_overlaps(path, p) for p in rnd):
+                        batch.set(path, value)
+            try:
+                batch.commit()
+                error = None
+            except FirebaseError as e:
+                error = str(e)
+            if error is None and self.on_commit is not None:
+                try:
+                    self.on_commit(list(rnd))
+                except Exception:
+                    pass  # a hook must never stop the writer
+
+            with self._cond:
+                self._in_flight = 0
+                if error is None:
+                    self.stats["sent"] += len(rnd)
+                else:
+                    self._retry_or_fail(rnd, error)
+
+    def _retry_or_fail(self, rnd: dict[str, _Pending], error: str):
+        now = time.monotonic()
+        for path, item in rnd.items():
+            newer = self._pending.get(path)
+            if newer is not None:
+                # Superseded while in flight: the newer write goes out anyway,
+                # but a rollback must go back to what the server had before us
+                newer.before = item.before
+                continue
+            item.attempts += 1
+            if item.attempts < self.max_attempts:
+                item.not_before = now + RETRY_BACKOFF_SECONDS * (2 ** (item.attempts - 1))
+                self._pending[path] = item
+                continue
+            self.stats["failed"] += 1
+            failures = self._failures.setdefault(item.origin, [])
+            for f in failures:
+                if f.label == item.label and f.error == error:
+                    f.restore[path] = item.before
+                    break
+            else:
+                failures.append(WriteFailure(item.label, {path: item.before}, error))